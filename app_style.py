@@ -0,0 +1,88 @@
+"""Stylesheet of the app.
+
+Built once per process, when mainapp first imports it, and sent to the
+browser in minified form on every script run.
+"""
+
+# Custom CSS for card styling
+_CARD_CSS = """
+.question-card {
+    background: white;
+    border-radius: 12px;
+    padding: 2rem;
+    box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
+    margin: 0 auto;
+}
+.choice-button {
+    width: 100%;
+    padding: 1rem;
+    margin: 0.5rem 0;
+    border: 2px solid #e5e7eb;
+    border-radius: 8px;
+    background: white;
+    cursor: pointer;
+    transition: all 0.2s;
+    text-align: left;
+}
+.choice-button:hover {
+    border-color: #9ca3af;
+    background: #f9fafb;
+}
+.choice-button.selected {
+    border-color: #333;
+    background: #f3f4f6;
+}
+.score-card {
+    background: #f3f4f6;
+    color: #333;
+    padding: 1.5rem;
+    border-radius: 12px;
+    text-align: center;
+    margin: 1rem 0;
+}
+.correct-card {
+    background: #ecfdf5;
+    color: #065f46;
+    padding: 1.5rem;
+    border-radius: 12px;
+    text-align: center;
+}
+.incorrect-card {
+    background: #fef2f2;
+    color: #991b1b;
+    padding: 1.5rem;
+    border-radius: 12px;
+    text-align: center;
+}
+.wrong-answer-box {
+    background: #fef2f2;
+    border-left: 4px solid #ef4444;
+    padding: 1.5rem;
+    border-radius: 8px;
+    margin: 1rem 0;
+    color: #1f2937;
+}
+.correct-answer-box {
+    background: #ecfdf5;
+    border-left: 4px solid #10b981;
+    padding: 1rem;
+    border-radius: 8px;
+    margin: 0.5rem 0;
+    color: #1f2937;
+}
+.explanation-box {
+    background: #f0f9ff;
+    border-left: 4px solid #333;
+    padding: 1rem;
+    border-radius: 8px;
+    margin: 0.5rem 0;
+    font-size: 0.95rem;
+    color: #1f2937;
+}
+.perfect-score {
+    text-align: center;
+    padding: 3rem 1rem;
+}
+"""
+
+CSS = "<style>" + " ".join(_CARD_CSS.split()) + "</style>"
@@ -0,0 +1,323 @@
+"""Append-only log of submitted quiz attempts, and analytics over it.
+
+Every submitted quiz (or finished spaced review) is appended as one row per
+question to a directory of Parquet files (DECA_ATTEMPT_LOG_DIR):
+
+    attempt_id   int64, shared by the rows of one attempt
+    answered_at  float64 Unix time of the submission
+    learner      the learner name ("" when anonymous), dictionary encoded
+    mode         "quiz" or "review"
+    position     int32 position of the question in the quiz
+    question_id  int64 bank row id
+    exam_id      int64 bank exam id
+    number       int32 question number in its exam
+    answer       int8 choice 0-3, or -1 when unanswered
+    key          int8 answer key letter 0-3, or -1 when the key is missing
+
+Each attempt is written to a file of its own (part-*.parquet), renamed into
+place so readers never see half a file. Once COMPACT_PARTS parts pile up a
+background thread merges them into one compact-*.parquet file, and merges
+the compact files once COMPACT_FILES of those exist. A compact file lists
+the files it replaces in its Parquet metadata, and readers skip those, so
+an attempt is never counted twice while the old files are being removed.
+
+The analytics functions take the log as a DataFrame and are vectorized
+group-bys over integer columns, so they stay interactive at millions of
+answer rows (see benchmarks/bench_analytics.py). pandas is imported on first
+use, so logging an attempt or importing this module doesn't slow down the
+app's start.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+import numpy as np
+
+from question_store import NO_ANSWER
+
+log = logging.getLogger("deca.attempts")
+
+LOG_DIR = os.environ.get(
+    "DECA_ATTEMPT_LOG_DIR", os.path.join(os.path.expanduser("~"), ".cache", "decaai", "attempts")
+)
+COMPACT_PARTS = int(os.environ.get("DECA_ATTEMPT_COMPACT_PARTS", "64"))
+COMPACT_FILES = 16
+# Answers needed before a question's statistics are trusted
+MIN_ANSWERS = 10
+
+_DTYPES = {
+    "attempt_id": "int64", "answered_at": "float64", "learner": "category", "mode": "category",
+    "position": "int32", "question_id": "int64", "exam_id": "int64", "number": "int32",
+    "answer": "int8", "key": "int8",
+}
+COLUMNS = tuple(_DTYPES)
+_REPLACES = b"deca_replaces"
+# A compaction lock older than this is left over from a crashed process
+_STALE_LOCK_SECONDS = 600
+
+_compact_lock = threading.Lock()
+_read_cache = {}
+_read_cache_lock = threading.Lock()
+
+
+def _file_names(log_dir):
+    try:
+        names = os.listdir(log_dir)
+    except FileNotFoundError:
+        return []
+    return sorted(name for name in names
+                  if name.endswith(".parquet") and name.startswith(("part-", "compact-")))
+
+
+def _write(log_dir, prefix, frame, replaces=()):
+    """Write frame as a new Parquet file, atomically; returns its name"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    if replaces:
+        table = table.replace_schema_metadata(
+            {**(table.schema.metadata or {}), _REPLACES: json.dumps(sorted(replaces)).encode()})
+    name = f"{prefix}-{time.time_ns():020d}-{os.getpid()}-{random.getrandbits(32):08x}.parquet"
+    tmp_path = os.path.join(log_dir, "." + name)
+    pq.write_table(table, tmp_path, compression="zstd")
+    os.replace(tmp_path, os.path.join(log_dir, name))
+    return name
+
+
+def _frame(columns):
+    import pandas as pd
+
+    frame = pd.DataFrame(columns)
+    frame["learner"] = frame["learner"].astype("category")
+    frame["mode"] = frame["mode"].astype("category")
+    return frame
+
+
+def record_attempt(quiz, answers, learner="", mode="quiz", log_dir=None, now=None):
+    """
+    Append one submitted attempt: quiz is an exam_registry.Quiz, answers
+    its answers array. Returns the attempt id.
+    """
+    log_dir = log_dir or LOG_DIR
+    now = time.time() if now is None else now
+    n = len(quiz)
+    attempt_id = random.getrandbits(63)
+    frame = _frame({
+        "attempt_id": np.full(n, attempt_id, dtype=np.int64),
+        "answered_at": np.full(n, now, dtype=np.float64),
+        "learner": [learner or ""] * n,
+        "mode": [mode] * n,
+        "position": np.arange(n, dtype=np.int32),
+        "question_id": quiz.row_ids(),
+        "exam_id": quiz.question_exam_ids(),
+        "number": np.fromiter((q.number for q in quiz), dtype=np.int32, count=n),
+        "answer": np.asarray(answers, dtype=np.int8),
+        "key": np.asarray(quiz.key, dtype=np.int8),
+    })
+    os.makedirs(log_dir, exist_ok=True)
+    _write(log_dir, "part", frame)
+    names = _file_names(log_dir)
+    if (sum(1 for name in names if name.startswith("part-")) >= COMPACT_PARTS
+            or sum(1 for name in names if name.startswith("compact-")) >= COMPACT_FILES):
+        threading.Thread(target=compact, args=(log_dir,), name="deca-attempts-compact",
+                         daemon=True).start()
+    return attempt_id
+
+
+def _live_files(log_dir, names):
+    """The files not replaced by a compact file"""
+    import pyarrow.parquet as pq
+
+    replaced = set()
+    for name in names:
+        if name.startswith("compact-"):
+            metadata = pq.read_schema(os.path.join(log_dir, name)).metadata or {}
+            replaced.update(json.loads(metadata.get(_REPLACES, b"[]")))
+    return [name for name in names if name not in replaced]
+
+
+def compact(log_dir=None):
+    """
+    Merge the part files (or, when there are COMPACT_FILES of them, every
+    file) into one compact file and remove the merged files. Does nothing
+    when another thread or process is compacting the same log.
+    """
+    log_dir = log_dir or LOG_DIR
+    if not _compact_lock.acquire(blocking=False):
+        return
+    lock_path = os.path.join(log_dir, ".compact.lock")
+    try:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if time.time() - os.path.getmtime(lock_path) < _STALE_LOCK_SECONDS:
+                return
+            os.replace(lock_path, lock_path + ".stale")
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        os.close(fd)
+        try:
+            live = _live_files(log_dir, _file_names(log_dir))
+            compacts = [name for name in live if name.startswith("compact-")]
+            merge = live if len(compacts) >= COMPACT_FILES else [n for n in live if n.startswith("part-")]
+            if len(merge) > 1:
+                frame = _read_files(log_dir, merge, COLUMNS)
+                _write(log_dir, "compact", frame, replaces=merge)
+                for name in merge:
+                    os.remove(os.path.join(log_dir, name))
+                log.debug("Compacted %d attempt log files (%d rows)", len(merge), len(frame))
+        finally:
+            os.remove(lock_path)
+    except OSError as e:
+        log.warning("Could not compact the attempt log in %s: %s", log_dir, e)
+    finally:
+        _compact_lock.release()
+
+
+def _read_files(log_dir, names, columns):
+    import pandas as pd
+
+    frames = [pd.read_parquet(os.path.join(log_dir, name), columns=list(columns)) for name in names]
+    if not frames:
+        return pd.DataFrame({column: pd.Series(dtype=_DTYPES[column]) for column in columns})
+    frame = pd.concat(frames, ignore_index=True)
+    for column in ("learner", "mode"):
+        if column in frame:
+            frame[column] = frame[column].astype("category")
+    return frame
+
+
+def load_attempts(columns=COLUMNS, log_dir=None):
+    """
+    The whole log as a DataFrame with the given columns. Results are
+    cached per set of files, so repeated reads of an unchanged log are free;
+    the returned frame is shared and must not be modified.
+    """
+    log_dir = log_dir or LOG_DIR
+    columns = tuple(columns)
+    for _ in range(3):
+        names = tuple(_file_names(log_dir))
+        cache_key = (log_dir, names, columns)
+        with _read_cache_lock:
+            frame = _read_cache.get(cache_key)
+        if frame is not None:
+            return frame
+        try:
+            frame = _read_files(log_dir, _live_files(log_dir, names), columns)
+        except FileNotFoundError:
+            continue  # compacted while we were reading; list the files again
+        with _read_cache_lock:
+            _read_cache.clear()
+            _read_cache[cache_key] = frame
+        return frame
+    raise RuntimeError(f"The attempt log in {log_dir} kept changing while it was read")
+
+
+# Analytics
+
+def question_stats(attempts, min_answers=MIN_ANSWERS):
+    """
+    Per-question item statistics, one row per question_id:
+        exam_id, number
+        answers         times the question was answered
+        difficulty      share of those answers that chose the key (the
+                        p-value; low means hard)
+        discrimination  point-biserial correlation between answering the
+                        question correctly and the rest of the attempt's
+                        score; near zero or negative means it doesn't
+                        separate strong and weak students
+        distractor      the most chosen wrong letter ("" when none)
+        distractor_share  share of answers that chose it
+        suspect_key     answered at least min_answers times and the top
+                        distractor beats the key or discrimination is
+                        negative: check the parsed answer key
+    Questions without a key are left out.
+    """
+    import pandas as pd
+
+    frame = attempts[["attempt_id", "question_id", "exam_id", "number", "answer", "key"]]
+    frame = frame[(frame["key"] != NO_ANSWER) & (frame["answer"] != NO_ANSWER)]
+    correct = (frame["answer"] == frame["key"]).astype(np.float64)
+
+    # Rest score: the attempt's share correct without this question
+    by_attempt = correct.groupby(frame["attempt_id"])
+    attempt_correct = by_attempt.transform("sum")
+    attempt_answers = by_attempt.transform("size")
+    rest_answers = (attempt_answers - 1).where(attempt_answers > 1)
+    rest = (attempt_correct - correct) / rest_answers
+
+    data = pd.DataFrame({
+        "question_id": frame["question_id"].to_numpy(),
+        "x": correct.to_numpy(),
+        "y": rest.fillna(0.0).to_numpy(),
+    })
+    data["xy"] = data["x"] * data["y"]
+    data["xx"] = data["x"] * data["x"]
+    data["yy"] = data["y"] * data["y"]
+    sums = data.groupby("question_id").agg(
+        n=("x", "size"), x=("x", "sum"), y=("y", "sum"), xy=("xy", "sum"), xx=("xx", "sum"),
+        yy=("yy", "sum"))
+    n = sums["n"]
+    covariance = n * sums["xy"] - sums["x"] * sums["y"]
+    variance = (n * sums["xx"] - sums["x"] ** 2) * (n * sums["yy"] - sums["y"] ** 2)
+    discrimination = covariance / np.sqrt(variance.where(variance > 0))
+
+    info = frame.groupby("question_id")[["exam_id", "number"]].first()
+    stats = info.assign(
+        answers=n,
+        difficulty=sums["x"] / n,
+        discrimination=discrimination,
+    )
+
+    wrong = frame[frame["answer"] != frame["key"]]
+    if len(wrong):
+        counts = wrong.groupby(["question_id", "answer"]).size()
+        top = counts.sort_values(ascending=False, kind="stable")
+        top = top[~top.index.get_level_values(0).duplicated()]
+        letters = np.array(list("ABCD"))
+        distractor = pd.Series(letters[top.index.get_level_values(1).to_numpy()],
+                               index=top.index.get_level_values(0))
+        distractor_share = pd.Series(top.to_numpy(), index=distractor.index) / n.reindex(distractor.index)
+    else:
+        distractor = pd.Series(dtype=object)
+        distractor_share = pd.Series(dtype=np.float64)
+    stats["distractor"] = distractor.reindex(stats.index).fillna("")
+    stats["distractor_share"] = distractor_share.reindex(stats.index).fillna(0.0)
+    stats["suspect_key"] = (stats["answers"] >= min_answers) & (
+        (stats["distractor_share"] > stats["difficulty"]) | (stats["discrimination"] < 0))
+    return stats
+
+
+def exam_accuracy(attempts):
+    """
+    Per (learner, exam_id): answers and share correct, for spotting weak
+    topics. Unanswered questions and questions without a key are left out.
+    """
+    frame = attempts[["learner", "exam_id", "answer", "key"]]
+    frame = frame[(frame["key"] != NO_ANSWER) & (frame["answer"] != NO_ANSWER)]
+    correct = (frame["answer"] == frame["key"])
+    grouped = correct.groupby([frame["learner"], frame["exam_id"]], observed=True)
+    return grouped.agg(answers="size", accuracy="mean").reset_index()
+
+
+def student_trends(attempts, window=5):
+    """
+    One row per attempt of a named learner, oldest first: learner,
+    answered_at, questions, score (% of the quiz answered correctly) and
+    rolling_score, the mean score of the learner's last window attempts
+    """
+    frame = attempts[["attempt_id", "answered_at", "learner", "answer", "key"]]
+    frame = frame[frame["learner"] != ""]
+    correct = (frame["answer"] == frame["key"]) & (frame["key"] != NO_ANSWER)
+    per_attempt = correct.groupby(frame["attempt_id"]).agg(questions="size", correct="sum")
+    first = frame.groupby("attempt_id", observed=True)[["answered_at", "learner"]].first()
+    trends = first.join(per_attempt).reset_index()
+    trends["score"] = trends["correct"] / trends["questions"] * 100
+    trends = trends.sort_values(["learner", "answered_at"], kind="stable")
+    trends["rolling_score"] = (trends.groupby("learner", observed=True)["score"]
+                               .rolling(window, min_periods=1).mean()
+                               .reset_index(level=0, drop=True))
+    return trends.drop(columns=["correct"]).reset_index(drop=True)
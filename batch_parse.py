@@ -0,0 +1,194 @@
+"""Parse a directory of DECA exam PDFs into question bank files.
+
+Usage:
+    python batch_parse.py exams/ -o question_banks/ -j 8
+    python batch_parse.py exams/ --key-only   # refresh answer keys only
+    python batch_parse.py exams/ --engine fast
+
+Each exam.pdf becomes question_banks/exam.jsonl (see exam_files.py), and a
+summary.json report with per-file question, answer and explanation counts
+and parse phase timings is written next to them. Files whose bank is newer than the PDF are skipped
+unless --force is given. With --key-only, existing bank files get their
+answers and explanations re-extracted from the answer key pages alone
+(deca_parser.extract_answer_key); question pages are not read. --engine
+picks the text extraction engine (deca_parser.ENGINES); "fast" parses are
+redone with "layout" when they find too few questions. Streamlit is not
+imported.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+
+from deca_parser import (DEFAULT_ENGINE, ENGINES, PARSER_VERSION, extract_answer_key,
+                         extract_questions_and_answers)
+from exam_files import BANK_DIR, BANK_SUFFIX, read_bank, write_bank
+from parse_metrics import ParseProfile, configure_logging
+from question_store import NO_EXPLANATION
+
+
+def parse_one(pdf_path, bank_path, verbose=False, engine=None):
+    """Worker: parse one PDF and write its bank file. Returns a report row"""
+    # Worker processes don't inherit the parent's logging setup
+    configure_logging("DEBUG" if verbose else "WARNING")
+    started = time.perf_counter()
+    row = {"file": os.path.basename(pdf_path), "bank": os.path.basename(bank_path)}
+    profile = ParseProfile(row["file"])
+    try:
+        # One process per file already; don't nest the page-level pool
+        questions = extract_questions_and_answers(pdf_path, workers=1, profile=profile,
+                                                  engine=engine)
+        write_bank(bank_path, questions)
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    row["questions"] = profile.counters.get("questions", 0)
+    row["answers"] = profile.counters.get("answers", 0)
+    row["explanations"] = profile.counters.get("explanations", 0)
+    row["skipped_questions"] = profile.counters.get("skipped_questions", 0)
+    row["strategy"] = profile.info.get("strategy")
+    row["engine"] = profile.info.get("engine")
+    if "retry" in profile.info:
+        row["retry"] = profile.info["retry"]
+    row["peak_rss_mb"] = profile.to_dict()["peak_rss_mb"]
+    row["phases"] = {name: round(seconds, 3) for name, seconds in profile.phases.items()}
+    row["seconds"] = round(time.perf_counter() - started, 3)
+    return row
+
+
+def refresh_key(pdf_path, bank_path, verbose=False):
+    """Worker: update the answers of an existing bank file from the PDF's key pages"""
+    configure_logging("DEBUG" if verbose else "WARNING")
+    started = time.perf_counter()
+    row = {"file": os.path.basename(pdf_path), "bank": os.path.basename(bank_path),
+           "questions": 0, "answers": 0, "explanations": 0}
+    try:
+        questions = read_bank(bank_path)
+        answer_key, explanations = extract_answer_key(pdf_path)
+        if not answer_key:
+            raise ValueError("no answer key found")
+        for q in questions:
+            q["correct"] = answer_key.get(q["number"])
+            q["explanation"] = explanations.get(q["number"], NO_EXPLANATION)
+        write_bank(bank_path, questions)
+        row["questions"] = len(questions)
+        row["answers"] = sum(1 for q in questions if q["correct"])
+        row["explanations"] = sum(1 for q in questions if q["explanation"] != NO_EXPLANATION)
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    row["seconds"] = round(time.perf_counter() - started, 3)
+    return row
+
+
+def find_pdfs(input_dir):
+    return sorted(
+        os.path.join(input_dir, name)
+        for name in os.listdir(input_dir)
+        if name.lower().endswith(".pdf")
+    )
+
+
+def bank_path_for(pdf_path, output_dir):
+    stem = os.path.splitext(os.path.basename(pdf_path))[0]
+    return os.path.join(output_dir, stem + BANK_SUFFIX)
+
+
+def is_up_to_date(pdf_path, bank_path):
+    try:
+        return os.path.getmtime(bank_path) >= os.path.getmtime(pdf_path)
+    except OSError:
+        return False
+
+
+def print_report(rows):
+    width = max([len(row["file"]) for row in rows] + [4])
+    print(f"{'File':<{width}}  {'Questions':>9}  {'Answers':>7}  {'Explanations':>12}  {'Seconds':>7}")
+    for row in rows:
+        if row.get("skipped"):
+            print(f"{row['file']:<{width}}  {row.get('reason', '(up to date)'):>9}")
+            continue
+        line = (f"{row['file']:<{width}}  {row['questions']:>9}  {row['answers']:>7}  "
+                f"{row['explanations']:>12}  {row['seconds']:>7.2f}")
+        if row.get("error"):
+            line += f"  ⚠ {row['error']}"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-parse DECA exam PDFs into question banks")
+    parser.add_argument("input_dir", help="directory containing exam PDFs")
+    parser.add_argument("-o", "--output-dir", default=BANK_DIR,
+                        help=f"where to write bank files (default: {BANK_DIR})")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="number of PDFs to parse in parallel (default: all cores)")
+    parser.add_argument("--force", action="store_true", help="re-parse PDFs whose bank is up to date")
+    parser.add_argument("--key-only", action="store_true",
+                        help="only re-extract the answer keys of existing bank files")
+    parser.add_argument("--engine", choices=ENGINES, default=DEFAULT_ENGINE,
+                        help=f"text extraction engine (default: {DEFAULT_ENGINE})")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show the parser's debug log")
+    args = parser.parse_args(argv)
+
+    pdfs = find_pdfs(args.input_dir)
+    if not pdfs:
+        print(f"No PDF files found in {args.input_dir}")
+        return 1
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    rows = []
+    todo = []
+    for pdf_path in pdfs:
+        bank_path = bank_path_for(pdf_path, args.output_dir)
+        if args.key_only:
+            if os.path.exists(bank_path):
+                todo.append((pdf_path, bank_path))
+            else:
+                rows.append({"file": os.path.basename(pdf_path), "bank": os.path.basename(bank_path),
+                             "skipped": True, "reason": "(no bank file)"})
+        elif not args.force and is_up_to_date(pdf_path, bank_path):
+            rows.append({"file": os.path.basename(pdf_path), "bank": os.path.basename(bank_path),
+                         "skipped": True})
+        else:
+            todo.append((pdf_path, bank_path))
+
+    work = refresh_key if args.key_only else partial(parse_one, engine=args.engine)
+    started = time.perf_counter()
+    if args.jobs <= 1 or len(todo) <= 1:
+        for pdf_path, bank_path in todo:
+            rows.append(work(pdf_path, bank_path, args.verbose))
+    else:
+        with ProcessPoolExecutor(max_workers=min(args.jobs, len(todo))) as pool:
+            futures = [pool.submit(work, pdf_path, bank_path, args.verbose)
+                       for pdf_path, bank_path in todo]
+            for future in as_completed(futures):
+                row = future.result()
+                print(f"  {row['file']}: {row['questions']} questions")
+                rows.append(row)
+    elapsed = time.perf_counter() - started
+
+    rows.sort(key=lambda row: row["file"])
+    summary = {
+        "parser_version": PARSER_VERSION,
+        "key_only": args.key_only,
+        "engine": None if args.key_only else args.engine,
+        "parsed": len(todo),
+        "skipped": len(pdfs) - len(todo),
+        "failed": sum(1 for row in rows if row.get("error")),
+        "seconds": round(elapsed, 3),
+        "files": rows,
+    }
+    with open(os.path.join(args.output_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+
+    print()
+    print_report(rows)
+    action = "Updated the answer keys of" if args.key_only else "Parsed"
+    print(f"\n{action} {len(todo)} file(s) in {elapsed:.1f}s, skipped {summary['skipped']}, "
+          f"failed {summary['failed']}")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
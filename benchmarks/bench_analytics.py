@@ -0,0 +1,126 @@
+"""Attempt log analytics benchmark.
+
+Builds a synthetic attempt log (see attempt_log.py) of simulated students
+with different abilities answering exams of questions with different
+difficulties, some of them with a wrong answer key, writes it to a
+temporary log directory and times reading it and each analytics function:
+
+    python benchmarks/bench_analytics.py                  # 2M answer rows
+    python benchmarks/bench_analytics.py --rows 200000 --budget-ms 500
+
+The script exits with status 1 when the total time is over --budget-ms or
+when question_stats doesn't flag every question whose key was corrupted.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import attempt_log  # noqa: E402
+
+QUIZ_LENGTH = 100
+NUM_EXAMS = 20
+QUESTIONS_PER_EXAM = 100
+NUM_LEARNERS = 500
+# Questions whose key was replaced by a wrong letter
+BAD_KEYS = 25
+
+
+def synthetic_log(rows, seed=0):
+    """A DataFrame of about rows answer rows, and the ids of the questions with a bad key"""
+    rng = np.random.default_rng(seed)
+    num_attempts = max(1, rows // QUIZ_LENGTH)
+    num_questions = NUM_EXAMS * QUESTIONS_PER_EXAM
+    difficulty = rng.normal(0.0, 1.0, num_questions)
+    true_key = rng.integers(0, 4, num_questions).astype(np.int8)
+    key = true_key.copy()
+    bad = rng.choice(num_questions, BAD_KEYS, replace=False)
+    key[bad] = (true_key[bad] + rng.integers(1, 4, BAD_KEYS)) % 4
+    ability = rng.normal(0.0, 1.0, NUM_LEARNERS)
+
+    learner = rng.integers(0, NUM_LEARNERS, num_attempts)
+    exam = rng.integers(0, NUM_EXAMS, num_attempts)
+    position = np.tile(np.arange(QUIZ_LENGTH, dtype=np.int32), num_attempts)
+    question = (np.repeat(exam, QUIZ_LENGTH) * QUESTIONS_PER_EXAM
+                + rng.permutation(QUESTIONS_PER_EXAM)[position % QUESTIONS_PER_EXAM])
+    # Rasch model: P(correct) = sigmoid(ability - difficulty)
+    p = 1 / (1 + np.exp(difficulty[question] - np.repeat(ability[learner], QUIZ_LENGTH)))
+    knows = rng.random(len(question)) < p
+    guess = rng.integers(0, 4, len(question)).astype(np.int8)
+    answer = np.where(knows, true_key[question], guess).astype(np.int8)
+    answer[rng.random(len(question)) < 0.02] = -1
+
+    frame = pd.DataFrame({
+        "attempt_id": np.repeat(np.arange(num_attempts, dtype=np.int64), QUIZ_LENGTH),
+        "answered_at": np.repeat(np.sort(rng.uniform(0, 90 * 86400, num_attempts)), QUIZ_LENGTH),
+        "learner": pd.Categorical(np.repeat(np.char.add("student", learner.astype(str)), QUIZ_LENGTH)),
+        "mode": pd.Categorical(["quiz"] * len(question)),
+        "position": position,
+        "question_id": question.astype(np.int64),
+        "exam_id": np.repeat(exam, QUIZ_LENGTH).astype(np.int64),
+        "number": (question % QUESTIONS_PER_EXAM + 1).astype(np.int32),
+        "answer": answer,
+        "key": key[question],
+    })
+    return frame, set(bad.tolist())
+
+
+def _time(func):
+    started = time.perf_counter()
+    result = func()
+    return (time.perf_counter() - started) * 1000, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the attempt log analytics")
+    parser.add_argument("--rows", type=int, default=2_000_000, help="answer rows in the log")
+    parser.add_argument("--files", type=int, default=8, help="compact files to split the log into")
+    parser.add_argument("--budget-ms", type=float, default=2000.0,
+                        help="budget for reading the log and running every analysis")
+    args = parser.parse_args(argv)
+
+    frame, bad_keys = synthetic_log(args.rows)
+    with tempfile.TemporaryDirectory() as log_dir:
+        for chunk in np.array_split(np.arange(len(frame)), args.files):
+            attempt_log._write(log_dir, "compact", frame.iloc[chunk])
+        size = sum(os.path.getsize(os.path.join(log_dir, name)) for name in os.listdir(log_dir))
+        timings = {}
+        timings["load"], attempts = _time(lambda: attempt_log.load_attempts(log_dir=log_dir))
+        timings["question_stats"], stats = _time(lambda: attempt_log.question_stats(attempts))
+        timings["exam_accuracy"], _ = _time(lambda: attempt_log.exam_accuracy(attempts))
+        timings["student_trends"], _ = _time(lambda: attempt_log.student_trends(attempts))
+
+    print(f"{len(attempts):,} answer rows, {size / 2**20:.1f} MB on disk, "
+          f"{attempts.memory_usage(deep=True).sum() / 2**20:.0f} MB in memory")
+    for name, ms in timings.items():
+        print(f"{name:<16}{ms:>10.1f} ms")
+    total = sum(timings.values())
+    print(f"{'total':<16}{total:>10.1f} ms (budget {args.budget_ms:.0f} ms)")
+
+    flagged = set(stats.index[stats["suspect_key"]])
+    missed = bad_keys - flagged
+    print(f"flagged {len(flagged)} questions; {len(bad_keys) - len(missed)}/{len(bad_keys)} "
+          f"corrupted keys found")
+
+    failures = []
+    if total > args.budget_ms:
+        failures.append(f"analytics took {total:.0f}ms, budget {args.budget_ms:.0f}ms")
+    if missed:
+        failures.append(f"corrupted keys not flagged: {sorted(missed)}")
+    if failures:
+        print("\nFAILED:")
+        for message in failures:
+            print(f"  ✗ {message}")
+        return 1
+    print("\n✓ Within budget, every corrupted key flagged")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
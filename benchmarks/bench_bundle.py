@@ -0,0 +1,102 @@
+"""Exam bundle benchmark.
+
+Packs a synthetic bank of questions (see synthetic.py) into an exam bundle
+(exam_files.py) and times what the app does with an uploaded bundle:
+checking and decoding it, adding it to a fresh question bank and
+registering it for quizzing.
+
+    python benchmarks/bench_bundle.py                   # 2,000 questions
+    python benchmarks/bench_bundle.py --questions 10000 --budget-ms 3000
+
+The script exits with status 1 when opening the bundle takes over
+--budget-ms or the questions don't come back unchanged.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic  # noqa: E402
+from exam_files import pack_bundle, unpack_bundle  # noqa: E402
+from exam_registry import ExamRegistry  # noqa: E402
+from question_bank import QuestionBank  # noqa: E402
+from question_store import Exam  # noqa: E402
+
+
+def synthetic_questions(count, seed=0):
+    rng = random.Random(seed)
+    questions = []
+    for number in range(1, count + 1):
+        questions.append({
+            "number": number,
+            "text": (f"Which of the following is the most {rng.choice(synthetic.ADJECTIVES)} way "
+                     f"for a {rng.choice(synthetic.NOUNS)} to {rng.choice(synthetic.VERBS)} its "
+                     f"{rng.choice(synthetic.TOPICS)} {synthetic._phrase(rng, rng.randint(2, 18))}?"),
+            "choices": {letter: synthetic._phrase(rng, rng.randint(1, 7)) + "." for letter in "ABCD"},
+            "correct": rng.choice("ABCD"),
+            "explanation": (f"The {rng.choice(synthetic.NOUNS)} should {rng.choice(synthetic.VERBS)} "
+                            f"the {rng.choice(synthetic.TOPICS)} "
+                            f"{synthetic._phrase(rng, rng.randint(10, 40))}."),
+        })
+    return questions
+
+
+def _time(func):
+    started = time.perf_counter()
+    result = func()
+    return (time.perf_counter() - started) * 1000, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark exam bundles")
+    parser.add_argument("--questions", type=int, default=2000)
+    parser.add_argument("--budget-ms", type=float, default=1000.0,
+                        help="budget for opening the bundle (decode, add to the bank, register)")
+    args = parser.parse_args(argv)
+
+    questions = synthetic_questions(args.questions)
+    jsonl_size = sum(len(json.dumps(q, ensure_ascii=False, separators=(",", ":")).encode()) + 1
+                     for q in questions)
+    pack_ms, data = _time(lambda: pack_bundle(questions, "Synthetic exam", "Marketing"))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bank = QuestionBank(os.path.join(tmp, "bank.sqlite3"))
+        registry = ExamRegistry(bank)
+
+        def open_bundle():
+            metadata, unpacked = unpack_bundle(data)
+            exam_id = bank.add_exam(f"bundle:{metadata['sha256']}", metadata["name"], unpacked,
+                                    metadata["cluster"])
+            registry.put(exam_id, Exam.from_dicts(unpacked))
+            return unpacked
+
+        decode_ms, _ = _time(lambda: unpack_bundle(data))
+        open_ms, unpacked = _time(open_bundle)
+
+    print(f"{len(questions):,} questions: bundle {len(data) / 1024:.0f} KB, "
+          f"JSON lines {jsonl_size / 1024:.0f} KB ({len(data) / jsonl_size:.0%})")
+    print(f"{'pack':<8}{pack_ms:>10.1f} ms")
+    print(f"{'decode':<8}{decode_ms:>10.1f} ms")
+    print(f"{'open':<8}{open_ms:>10.1f} ms (budget {args.budget_ms:.0f} ms)")
+
+    failures = []
+    if open_ms > args.budget_ms:
+        failures.append(f"opening took {open_ms:.0f}ms, budget {args.budget_ms:.0f}ms")
+    if unpacked != questions:
+        failures.append("the bundle's questions differ from the packed ones")
+    if failures:
+        print("\nFAILED:")
+        for message in failures:
+            print(f"  ✗ {message}")
+        return 1
+    print("\n✓ Within budget, questions unchanged")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""Checkpoint write-behind benchmark.
+
+Simulates many concurrent quiz sessions clicking through 100-question
+quizzes, each click checkpointing the session (checkpoints.py), and
+measures what a click pays: the time save() takes on the clicking thread.
+For comparison, the same clicks are timed writing each checkpoint to
+SQLite synchronously.
+
+    python benchmarks/bench_checkpoints.py                    # 300 sessions
+    python benchmarks/bench_checkpoints.py --sessions 1000 --clicks 50
+
+The script exits with status 1 when the 99th percentile of save() is over
+--budget-us, or when a session's final checkpoint doesn't read back.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from checkpoints import Checkpoint, CheckpointStore  # noqa: E402
+
+QUIZ_LENGTH = 100
+THREADS = 8
+
+
+def _checkpoint(answers, current):
+    return Checkpoint(1, (1,), np.arange(QUIZ_LENGTH, dtype=np.int32).tobytes(), None,
+                      answers.tobytes(), current, 1, QUIZ_LENGTH, True, False, False)
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    return (statistics.median(samples) * 1e6, samples[int(len(samples) * 0.99)] * 1e6)
+
+
+def simulate(store, sessions, clicks, think_seconds):
+    """Every session answers clicks questions; returns save() latencies and final answers"""
+    latencies = []
+    finals = {}
+    lock = threading.Lock()
+
+    def worker(tokens, seed):
+        rng = random.Random(seed)
+        answers = {token: np.full(QUIZ_LENGTH, -1, dtype=np.int8) for token in tokens}
+        local = []
+        for click in range(clicks):
+            for token in tokens:
+                answers[token][click % QUIZ_LENGTH] = rng.randrange(4)
+                started = time.perf_counter()
+                store.save(token, _checkpoint(answers[token], click % QUIZ_LENGTH))
+                local.append(time.perf_counter() - started)
+            time.sleep(think_seconds)
+        with lock:
+            latencies.extend(local)
+            finals.update(answers)
+
+    tokens = [f"session-{i}" for i in range(sessions)]
+    threads = [threading.Thread(target=worker, args=(tokens[i::THREADS], i)) for i in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, finals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark checkpoint write-behind")
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--clicks", type=int, default=100, help="answers per session")
+    parser.add_argument("--think-ms", type=float, default=10.0, help="pause between rounds of clicks")
+    parser.add_argument("--flush-seconds", type=float, default=0.25)
+    parser.add_argument("--budget-us", type=float, default=500.0,
+                        help="budget for the 99th percentile of a click's save()")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = CheckpointStore(os.path.join(tmp, "behind.sqlite3"), flush_seconds=args.flush_seconds)
+        started = time.perf_counter()
+        latencies, finals = simulate(store, args.sessions, args.clicks, args.think_ms / 1000)
+        elapsed = time.perf_counter() - started
+        store.flush()
+        wrong = sum(1 for token, answers in finals.items()
+                    if store.load(token).answers != answers.tobytes())
+
+        sync_store = CheckpointStore(os.path.join(tmp, "sync.sqlite3"))
+        answers = np.full(QUIZ_LENGTH, -1, dtype=np.int8)
+        sync = []
+        for click in range(min(2000, len(latencies))):
+            answers[click % QUIZ_LENGTH] = click % 4
+            click_started = time.perf_counter()
+            sync_store.save(f"session-{click % args.sessions}", _checkpoint(answers, click % QUIZ_LENGTH))
+            sync_store.flush()
+            sync.append(time.perf_counter() - click_started)
+
+    saves = len(latencies)
+    rows = store.rows_written
+    print(f"{args.sessions} sessions x {args.clicks} clicks = {saves:,} checkpoints in {elapsed:.1f}s "
+          f"({saves / elapsed:,.0f}/s)")
+    print(f"write-behind: {store.flushes} flushes, {rows:,} rows written "
+          f"({saves / max(rows, 1):.1f} clicks per row)")
+    median, p99 = _percentiles(latencies)
+    print(f"{'save() per click':<24}median {median:>8.1f} us   p99 {p99:>8.1f} us")
+    sync_median, sync_p99 = _percentiles(sync)
+    print(f"{'synchronous write':<24}median {sync_median:>8.1f} us   p99 {sync_p99:>8.1f} us")
+
+    failures = []
+    if p99 > args.budget_us:
+        failures.append(f"save() p99 {p99:.0f}us, budget {args.budget_us:.0f}us")
+    if wrong:
+        failures.append(f"{wrong} sessions' last checkpoint didn't read back")
+    if failures:
+        print("\nFAILED:")
+        for message in failures:
+            print(f"  ✗ {message}")
+        return 1
+    print("\n✓ Within budget, every session's last checkpoint stored")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""Near-duplicate detection benchmark.
+
+Builds a synthetic bank of random DECA-style questions (see synthetic.py)
+in which some questions are reused with a word changed and the choices
+reordered, then times fingerprinting and grouping them with dedup.py at
+two bank sizes:
+
+    python benchmarks/bench_dedup.py                    # 20k and 80k questions
+    python benchmarks/bench_dedup.py --questions 5000 --budget-ms 2000
+
+Reports the share of planted duplicates that were grouped with their
+original (recall) and the number of groups that joined unrelated
+questions. The script exits with status 1 when recall is under
+--min-recall, when anything unrelated was joined, when the larger bank
+takes over --budget-ms, or when grouping time grows much faster than the
+bank (more than 6x for a 4x larger bank).
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic  # noqa: E402
+import dedup  # noqa: E402
+from question_store import Question  # noqa: E402
+
+DUPLICATE_SHARE = 0.2
+SCALE = 4
+
+
+def synthetic_bank(count, seed=0):
+    """
+    count Questions and, for each, the index of the original it copies
+    (its own index for originals)
+    """
+    rng = random.Random(seed)
+    questions, original_of = [], []
+    for i in range(count):
+        if questions and rng.random() < DUPLICATE_SHARE:
+            original = rng.randrange(len(questions))
+            while original_of[original] != original:
+                original = original_of[original]
+            source = questions[original]
+            words = source.text.split()
+            words[rng.randrange(len(words))] = rng.choice(synthetic.NOUNS)
+            choices = list(source.choices)
+            rng.shuffle(choices)
+            questions.append(Question(i + 1, " ".join(words), tuple(choices), "A", ""))
+            original_of.append(original)
+            continue
+        stem = (f"Which of the following is the most {rng.choice(synthetic.ADJECTIVES)} way for a "
+                f"{rng.choice(synthetic.NOUNS)} to {rng.choice(synthetic.VERBS)} its "
+                f"{rng.choice(synthetic.TOPICS)} {synthetic._phrase(rng, rng.randint(6, 18))}?")
+        choices = tuple(synthetic._phrase(rng, rng.randint(2, 7)) + "." for _ in range(4))
+        questions.append(Question(i + 1, stem, choices, "A", ""))
+        original_of.append(i)
+    return questions, np.asarray(original_of)
+
+
+def run(count):
+    questions, original_of = synthetic_bank(count)
+    started = time.perf_counter()
+    signatures = dedup.signatures(questions)
+    fingerprint_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    groups = dedup.duplicate_groups(signatures)
+    group_ms = (time.perf_counter() - started) * 1000
+
+    copies = np.flatnonzero(original_of != np.arange(count))
+    recall = float(np.mean(groups[copies] == groups[original_of[copies]])) if len(copies) else 1.0
+    # Every member of a correct group copies the same original
+    originals_per_group = {}
+    for group, original in zip(groups.tolist(), original_of.tolist()):
+        originals_per_group.setdefault(group, set()).add(original)
+    false_merges = sum(1 for originals in originals_per_group.values() if len(originals) > 1)
+    return {
+        "questions": count, "duplicates": len(copies), "fingerprint_ms": fingerprint_ms,
+        "group_ms": group_ms, "recall": recall, "false_merges": false_merges,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark MinHash/LSH duplicate detection")
+    parser.add_argument("--questions", type=int, default=20_000, help="questions in the smaller bank")
+    parser.add_argument("--budget-ms", type=float, default=15000.0,
+                        help="budget for fingerprinting and grouping the larger bank")
+    parser.add_argument("--min-recall", type=float, default=0.95)
+    args = parser.parse_args(argv)
+
+    results = [run(args.questions), run(args.questions * SCALE)]
+    print(f"{'questions':>10}{'duplicates':>12}{'fingerprint ms':>16}{'group ms':>10}"
+          f"{'recall':>8}{'false merges':>14}")
+    for r in results:
+        print(f"{r['questions']:>10,}{r['duplicates']:>12,}{r['fingerprint_ms']:>16.0f}"
+              f"{r['group_ms']:>10.0f}{r['recall']:>8.3f}{r['false_merges']:>14}")
+    small, large = results
+    pairs = large["questions"] * (large["questions"] - 1) // 2
+    print(f"pairwise comparison of the larger bank would check {pairs:,} pairs")
+
+    failures = []
+    for r in results:
+        if r["recall"] < args.min_recall:
+            failures.append(f"recall {r['recall']:.3f} at {r['questions']:,} questions, "
+                            f"minimum {args.min_recall}")
+        if r["false_merges"]:
+            failures.append(f"{r['false_merges']} groups join unrelated questions at {r['questions']:,}")
+    total = large["fingerprint_ms"] + large["group_ms"]
+    if total > args.budget_ms:
+        failures.append(f"{large['questions']:,} questions took {total:.0f}ms, budget {args.budget_ms:.0f}ms")
+    growth = large["group_ms"] / max(small["group_ms"], 1.0)
+    if growth > SCALE * 1.5:
+        failures.append(f"grouping slowed down {growth:.1f}x for a {SCALE}x larger bank")
+    if failures:
+        print("\nFAILED:")
+        for message in failures:
+            print(f"  ✗ {message}")
+        return 1
+    print(f"\n✓ Grouping grew {growth:.1f}x for a {SCALE}x larger bank, within budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
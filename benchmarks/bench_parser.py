@@ -0,0 +1,217 @@
+"""Parser benchmark suite.
+
+Times each parsing phase separately on synthetic exams (see synthetic.py)
+and compares the results with a stored baseline:
+
+    python benchmarks/bench_parser.py                  # run and compare
+    python benchmarks/bench_parser.py --save-baseline  # record a new baseline
+    python benchmarks/bench_parser.py --quick --no-pdf # text phases, small exams
+
+Phases:
+    extract    PDF -> text (extract_pdf_text, serial)
+    fast       PDF -> text with the "fast" engine; the questions and
+               answers parsed from its text must match the layout engine's
+    split      locating the answer key (locate_answer_key)
+    questions  parsing the questions section (parse_questions)
+    key        parsing the answer key section (parse_answer_key)
+Peak memory is measured with tracemalloc over one full text parse.
+
+A phase fails when its median time is more than --tolerance (default 25%)
+and --min-delta-ms (default 2ms) slower than the baseline; the script then
+exits with status 1, as it does when there is no baseline to compare with.
+The committed baseline.json was recorded on a development machine;
+baselines are machine specific, so record one with --save-baseline on the
+machine that runs the comparison.
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic  # noqa: E402
+from deca_parser import (  # noqa: E402
+    extract_pdf_text, locate_answer_key, parse_answer_key, parse_questions
+)
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# (name, generate_exam keyword arguments)
+CASES = [
+    ("labeled-100", dict(num_questions=100, labeled_key=True)),
+    ("labeled-500", dict(num_questions=500, labeled_key=True)),
+    ("labeled-2000", dict(num_questions=2000, labeled_key=True)),
+    ("bare-key-500", dict(num_questions=500, labeled_key=False, explanations=False)),
+    ("unlabeled-2000", dict(num_questions=2000, labeled_key=False)),
+    ("one-column-500", dict(num_questions=500, two_column=0.0)),
+    ("two-column-500", dict(num_questions=500, two_column=1.0)),
+]
+QUICK_CASES = {"labeled-100", "bare-key-500", "two-column-500"}
+
+
+def _time(func, repeat):
+    """
+    Median wall time of func() in milliseconds, and its last result. The
+    garbage collector is paused while timing, as timeit does, so its pauses
+    don't land in whichever phase happens to trigger them.
+    """
+    timings = []
+    result = None
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            result = func()
+            timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            gc.enable()
+    return statistics.median(timings), result
+
+
+def run_case(kwargs, repeat, with_pdf):
+    pages = synthetic.generate_exam(**kwargs)
+    text = "\n".join(pages)
+    results = {"chars": len(text), "pages": len(pages)}
+
+    if with_pdf:
+        pdf_bytes = synthetic.write_pdf(pages)
+        # pdfplumber is slow; a single run is enough signal
+        results["extract_ms"], extracted = _time(
+            lambda: extract_pdf_text(io.BytesIO(pdf_bytes), workers=1), 1)
+        if extracted != text:
+            raise AssertionError("extracted text differs from the generated text")
+        results["fast_ms"], fast_text = _time(
+            lambda: extract_pdf_text(io.BytesIO(pdf_bytes), workers=1, engine="fast"), 1)
+        fast_split = locate_answer_key(fast_text)
+        results["fast_questions"] = len(parse_questions(fast_text[:fast_split.position]))
+        results["fast_answers"] = len(parse_answer_key(fast_text[fast_split.position:])[0])
+
+    results["split_ms"], split = _time(lambda: locate_answer_key(text), repeat)
+    questions_text = text[:split.position]
+    answer_text = text[split.position:]
+    results["questions_ms"], questions = _time(lambda: parse_questions(questions_text), repeat)
+    results["key_ms"], (answer_key, _) = _time(lambda: parse_answer_key(answer_text), repeat)
+
+    tracemalloc.start()
+    split = locate_answer_key(text)
+    parse_questions(text[:split.position])
+    parse_answer_key(text[split.position:])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    results["strategy"] = split.strategy
+    results["questions"] = len(questions)
+    results["answers"] = len(answer_key)
+    results["peak_kb"] = round(peak / 1024)
+    if with_pdf and (results["fast_questions"], results["fast_answers"]) != (len(questions),
+                                                                           len(answer_key)):
+        raise AssertionError(
+            f"fast engine found {results['fast_questions']} questions and "
+            f"{results['fast_answers']} answers, layout {len(questions)} and {len(answer_key)}")
+    return results
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    """Return a list of regression messages"""
+    regressions = []
+    for case, phases in results.items():
+        reference = baseline.get(case)
+        if reference is None:
+            continue
+        # Output changes are regressions too, whatever the timings say
+        for field in ("strategy", "questions", "answers"):
+            if field in reference and phases[field] != reference[field]:
+                regressions.append(f"{case}: {field} changed {reference[field]} -> {phases[field]}")
+        for phase, value in phases.items():
+            if not phase.endswith("_ms") or phase not in reference:
+                continue
+            limit = max(reference[phase] * (1 + tolerance), reference[phase] + min_delta_ms)
+            if value > limit:
+                regressions.append(
+                    f"{case}: {phase[:-3]} {value:.1f}ms vs baseline {reference[phase]:.1f}ms "
+                    f"(+{(value / reference[phase] - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def print_table(results, baseline):
+    columns = ["extract_ms", "fast_ms", "split_ms", "questions_ms", "key_ms"]
+    print(f"{'case':<16}{'extract':>10}{'fast':>10}{'split':>10}{'questions':>11}{'key':>10}"
+          f"{'peak KB':>9}"
+          f"  strategy / questions / answers")
+    for case, phases in results.items():
+        reference = baseline.get(case, {})
+        cells = []
+        for column in columns:
+            if column not in phases:
+                cells.append(f"{'-':>10}")
+                continue
+            cell = f"{phases[column]:.1f}"
+            if column in reference:
+                cell += f"{(phases[column] / reference[column] - 1) * 100:+.0f}%"
+            cells.append(f"{cell:>10}")
+        print(f"{case:<16}{cells[0]}{cells[1]}{cells[2]} {cells[3]}{cells[4]}{phases['peak_kb']:>9}"
+              f"  {phases['strategy']} / {phases['questions']} / {phases['answers']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the DECA exam parser")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per text phase (median is kept)")
+    parser.add_argument("--quick", action="store_true", help="only run a few small cases")
+    parser.add_argument("--no-pdf", action="store_true", help="skip the PDF extraction phase")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline file to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown as a fraction of the baseline")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0,
+                        help="ignore slowdowns smaller than this many milliseconds")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, kwargs in CASES:
+        if args.quick and name not in QUICK_CASES:
+            continue
+        print(f"Running {name}...", file=sys.stderr)
+        results[name] = run_case(kwargs, args.repeat, with_pdf=not args.no_pdf)
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    print_table(results, baseline)
+
+    if args.save_baseline:
+        merged = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as f:
+                merged = json.load(f)
+        merged.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(merged, f, indent=2, sort_keys=True)
+        print(f"\nSaved baseline to {args.baseline}")
+        return 0
+
+    if not baseline:
+        print(f"\nFAILED: no baseline at {args.baseline}; run with --save-baseline to record one")
+        return 1
+
+    regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+    if regressions:
+        print("\nREGRESSIONS:")
+        for message in regressions:
+            print(f"  ✗ {message}")
+        return 1
+    print("\n✓ No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""Startup benchmark: cold import and first render time of the app.
+
+Every measurement runs in a fresh Python process, like a new container:
+
+    import     importing the app's own modules (streamlit is imported
+               first and not counted; its cost is outside our control)
+    first      the first script run of mainapp.py, i.e. a new session's
+               upload screen, run with streamlit's AppTest
+    rerun      the second script run of the same session
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --repeat 5 --render-budget-ms 1500
+
+The median over --repeat processes is checked against the budgets; the
+script exits with status 1 when one is exceeded, or when the upload screen
+loads a module that should only be imported on first use (LAZY_MODULES).
+The question bank and the parse cache point at an empty temporary
+directory, so existing exams don't change the result.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAINAPP = os.path.join(ROOT, "mainapp.py")
+
+# The modules mainapp imports besides streamlit
+APP_MODULES = [
+    "app_style", "attempt_log", "checkpoints", "deca_parser", "dedup", "exam_cache", "exam_files",
+    "exam_registry", "parse_jobs", "parse_metrics", "question_bank", "question_store", "review_scheduler",
+]
+# Only needed once a PDF is uploaded (or never, by the app itself)
+LAZY_MODULES = ["pdfplumber", "pdfminer", "pandas"]
+
+IMPORT_PROBE = """
+import json, sys, time
+import streamlit
+started = time.perf_counter()
+import {modules}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"import_ms": elapsed * 1000,
+                  "loaded": [name for name in {lazy!r} if name in sys.modules]}}))
+"""
+
+RENDER_PROBE = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file({mainapp!r}, default_timeout=120)
+started = time.perf_counter()
+app.run()
+first = time.perf_counter() - started
+loaded = [name for name in {lazy!r} if name in sys.modules]
+started = time.perf_counter()
+app.run()
+rerun = time.perf_counter() - started
+print(json.dumps({{"first_ms": first * 1000, "rerun_ms": rerun * 1000, "loaded": loaded,
+                  "errors": [str(e.value) for e in app.exception]}}))
+"""
+
+
+def _probe(code, env):
+    """Run code in a fresh interpreter and return the JSON it prints last"""
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure(repeat):
+    """Median timings over repeat fresh processes, and the lazy modules any of them loaded"""
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ,
+                   PYTHONPATH=ROOT,
+                   DECA_BANK_DB=os.path.join(tmp, "bank.sqlite3"),
+                   DECA_BANK_DIR=os.path.join(tmp, "banks"),
+                   DECA_CACHE_DIR=os.path.join(tmp, "cache"),
+                   DECA_LOG_LEVEL="WARNING")
+        runs = []
+        for _ in range(repeat):
+            imported = _probe(IMPORT_PROBE.format(modules=", ".join(APP_MODULES),
+                                                  lazy=LAZY_MODULES), env)
+            rendered = _probe(RENDER_PROBE.format(mainapp=MAINAPP, lazy=LAZY_MODULES), env)
+            runs.append((imported, rendered))
+    results = {
+        "import_ms": statistics.median(i["import_ms"] for i, _ in runs),
+        "first_ms": statistics.median(r["first_ms"] for _, r in runs),
+        "rerun_ms": statistics.median(r["rerun_ms"] for _, r in runs),
+    }
+    loaded = sorted({name for i, r in runs for name in i["loaded"] + r["loaded"]})
+    errors = sorted({error for _, r in runs for error in r["errors"]})
+    return results, loaded, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the DECA app's cold start")
+    parser.add_argument("--repeat", type=int, default=3, help="fresh processes to run (median is kept)")
+    parser.add_argument("--import-budget-ms", type=float, default=300.0,
+                        help="budget for importing the app's modules")
+    parser.add_argument("--render-budget-ms", type=float, default=1000.0,
+                        help="budget for the first script run of a session")
+    parser.add_argument("--rerun-budget-ms", type=float, default=200.0,
+                        help="budget for the second script run of a session")
+    args = parser.parse_args(argv)
+
+    results, loaded, errors = measure(args.repeat)
+    budgets = {"import_ms": args.import_budget_ms, "first_ms": args.render_budget_ms,
+               "rerun_ms": args.rerun_budget_ms}
+
+    print(f"{'phase':<10}{'median ms':>12}{'budget ms':>12}")
+    failures = []
+    for phase, value in results.items():
+        print(f"{phase[:-3]:<10}{value:>12.1f}{budgets[phase]:>12.0f}")
+        if value > budgets[phase]:
+            failures.append(f"{phase[:-3]} took {value:.0f}ms, budget {budgets[phase]:.0f}ms")
+    if loaded:
+        failures.append(f"the upload screen imported {', '.join(loaded)}")
+    failures.extend(f"the app raised: {error}" for error in errors)
+
+    if failures:
+        print("\nOVER BUDGET:")
+        for message in failures:
+            print(f"  ✗ {message}")
+        return 1
+    print("\n✓ Within the startup budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""Synthetic DECA-style exams for benchmarking the parser.
+
+generate_exam() lays out a realistic exam as pages of text: running
+headers and footers that is_likely_noise should drop, wrapped question
+stems, one- and two-column answer choices and an answer key, labeled with
+"EXAM—KEY" headers or unlabeled, with explanations and SOURCE lines or as a
+bare list of answers.
+write_pdf() turns those pages into a real PDF without any dependencies, so
+the extraction phase can be benchmarked offline too.
+"""
+import random
+import re
+
+TOPICS = [
+    "pricing", "channel management", "promotion", "selling", "market planning",
+    "financial analysis", "customer relations", "economics", "human resources",
+    "information management", "operations", "professional development",
+]
+NOUNS = [
+    "business", "customer", "manager", "product", "service", "market", "budget",
+    "channel", "retailer", "wholesaler", "price", "brand", "employee", "supplier",
+    "invoice", "contract", "policy", "forecast", "inventory", "promotion",
+]
+VERBS = [
+    "increase", "reduce", "analyze", "evaluate", "monitor", "negotiate",
+    "develop", "communicate", "select", "determine", "establish", "review",
+]
+ADJECTIVES = [
+    "effective", "competitive", "ethical", "financial", "long-term", "primary",
+    "seasonal", "wholesale", "retail", "online", "legal", "strategic",
+]
+LINES_PER_PAGE = 48
+WRAP_CHARS = 95
+
+
+def _phrase(rng, words):
+    parts = []
+    for _ in range(words):
+        parts.append(rng.choice((NOUNS, VERBS, ADJECTIVES, NOUNS))[rng.randrange(12)])
+    return " ".join(parts)
+
+
+def _wrap(text, width=WRAP_CHARS):
+    lines, line = [], ""
+    for word in text.split():
+        if line and len(line) + 1 + len(word) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    if line:
+        lines.append(line)
+    return lines
+
+
+def _question_lines(rng, number, two_column):
+    stem = (f"{number}. Which of the following is the most {rng.choice(ADJECTIVES)} way for a "
+            f"{rng.choice(NOUNS)} to {rng.choice(VERBS)} its {rng.choice(TOPICS)} "
+            f"{_phrase(rng, rng.randint(2, 18))}?")
+    lines = _wrap(stem)
+    choices = [f"{_phrase(rng, rng.randint(1, 7))}." for _ in range(4)]
+    if two_column and max(len(c) for c in choices) < 40:
+        lines.append(f"A. {choices[0]} C. {choices[2]}")
+        lines.append(f"B. {choices[1]} D. {choices[3]}")
+    else:
+        for letter, choice in zip("ABCD", choices):
+            lines.extend(_wrap(f"{letter}. {choice}"))
+    return lines
+
+
+def _key_lines(rng, number, explanations):
+    lines = [f"{number}. {rng.choice('ABCD')}"]
+    if not explanations:
+        return lines
+    explanation = (f"The {rng.choice(NOUNS)} should {rng.choice(VERBS)} the "
+                   f"{rng.choice(TOPICS)} {_phrase(rng, rng.randint(10, 40))}.")
+    lines.extend(_wrap(explanation))
+    lines.append(f"SOURCE: {rng.choice(['PI', 'FI', 'MK', 'SE'])}:{rng.randint(1, 999)} "
+                 f"{_phrase(rng, rng.randint(4, 9))}")
+    return lines
+
+
+def _paginate(blocks, header, first_page):
+    """Lay out blocks of lines onto pages with running headers and footers"""
+    pages, lines = [], []
+    page_number = first_page
+
+    def flush():
+        nonlocal page_number, lines
+        lines.append("Copyright © 2024 by MBA Research and Curriculum Center®, Columbus, Ohio")
+        lines.append(str(page_number))
+        pages.append("\n".join(lines))
+        page_number += 1
+        lines = []
+
+    for block in blocks:
+        if lines and len(lines) + len(block) > LINES_PER_PAGE - 2:
+            flush()
+        if not lines and header:
+            lines.append(header(page_number))
+        lines.extend(block)
+    if lines:
+        flush()
+    return pages
+
+
+def generate_exam(num_questions=100, labeled_key=True, explanations=True, two_column=0.4, seed=0):
+    """
+    Return the exam as a list of page texts, laid out like pdfplumber's
+    extract_text() output of a DECA cluster exam. Without explanations the
+    key is a bare "1. A / 2. C / ..." list.
+    """
+    rng = random.Random(seed)
+    question_blocks = [_question_lines(rng, n, rng.random() < two_column)
+                       for n in range(1, num_questions + 1)]
+    pages = _paginate(question_blocks, lambda page: "Test 1229 FINANCE CLUSTER EXAM 1", 1)
+    pages.insert(0, "\n".join([
+        "Booklet 1229",
+        "FINANCE CLUSTER EXAM",
+        "Posted online January 2024",
+        "Copyright © 2024 by MBA Research and Curriculum Center®, Columbus, Ohio",
+    ]))
+
+    key_blocks = [_key_lines(rng, n, explanations) for n in range(1, num_questions + 1)]
+    if labeled_key:
+        key_header = lambda page: f"FINANCE CLUSTER EXAM—KEY {page}"
+    else:
+        key_header = None
+    pages.extend(_paginate(key_blocks, key_header, len(pages) + 1))
+    return pages
+
+
+def generate_text(**kwargs):
+    """The exam as one string, as extract_pdf_text would return it"""
+    return "\n".join(generate_exam(**kwargs))
+
+
+# Minimal PDF writer: Helvetica text runs at fixed positions, one per line
+# (two for a two-column choice line), which pdfplumber reads back as the
+# same lines of text.
+
+_TWO_COLUMN = re.compile(r'^([A-D]\. .*?) ([A-D]\. .*)$')
+
+
+def _pdf_string(text):
+    escaped = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return escaped.encode("cp1252", errors="replace")
+
+
+def write_pdf(pages, path=None):
+    """Render page texts as a PDF. Returns the PDF bytes (and writes path)"""
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica "
+               b"/Encoding /WinAnsiEncoding >>")
+    pages_id = add(None)  # filled in once the page ids are known
+    kids = []
+    for text in pages:
+        ops = []
+        y = 760
+        for line in text.split("\n"):
+            match = _TWO_COLUMN.match(line)
+            runs = [(56, match.group(1)), (320, match.group(2))] if match else [(56, line)]
+            for x, run in runs:
+                ops.append(b"BT /F1 9 Tf %d %d Td (%s) Tj ET" % (x, y, _pdf_string(run)))
+            y -= 15
+        stream = b"\n".join(ops)
+        content = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>"
+            % (pages_id, font, content)
+        ))
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % kid for kid in kids), len(kids))
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, catalog, xref)
+
+    data = bytes(out)
+    if path:
+        with open(path, "wb") as f:
+            f.write(data)
+    return data
@@ -0,0 +1,272 @@
+"""Durable quiz progress, restorable with a resume token.
+
+Sessions live in Streamlit's memory, so a dropped websocket, a restart or
+a scale-down used to lose a student's attempt. Each session that has an
+exam open gets a resume token (mainapp keeps it in the URL as ?resume=)
+and its progress is checkpointed under it: the exam, the quiz as exam
+positions (exam_registry.Quiz), the answers array, the current question
+and which screen was showing. Opening the URL in a new session restores
+it. During a spaced review only the open exam is kept; review answers
+are saved by review_scheduler as they are graded.
+
+Checkpoints are written behind: save() only puts the snapshot in a dict
+of pending checkpoints, and a writer thread stores everything pending in
+one SQLite transaction every DECA_CHECKPOINT_FLUSH_SECONDS. Several
+clicks of one session between two writes coalesce into one row write,
+and a click never waits for the disk (see benchmarks/bench_checkpoints.py).
+Pending checkpoints are flushed at exit, so only a crash can lose the
+last FLUSH_SECONDS of answers. Checkpoints not updated for
+DECA_CHECKPOINT_DAYS are deleted.
+"""
+import atexit
+import json
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from exam_registry import Quiz, get_registry
+from question_store import NO_ANSWER, Exam, ScoreTracker
+
+log = logging.getLogger("deca.checkpoints")
+
+DB_PATH = os.environ.get(
+    "DECA_CHECKPOINT_DB", os.path.join(os.path.expanduser("~"), ".cache", "decaai", "checkpoints.sqlite3")
+)
+FLUSH_SECONDS = float(os.environ.get("DECA_CHECKPOINT_FLUSH_SECONDS", "1"))
+MAX_AGE_DAYS = float(os.environ.get("DECA_CHECKPOINT_DAYS", "7"))
+
+# Expire old checkpoints at most this often
+_EXPIRE_SECONDS = 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    token TEXT PRIMARY KEY,
+    exam_id INTEGER,
+    exam_ids TEXT NOT NULL,
+    indices BLOB NOT NULL,
+    parts BLOB,
+    answers BLOB NOT NULL,
+    current_question INTEGER NOT NULL,
+    start_question INTEGER NOT NULL,
+    num_questions INTEGER,
+    quiz_started INTEGER NOT NULL,
+    quiz_submitted INTEGER NOT NULL,
+    show_results INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS checkpoints_updated ON checkpoints (updated_at);
+"""
+
+_FIELDS = ("exam_id", "exam_ids", "indices", "parts", "answers", "current_question", "start_question",
+           "num_questions", "quiz_started", "quiz_submitted", "show_results")
+
+
+class Checkpoint(namedtuple("Checkpoint", _FIELDS)):
+    """
+    Snapshot of one session's progress. The quiz arrays are kept as bytes
+    (exam_ids is a tuple of ints) so snapshots compare by value.
+    """
+    __slots__ = ()
+
+
+def new_token():
+    """A fresh, unguessable resume token"""
+    return secrets.token_urlsafe(16)
+
+
+def capture(session):
+    """
+    Checkpoint of the app's session state (a mapping with mainapp's
+    keys). Copies the answers, so later clicks don't change it.
+    """
+    quiz = session["quiz"]
+    if session["review"] is not None:
+        # Reviews resume from the configuration screen
+        quiz = Quiz((), [])
+        started = submitted = shown = False
+        answers = b""
+    else:
+        started = session["quiz_started"]
+        submitted = session["quiz_submitted"]
+        shown = session["show_results"]
+        answers = session["tracker"].answers.tobytes() if started else b""
+    return Checkpoint(
+        session["exam_id"],
+        quiz.exam_ids if started else (),
+        quiz.indices.tobytes() if started else b"",
+        quiz.parts.tobytes() if started and quiz.parts is not None else None,
+        answers,
+        int(session["current_question"]) if started else 0,
+        int(session["start_question"]),
+        session["num_questions"],
+        bool(started), bool(submitted), bool(shown),
+    )
+
+
+def restore(checkpoint, bank=None, registry=None):
+    """
+    Session state values ({key: value}) that bring a new session back to
+    the checkpoint, or None when its exams are no longer in the bank
+    """
+    registry = registry or get_registry()
+    bank = bank or registry.bank
+    exam_ids = set(checkpoint.exam_ids)
+    if checkpoint.exam_id is not None:
+        exam_ids.add(checkpoint.exam_id)
+    if not exam_ids or any(bank.exam_added_at(exam_id) is None for exam_id in exam_ids):
+        return None
+    state = {
+        "exam_id": checkpoint.exam_id,
+        "pdf_loaded": True,
+        "start_question": checkpoint.start_question,
+        "num_questions": checkpoint.num_questions,
+        "quiz_started": checkpoint.quiz_started,
+        "quiz_submitted": checkpoint.quiz_submitted,
+        "show_results": checkpoint.show_results,
+        "current_question": 0,
+        "quiz": Quiz((), [], registry=registry),
+        "tracker": ScoreTracker(Exam([])),
+        "review": None,
+    }
+    if not checkpoint.quiz_started:
+        state["quiz_submitted"] = state["show_results"] = False
+        return state
+    indices = np.frombuffer(checkpoint.indices, dtype=np.int32)
+    parts = None if checkpoint.parts is None else np.frombuffer(checkpoint.parts, dtype=np.uint16)
+    answers = np.frombuffer(checkpoint.answers, dtype=np.int8)
+    try:
+        quiz = Quiz(checkpoint.exam_ids, indices, parts, registry=registry)
+    except IndexError:
+        return None  # the exam was replaced by a shorter one
+    if len(answers) != len(quiz) or not len(quiz):
+        return None
+    tracker = ScoreTracker(quiz)
+    for position in np.flatnonzero(answers != NO_ANSWER):
+        tracker.record(int(position), int(answers[position]))
+    state.update(quiz=quiz, tracker=tracker,
+                 current_question=min(checkpoint.current_question, len(quiz) - 1))
+    return state
+
+
+class CheckpointStore:
+    """
+    SQLite store of checkpoints by resume token with a write-behind
+    queue, safe to share between threads
+    """
+
+    def __init__(self, path=DB_PATH, flush_seconds=FLUSH_SECONDS, max_age_days=MAX_AGE_DAYS):
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self.max_age_days = max_age_days
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            # Commits survive an app crash; a power cut can lose the last
+            # one, which is no worse than the write-behind window
+            self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.executescript(_SCHEMA)
+        # token -> Checkpoint waiting to be written, or None to delete it
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._writer = None
+        self._expired_at = 0.0
+        # Written batches and rows (checkpoints and deletions), by any thread
+        self.flushes = 0
+        self.rows_written = 0
+        atexit.register(self.flush)
+
+    def save(self, token, checkpoint):
+        """Queue a checkpoint; it replaces anything queued for the token"""
+        with self._pending_lock:
+            self._pending[token] = checkpoint
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run, name="deca-checkpoints", daemon=True)
+                self._writer.start()
+        self._wake.set()
+
+    def delete(self, token):
+        """Queue the removal of a token's checkpoint"""
+        self.save(token, None)
+
+    def load(self, token):
+        """The latest checkpoint saved under token, or None"""
+        with self._pending_lock:
+            if token in self._pending:
+                return self._pending[token]
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_FIELDS)} FROM checkpoints WHERE token = ? AND updated_at >= ?",
+                (token, time.time() - self.max_age_days * 86400),
+            ).fetchone()
+        if row is None:
+            return None
+        row = list(row)
+        row[1] = tuple(json.loads(row[1]))
+        for i in (8, 9, 10):
+            row[i] = bool(row[i])
+        return Checkpoint(*row)
+
+    def flush(self):
+        """Write every queued checkpoint now; returns how many were written"""
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        now = time.time()
+        saved = [(token, checkpoint) for token, checkpoint in pending.items() if checkpoint is not None]
+        deleted = [(token,) for token, checkpoint in pending.items() if checkpoint is None]
+        try:
+            with self._lock, self._conn as conn:
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO checkpoints (token, {', '.join(_FIELDS)}, updated_at) "
+                    f"VALUES ({', '.join('?' * (len(_FIELDS) + 2))})",
+                    [(token, checkpoint.exam_id, json.dumps([int(i) for i in checkpoint.exam_ids]),
+                      *checkpoint[2:], now) for token, checkpoint in saved],
+                )
+                conn.executemany("DELETE FROM checkpoints WHERE token = ?", deleted)
+                if now - self._expired_at > _EXPIRE_SECONDS:
+                    conn.execute("DELETE FROM checkpoints WHERE updated_at < ?",
+                                 (now - self.max_age_days * 86400,))
+                    self._expired_at = now
+                self.flushes += 1
+                self.rows_written += len(pending)
+        except sqlite3.Error as e:
+            log.warning("Could not write %d checkpoints: %s", len(pending), e)
+            with self._pending_lock:
+                # Retry later, unless a newer checkpoint was queued meanwhile
+                for token, checkpoint in pending.items():
+                    self._pending.setdefault(token, checkpoint)
+            self._wake.set()
+            return 0
+        return len(pending)
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            # Let the clicks of the next flush_seconds pile up
+            time.sleep(self.flush_seconds)
+            self._wake.clear()
+            self.flush()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_checkpoint_store():
+    """Return the process-wide checkpoint store"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = CheckpointStore()
+        return _store
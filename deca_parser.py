@@ -0,0 +1,1085 @@
+"""PDF parsing for DECA exams.
+
+Kept free of Streamlit so the parser can be reused outside the app.
+pdfplumber and pdfminer are imported on first use (see _open_pdf), so the
+app can import this module for its settings without paying for them
+until a PDF is actually opened.
+"""
+import bisect
+import io
+import logging
+import multiprocessing
+import os
+import re
+import sys
+import threading
+import time
+import types
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import parse_metrics
+from parse_metrics import ParseProfile
+
+# Progress details are logged at DEBUG; each finished parse logs one INFO
+# summary line with its timings (see parse_metrics.py).
+log = logging.getLogger("deca.parser")
+
+# Bump whenever a change here can alter the parsed output, so cached
+# results from an older parser are not served for the same PDF.
+PARSER_VERSION = "2"
+
+# Page extraction is spread over a process pool for documents with at least
+# this many pages; shorter ones are cheaper to extract serially than to ship
+# to worker processes.
+PARALLEL_MIN_PAGES = 12
+# Number of extraction processes (1 disables the pool)
+EXTRACT_WORKERS = int(os.environ.get("DECA_EXTRACT_WORKERS", min(4, os.cpu_count() or 1)))
+
+_pools = {}
+_pools_lock = threading.Lock()
+_main_lock = threading.Lock()
+
+# Precompiled line patterns. Lines are stripped before matching.
+_PAGE_NUMBER = re.compile(r'Page\s+\d+', re.IGNORECASE)
+_EXAM_HEADER = re.compile(r'Test\s+\d+.*EXAM\s+\d+$')
+_NOISE_PREFIXES = ('Copyright', 'Posted online', 'Booklet')
+_QUESTION_START = re.compile(r'(\d+)([\.\)])\s+(.+)')
+_CHOICE_START = re.compile(r'[A-D][\.\)]\s+')
+_CHOICE_MARKER = re.compile(r'([A-D])[\.\)]\s+')
+_ANSWER_TAIL = re.compile(r'([A-D])(?:\s+(.*))?')
+
+def _is_noise_stripped(line):
+    if len(line) < 3:  # Very short (or empty) lines are likely noise
+        return True
+    if line.startswith(_NOISE_PREFIXES):
+        return True
+    if _PAGE_NUMBER.match(line):
+        return True
+    # Header patterns like "Test 1229 FINANCE EXAM 1"
+    if _EXAM_HEADER.match(line) and 'KEY' not in line:
+        return True
+    return False
+
+def is_likely_noise(line):
+    """Check if a line is likely noise (headers, footers, page numbers, etc.)"""
+    return _is_noise_stripped(line.strip())
+
+def parse_two_column_choices(line):
+    """
+    Parse choices that may be in two-column format like:
+    'A. decision. C. privacy.'
+    Returns dict of {letter: text} for all choices found on the line
+    """
+    choices = {}
+    # Split by the letter patterns, which gives us alternating letters and text
+    parts = _CHOICE_MARKER.split(line)
+    
+    # After split: ['', 'A', 'text', 'C', 'more text', ...]
+    # or: ['some text', 'A', 'text', 'C', 'more text', ...]
+    for i in range(1, len(parts), 2):
+        if i+1 < len(parts):
+            letter = parts[i]
+            text = parts[i+1].strip().rstrip('.')
+            if text:  # Only add if there's actual text
+                choices[letter] = text
+    
+    return choices
+
+# Line tokens produced by classify_line
+NOISE = 0      # blank lines, headers, footers, page numbers
+QUESTION = 1   # "12. Question text" (answer key entries like "12. B" too)
+CHOICES = 2    # a line with one or more "A. choice" runs
+TEXT = 3       # anything else: continuation of a question, choice or explanation
+
+def classify_line(line):
+    """
+    Classify one raw line into a (kind, stripped_line, data) token.
+    Every pattern the question and answer-key parsers need is evaluated
+    here exactly once:
+      QUESTION: data = (number, text, answer, bare_answer) where answer is
+                (letter, explanation or None) if the line also reads as an
+                answer key entry, else None, and bare_answer is True for a
+                lone "12. B" line
+      CHOICES:  data = (choices, starts_with_choice); choices may be empty
+                for a line that starts like a choice but has no text
+      NOISE, TEXT: data = None
+    """
+    line = line.strip()
+
+    question_match = _QUESTION_START.match(line)
+    if question_match:
+        text = question_match.group(3)
+        answer = None
+        bare_answer = False
+        if text[0] in 'ABCD':
+            answer_match = _ANSWER_TAIL.fullmatch(text)
+            if answer_match:
+                answer = answer_match.groups()
+                bare_answer = answer[1] is None and question_match.group(2) == '.'
+        return QUESTION, line, (int(question_match.group(1)), text, answer, bare_answer)
+
+    starts_with_choice = _CHOICE_START.match(line) is not None
+    if not starts_with_choice:
+        if _is_noise_stripped(line):
+            return NOISE, line, None
+        if _CHOICE_MARKER.search(line) is None:
+            return TEXT, line, None
+    return CHOICES, line, (parse_two_column_choices(line), starts_with_choice)
+
+def tokenize(text):
+    """Split a section of text into line tokens"""
+    return [classify_line(line) for line in text.split('\n')]
+
+# Answer key detection
+#
+# In order of preference the strategies are:
+#   exam_key     "EXAM—KEY 11" / "EXAM-KEY 11" / "EXAM KEY 11" page headers
+#   answer_key   an "ANSWER KEY" heading
+#   key_header   any "KEY" word followed by a number (e.g. a page number)
+#   sequential   a "1. A / 2. B / 3. C" run of answer lines
+#   density      a 2000-char window holding more than 15 answer lines
+# Only markers after the first 5000 characters count, so a question that
+# mentions a "key" near the start cannot end the questions section.
+#
+# All of them are found by one scan of _KEY_SCAN: every "key" and every
+# answer line is a candidate, and each candidate is checked in place against
+# the strategy patterns.
+_MIN_QUESTIONS_CHARS = 5000
+_KEY_SCAN = re.compile(r'[Kk][Ee][Yy]|\n(?:\s*\d+\.\s+[A-D]\s*\n)')
+_KEY_NUMBER = re.compile(r'\s+\d')
+_KEY_HEADER = re.compile(r'\bKEY\b.*\d', re.IGNORECASE)
+_SEQUENTIAL_ANSWERS = re.compile(r'\n\s*1\.\s+[A-D]\s*\n\s*2\.\s+[A-D]\s*\n\s*3\.\s+[A-D]')
+_STRATEGY_PRIORITY = ("exam_key", "answer_key", "key_header", "sequential")
+_STRATEGY_CONFIDENCE = {
+    "exam_key": 0.95,
+    "answer_key": 0.9,
+    "key_header": 0.6,
+    "sequential": 0.8,
+}
+_DENSITY_CHUNK_CHARS = 2000
+_DENSITY_STEP_CHARS = 1000
+_DENSITY_THRESHOLD = 15
+
+KeySplit = namedtuple("KeySplit", ["position", "strategy", "confidence"])
+
+def _word_before(text, end, separators, word):
+    """
+    Start of `word` (any case) if it ends where a run of separator
+    characters before `end` begins, else None. Whitespace always counts as a
+    separator; at least one separator is required when separators is None.
+    """
+    j = end
+    while j > 0 and (text[j-1].isspace() or (separators and text[j-1] in separators)):
+        j -= 1
+    if separators is None and j == end:
+        return None
+    start = j - len(word)
+    if start >= 0 and text[start:j].lower() == word:
+        return start
+    return None
+
+def _skip_spaces(text, position):
+    """First non-whitespace position at or after position"""
+    while position < len(text) and text[position].isspace():
+        position += 1
+    return position
+
+def _run_newline(text, end):
+    """
+    First newline of the whitespace run before end, where a leftmost regex
+    search for a newline, whitespace and then text[end:] matches (-1 if none)
+    """
+    j = end
+    while j > 0 and text[j-1].isspace():
+        j -= 1
+    return text.find('\n', j, end)
+
+def _key_markers(text, min_position=_MIN_QUESTIONS_CHARS):
+    """
+    Scan text once for answer key candidates.
+    Returns ({strategy: first position after min_position}, answer_line_starts,
+    answer_line_ends).
+    """
+    first = {}
+    answer_starts = []
+    answer_ends = []
+    key_header_end = -1
+
+    def found(strategy, position):
+        if strategy not in first and position > min_position:
+            first[strategy] = position
+
+    for match in _KEY_SCAN.finditer(text):
+        start = match.start()
+        if text[start] == '\n':
+            answer_starts.append(start)
+            answer_ends.append(match.end())
+            if "sequential" not in first:
+                # The "1. A" line is this one or, when this line consumed
+                # its newline, the next one
+                for digit in (_skip_spaces(text, start), _skip_spaces(text, match.end())):
+                    if text.startswith("1.", digit):
+                        position = _run_newline(text, digit)
+                        if _SEQUENTIAL_ANSWERS.match(text, position):
+                            found("sequential", position)
+                            break
+            continue
+
+        # "EXAM—KEY 11": separators back to EXAM, a number after KEY
+        if _KEY_NUMBER.match(text, start + 3):
+            exam_start = _word_before(text, start, "—-", "exam")
+            if exam_start is not None:
+                found("exam_key", exam_start)
+                if "exam_key" in first:
+                    break  # Nothing later can beat the preferred marker
+
+        # "ANSWER KEY"
+        answer_start = _word_before(text, start, None, "answer")
+        if answer_start is not None:
+            found("answer_key", answer_start)
+
+        # "KEY ... 11": a match runs to the last digit of its line, so only
+        # the first qualifying KEY of a line counts
+        if start >= key_header_end:
+            header_match = _KEY_HEADER.match(text, start)
+            if header_match:
+                key_header_end = header_match.end()
+                found("key_header", start)
+
+    return first, answer_starts, answer_ends
+
+def locate_answer_key(text):
+    """
+    Find where the answer key section starts in a single pass over text.
+    Returns KeySplit(position, strategy, confidence); position is len(text)
+    and strategy is None when no answer key was found.
+    """
+    first, answer_starts, answer_ends = _key_markers(text)
+
+    for strategy in _STRATEGY_PRIORITY:
+        position = first.get(strategy)
+        if position is None:
+            continue
+        if strategy == "sequential":
+            # Split at the start of the line before the "1. A" line
+            position = text.rfind('\n', position-100, position) + 1
+        return KeySplit(position, strategy, _STRATEGY_CONFIDENCE[strategy])
+
+    # Slide a fixed-size window over the answer line offsets: the number of
+    # answer lines inside [i, i + chunk) is a difference of two bisections
+    for i in range(_MIN_QUESTIONS_CHARS, len(text) - _DENSITY_CHUNK_CHARS, _DENSITY_STEP_CHARS):
+        inside = (bisect.bisect_right(answer_ends, i + _DENSITY_CHUNK_CHARS)
+                  - bisect.bisect_left(answer_starts, i))
+        if inside > _DENSITY_THRESHOLD:
+            confidence = min(0.75, 0.4 + 0.01 * inside)
+            return KeySplit(i, "density", confidence)
+
+    return KeySplit(len(text), None, 0.0)
+
+def find_answer_key_split(text, profile=None):
+    """
+    Find where the answer key section starts using multiple heuristics.
+    Returns (questions_text, answer_text) tuple
+    """
+    split = locate_answer_key(text)
+    if profile is not None:
+        profile.set("strategy", split.strategy)
+    if split.strategy is None:
+        log.debug("Could not locate answer key section - will parse entire document as questions")
+        return text, ""
+
+    log.debug("Found answer key using %s strategy at position %d (confidence %.2f). "
+              "Context: ...%s...", split.strategy, split.position, split.confidence,
+              text[split.position-20:split.position+50])
+    return text[:split.position], text[split.position:]
+
+@contextmanager
+def spawn_without_main():
+    """
+    Start spawned processes (including pool workers, which start on submit)
+    inside this block. Streamlit installs every script run as __main__, and
+    spawn re-runs __main__'s file in each new process, which would execute
+    the whole app there; the workers only need this module.
+    """
+    with _main_lock:
+        main = sys.modules.get("__main__")
+        placeholder = types.ModuleType("__main__")
+        sys.modules["__main__"] = placeholder
+        try:
+            yield
+        finally:
+            # A script run may have installed its own __main__ meanwhile
+            if sys.modules.get("__main__") is placeholder:
+                sys.modules["__main__"] = main
+
+def _get_pool(workers):
+    """Return a long-lived extraction pool with the given number of workers"""
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            # spawn rather than fork: the Streamlit server is multi-threaded
+            pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            _pools[workers] = pool
+        return pool
+
+# Extraction engines
+#
+#   layout  pdfplumber's page.extract_text()
+#   fast    FastExtractor: lines built straight from pdfminer's character
+#           objects, which pdfplumber's chars are made from, skipping
+#           pdfplumber's object conversion and layout clustering (about 4x
+#           faster). Two-column choices come out as separate lines.
+# A parse with the fast engine is redone with the layout engine when it
+# yields fewer complete, answered questions than FAST_MIN_YIELD of what the
+# answer key and the question numbers promise.
+ENGINES = ("layout", "fast")
+DEFAULT_ENGINE = os.environ.get("DECA_EXTRACT_ENGINE", "layout")
+FAST_MIN_YIELD = float(os.environ.get("DECA_FAST_MIN_YIELD", "0.95"))
+# Gaps (in points) that start a new word, as in extract_text, and that
+# separate columns
+_FAST_X_TOLERANCE = 3
+_FAST_Y_TOLERANCE = 3
+_FAST_COLUMN_GAP = 24
+
+class FastExtractor:
+    """
+    The fast extraction engine. Characters are clustered into lines by
+    their top edge, sorted by x, split into words at gaps of more than
+    _FAST_X_TOLERANCE and into separate lines at column-sized gaps.
+    Keeps one pdfminer interpreter for all pages of a document.
+    """
+
+    def __init__(self):
+        from pdfminer.converter import PDFPageAggregator
+        from pdfminer.layout import LTChar, LTFigure
+        from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+
+        resources = PDFResourceManager(caching=True)
+        self._device = PDFPageAggregator(resources, laparams=None)
+        self._interpreter = PDFPageInterpreter(resources, self._device)
+        self._char_type = LTChar
+        self._figure_type = LTFigure
+
+    def page_text(self, page):
+        """Text of a pdfplumber page, line by line"""
+        self._interpreter.process_page(page.page_obj)
+        chars = []
+        self._collect_chars(self._device.get_result(), chars)
+        chars.sort(key=lambda char: -char.y1)
+        lines = []
+        line = []
+        last_top = None
+        for char in chars:
+            top = -char.y1
+            if line and top - last_top > _FAST_Y_TOLERANCE:
+                lines.extend(_line_segments(line))
+                line = []
+            line.append(char)
+            last_top = top
+        if line:
+            lines.extend(_line_segments(line))
+        return "\n".join(lines)
+
+    def _collect_chars(self, container, chars):
+        for obj in container:
+            if isinstance(obj, self._char_type):
+                chars.append(obj)
+            elif isinstance(obj, self._figure_type):
+                self._collect_chars(obj, chars)
+
+def _line_segments(line):
+    """The text of one line of chars, one string per column"""
+    line.sort(key=lambda char: char.x0)
+    segments = []
+    words = []
+    word = []
+    last_x1 = None
+    for char in line:
+        text = char.get_text()
+        if last_x1 is not None and char.x0 - last_x1 > _FAST_X_TOLERANCE:
+            if word:
+                words.append("".join(word))
+                word = []
+            if words and char.x0 - last_x1 > _FAST_COLUMN_GAP:
+                segments.append(" ".join(words))
+                words = []
+        if text.isspace():
+            if word:
+                words.append("".join(word))
+                word = []
+            continue
+        word.append(text)
+        last_x1 = char.x1
+    if word:
+        words.append("".join(word))
+    if words:
+        segments.append(" ".join(words))
+    return segments
+
+def _page_reader(engine):
+    """Function page -> text for an extraction engine"""
+    if engine == "fast":
+        return FastExtractor().page_text
+    if engine == "layout":
+        return lambda page: page.extract_text() or ""
+    raise ValueError(f"Unknown extraction engine {engine!r}; expected one of {ENGINES}")
+
+def _read_source(pdf_file):
+    """A path or the bytes of pdf_file, which worker processes can open themselves"""
+    if isinstance(pdf_file, (str, os.PathLike)):
+        return os.fspath(pdf_file)
+    if isinstance(pdf_file, bytes):
+        return pdf_file
+    pdf_file.seek(0)
+    return pdf_file.read()
+
+def _open_source(source):
+    return io.BytesIO(source) if isinstance(source, bytes) else source
+
+def _open_pdf(pdf_file):
+    """pdfplumber.open, importing pdfplumber (and pdfminer) on first use"""
+    import pdfplumber
+    return pdfplumber.open(pdf_file)
+
+def _extract_page_range(source, start, stop, engine="layout"):
+    """
+    Worker: extract pages [start, stop) from a PDF path or bytes.
+    Returns a list of (text, seconds) per page.
+    """
+    read_page = _page_reader(engine)
+    pages = []
+    with _open_pdf(_open_source(source)) as pdf:
+        for page in pdf.pages[start:stop]:
+            started = time.perf_counter()
+            text = read_page(page)
+            page.close()
+            pages.append((text, time.perf_counter() - started))
+    return pages
+
+def iter_page_texts(pdf_file, workers=None, profile=None, engine=None):
+    """
+    Yield (page_index, num_pages, text) for every page, in page order,
+    extracted with engine (default DEFAULT_ENGINE).
+    Long documents are split into page ranges extracted in parallel by a
+    process pool; pages are still yielded in order as their range finishes.
+    Open and extraction times are added to profile, if given.
+    """
+    if profile is None:
+        profile = ParseProfile()
+    if workers is None:
+        workers = EXTRACT_WORKERS
+    engine = engine or DEFAULT_ENGINE
+    read_page = _page_reader(engine)
+    profile.set("engine", engine)
+
+    # Workers need their own copy of the document
+    source = _read_source(pdf_file)
+
+    started = time.perf_counter()
+    with _open_pdf(_open_source(source)) as pdf:
+        num_pages = len(pdf.pages)
+        profile.add_time("open", time.perf_counter() - started)
+        if workers <= 1 or num_pages < PARALLEL_MIN_PAGES:
+            profile.set("extract_workers", 1)
+            for index, page in enumerate(pdf.pages):
+                started = time.perf_counter()
+                text = read_page(page)
+                # Drop the page's cached layout objects, or every page's
+                # stays alive until the document is closed
+                page.close()
+                seconds = time.perf_counter() - started
+                profile.add_time("extract", seconds)
+                profile.add_page(seconds)
+                yield index, num_pages, text
+            return
+
+    # A couple of ranges per worker evens out pages of uneven cost
+    num_chunks = min(num_pages, workers * 2)
+    bounds = [num_pages * k // num_chunks for k in range(num_chunks + 1)]
+    profile.set("extract_workers", workers)
+    pool = _get_pool(workers)
+    with spawn_without_main():
+        futures = [
+            pool.submit(_extract_page_range, source, start, stop, engine)
+            for start, stop in zip(bounds, bounds[1:])
+        ]
+    try:
+        for start, future in zip(bounds, futures):
+            # Wall time spent waiting on the pool; per-page times are CPU
+            # time in the workers and overlap each other
+            started = time.perf_counter()
+            pages = future.result()
+            profile.add_time("extract", time.perf_counter() - started)
+            for offset, (text, seconds) in enumerate(pages):
+                profile.add_page(seconds)
+                yield start + offset, num_pages, text
+    finally:
+        for future in futures:
+            future.cancel()
+    log.debug("Extracted %d pages with %d worker processes", num_pages, workers)
+
+def count_pages(pdf_file):
+    """Number of pages in a PDF, without extracting any of them"""
+    with _open_pdf(pdf_file) as pdf:
+        return len(pdf.pages)
+
+def extract_pdf_text(pdf_file, workers=None, profile=None, engine=None):
+    """Extract the text of every page, joined with newlines"""
+    return "\n".join([text for _, _, text in iter_page_texts(pdf_file, workers=workers,
+                                                              profile=profile, engine=engine)])
+
+class QuestionAssembler:
+    """
+    Incrementally assembles questions from the line tokens of the questions
+    section in a single linear pass. Feed tokens in order; feed_token()
+    returns a question dict as soon as its four choices have been seen,
+    otherwise None. Call finish() after the last line.
+    All complete questions are also collected in .questions, and .skipped
+    counts questions dropped for having fewer than four choices
+    """
+
+    def __init__(self):
+        self.questions = []
+        self.skipped = 0
+        self._number = None    # Number of the question being read, None while seeking
+        self._text = ""
+        self._choices = None   # None while reading question text, dict once choices start
+        self._last_letter = None
+
+    def feed(self, line):
+        return self.feed_token(classify_line(line))
+
+    def feed_token(self, token):
+        kind, line, data = token
+
+        if self._number is None:
+            # Look for question start: "1. " or "1) " with text after
+            if kind == QUESTION:
+                self._start(data)
+            return None
+
+        if self._choices is None:
+            # Reading the question text until the first answer choice
+            if kind == CHOICES and data[1]:
+                self._choices = {}
+                self._last_letter = None
+                return self._feed_choice(kind, line, data)
+            if kind == QUESTION:
+                self._finish_current()
+                self._start(data)
+                return None
+            # Add non-noise lines to question text
+            if kind != NOISE:
+                self._text += " " + line
+            return None
+
+        return self._feed_choice(kind, line, data)
+
+    def finish(self):
+        """Flush the question in progress at the end of the section"""
+        if self._number is None:
+            return None
+        return self._finish_current()
+
+    def _start(self, data):
+        self._number = data[0]
+        self._text = data[1]
+        self._choices = None
+
+    def _feed_choice(self, kind, line, data):
+        # Check if we've moved to the next question
+        if kind == QUESTION:
+            self._finish_current()
+            self._start(data)
+            return None
+
+        # Skip noise
+        if kind == NOISE:
+            return None
+
+        choices = self._choices
+        if kind == CHOICES and data[0]:
+            # Add any new choices we found (handles two-column format)
+            for letter, text in data[0].items():
+                if letter not in choices:
+                    choices[letter] = text
+                    if self._last_letter is None or letter > self._last_letter:
+                        self._last_letter = letter
+            if len(choices) == 4:
+                return self._finish_current()
+        elif choices and not (kind == CHOICES and data[1]):
+            # This might be a continuation of the last choice (by letter)
+            choices[self._last_letter] += " " + line
+        return None
+
+    def _finish_current(self):
+        q_num, q_text, choices = self._number, self._text, self._choices or {}
+        self._number = None
+        self._text = ""
+        self._choices = None
+
+        # Only save question if we found all 4 choices
+        if len(choices) == 4:
+            question = {
+                "number": q_num,
+                "text": q_text.strip(),
+                "choices": choices,
+                "correct": None,
+                "explanation": ""
+            }
+            self.questions.append(question)
+
+            # Progress logging
+            if len(self.questions) <= 5 or len(self.questions) % 25 == 0:
+                log.debug("  Q%s: %s...", q_num, q_text[:60])
+            return question
+
+        self.skipped += 1
+        log.debug("  Q%s: Found only %d/4 choices - skipping. Choices: %s",
+                  q_num, len(choices), list(choices.keys()))
+        return None
+
+class AnswerKeyAssembler:
+    """
+    Incrementally parses the line tokens of the answer key section.
+    feed_token() returns (number, letter) whenever a new answer line is seen.
+    Results are collected in .answer_key and .explanations
+    """
+
+    def __init__(self):
+        self.answer_key = {}
+        self.explanations = {}
+        self._number = None
+        self._explanation = ""
+        self._in_source_section = False
+
+    def feed(self, line):
+        return self.feed_token(classify_line(line))
+
+    def feed_token(self, token):
+        kind, line, data = token
+
+        if kind == NOISE:
+            return None
+
+        # Skip SOURCE: sections (common in DECA exams)
+        if line.startswith('SOURCE:'):
+            self._in_source_section = True
+            return None
+
+        # Look for answer pattern: "1. A" or "1. B Some explanation"
+        if kind == QUESTION and data[2] is not None:
+            # Save previous explanation
+            self._save_explanation()
+
+            self._number = data[0]
+            letter, explanation_start = data[2]
+            self.answer_key[self._number] = letter
+
+            # Start new explanation
+            self._explanation = explanation_start if explanation_start else ""
+            self._in_source_section = False
+
+            # Progress logging
+            if len(self.answer_key) <= 5 or len(self.answer_key) % 25 == 0:
+                log.debug("  Q%s: %s", self._number, letter)
+            return self._number, letter
+
+        if self._number and not self._in_source_section:
+            # Continue building explanation, skipping malformed "12. B..." lines
+            if not (kind == QUESTION and data[1][0] in 'ABCD'):
+                if self._explanation:
+                    self._explanation += " " + line
+                else:
+                    self._explanation = line
+        return None
+
+    def finish(self):
+        """Save the last explanation"""
+        self._save_explanation()
+
+    def _save_explanation(self):
+        if self._number and self._explanation:
+            self.explanations[self._number] = self._explanation.strip()
+
+def parse_questions(questions_text, profile=None):
+    """Parse the questions section into a list of question dicts"""
+    assembler = QuestionAssembler()
+    for token in tokenize(questions_text):
+        assembler.feed_token(token)
+    assembler.finish()
+    if profile is not None:
+        profile.count("skipped_questions", assembler.skipped)
+    return assembler.questions
+
+def parse_answer_key(answer_text):
+    """Parse the answer key section into (answer_key, explanations) dicts"""
+    assembler = AnswerKeyAssembler()
+    for token in tokenize(answer_text):
+        assembler.feed_token(token)
+    assembler.finish()
+    return assembler.answer_key, assembler.explanations
+
+def _apply_answer_key(questions, answer_key, explanations):
+    """Assign answers and explanations to questions"""
+    for q in questions:
+        q["correct"] = answer_key.get(q["number"])
+        q["explanation"] = explanations.get(q["number"], "No explanation available.")
+
+def _yield_ok(questions, answer_key, skipped):
+    """
+    Whether a fast-engine parse is good enough to keep: complete, answered
+    questions make up FAST_MIN_YIELD of the larger of the answer key and
+    the questions seen (complete or not)
+    """
+    expected = max(len(answer_key), len(questions) + skipped)
+    answered = sum(1 for q in questions if q["correct"])
+    return expected == 0 or answered >= FAST_MIN_YIELD * expected
+
+def _finish_profile(profile, questions):
+    """Count the results into profile and stop its clock"""
+    profile.count("questions", len(questions))
+    profile.count("answers", sum(1 for q in questions if q["correct"]))
+    profile.count("explanations",
+                  sum(1 for q in questions if q["explanation"] != "No explanation available."))
+    if questions:
+        q_numbers = [q["number"] for q in questions]
+        log.debug("Question range: Q%d to Q%d", min(q_numbers), max(q_numbers))
+    profile.finish()
+
+def extract_questions_and_answers(pdf_file, workers=None, profile=None, engine=None):
+    """
+    Universal PDF parser that works with any DECA exam format.
+    Phase timings and counts are recorded in profile (a new ParseProfile
+    when not given), which is logged and kept by parse_metrics at the end.
+    engine picks the text extraction engine (default DEFAULT_ENGINE); a
+    "fast" parse with a low question yield is redone with "layout".
+    """
+    if profile is None:
+        profile = ParseProfile(getattr(pdf_file, "name", None) or "")
+    engine = engine or DEFAULT_ENGINE
+    profile.set("mode", "batch")
+
+    if engine == "fast":
+        source = _read_source(pdf_file)
+        questions, answer_key, skipped = _parse_text(
+            extract_pdf_text(source, workers=workers, profile=profile, engine="fast"), profile)
+        if _yield_ok(questions, answer_key, skipped):
+            _finish_profile(profile, questions)
+            parse_metrics.record(profile)
+            return questions
+        log.info("Fast extraction of %s found %d of %d questions; retrying with layout extraction",
+                 profile.source or "PDF", len(questions), max(len(answer_key), len(questions) + skipped))
+        profile.retry("fast extraction yield")
+        profile.set("mode", "batch")
+        pdf_file = source
+
+    text = extract_pdf_text(pdf_file, workers=workers, profile=profile, engine="layout")
+    questions, _, _ = _parse_text(text, profile)
+    _finish_profile(profile, questions)
+    parse_metrics.record(profile)
+    return questions
+
+def _parse_text(text, profile):
+    """
+    Split and parse the text of a whole exam.
+    Returns (questions with answers applied, answer_key, skipped questions).
+    """
+    profile.count("chars", len(text))
+    log.debug("Total text length: %s characters", f"{len(text):,}")
+
+    # Split into questions and answers sections
+    with profile.phase("split"):
+        questions_text, answer_text = find_answer_key_split(text, profile)
+    log.debug("Questions section: %s characters, answer section: %s characters",
+              f"{len(questions_text):,}", f"{len(answer_text):,}")
+
+    skipped = profile.counters.get("skipped_questions", 0)
+    with profile.phase("questions"):
+        questions = parse_questions(questions_text, profile)
+    skipped = profile.counters.get("skipped_questions", 0) - skipped
+    log.debug("Extracted %d complete questions", len(questions))
+
+    answer_key = {}
+    explanations = {}
+    if answer_text:
+        with profile.phase("key"):
+            answer_key, explanations = parse_answer_key(answer_text)
+        log.debug("Extracted %d answers and %d explanations", len(answer_key), len(explanations))
+
+    _apply_answer_key(questions, answer_key, explanations)
+    return questions, answer_key, skipped
+
+# Streaming parser
+#
+# stream_exam splits the exam exactly where locate_answer_key splits the
+# whole text, so streaming and batch parses give the same questions.
+# Questions are assembled as pages arrive, but only up to the earliest
+# place the answer key could still start (_key_start_bound): the first
+# key marker or dense window of answer lines found so far, and never
+# within the last _STREAM_HOLDBACK_CHARS, where the next page may still
+# complete a marker. A first "EXAM—KEY" header before that point is final,
+# since no other marker is preferred to it, so its key is parsed as its
+# pages arrive. Otherwise the key is located in the whole text once the
+# last page is read, and the remaining questions and the key are parsed
+# then.
+_STREAM_HOLDBACK_CHARS = _DENSITY_CHUNK_CHARS + _DENSITY_STEP_CHARS
+
+def _key_start_bound(text):
+    """
+    (bound, final): locate_answer_key can't split text, or any text that
+    starts with it, before bound. final is True when bound is an
+    "exam_key" split that no later text can change.
+    """
+    first, answer_starts, answer_ends = _key_markers(text)
+    bound = len(text) - _STREAM_HOLDBACK_CHARS
+    exam_key = first.get("exam_key")
+    if exam_key is not None and exam_key <= bound:
+        return exam_key, True
+    for strategy, position in first.items():
+        if strategy == "sequential":
+            position = text.rfind('\n', position-100, position) + 1
+        bound = min(bound, position)
+    # Windows that end before the held back text are complete
+    for i in range(_MIN_QUESTIONS_CHARS, bound, _DENSITY_STEP_CHARS):
+        inside = (bisect.bisect_right(answer_ends, i + _DENSITY_CHUNK_CHARS)
+                  - bisect.bisect_left(answer_starts, i))
+        if inside > _DENSITY_THRESHOLD:
+            return i, False
+    return bound, False
+
+def stream_exam(pdf_file, workers=None, profile=None, engine=None):
+    """
+    Streaming variant of extract_questions_and_answers, with the same
+    results. Runs page extraction and question assembly as one pipeline
+    and yields events while the document is still being read:
+        ("page", (page_number, num_pages))  after each page is processed
+        ("question", question)              as soon as it is certain to be
+                                            one of the exam's questions
+        ("answer", (number, letter))        as answer key lines are parsed
+        ("restart", engine)                 when a "fast" parse found too few
+                                            questions; everything yielded
+                                            so far is void and the events
+                                            start over with engine
+        ("done", questions)                 once, at the end
+    Answers and explanations are attached to the already-yielded question
+    dicts as the key section is parsed. Timings go to profile as in
+    extract_questions_and_answers, but the finished profile isn't recorded:
+    the consumer passes it to parse_metrics.record, and its total includes
+    the consumer's time.
+    parse_jobs runs it in the parsing process and reports the page and the
+    counts found so far to the upload screen; the exam opens once "done".
+    """
+    if profile is None:
+        profile = ParseProfile(getattr(pdf_file, "name", None) or "")
+    engine = engine or DEFAULT_ENGINE
+    if engine == "fast":
+        # Keep the PDF around for a layout retry
+        pdf_file = _read_source(pdf_file)
+    profile.set("mode", "streaming")
+    questions_asm = QuestionAssembler()
+    answers_asm = AnswerKeyAssembler()
+    by_number = {}
+    text = ""
+    # text[:fed] is fed to questions_asm; it always ends with a newline
+    fed = 0
+    # "questions" while assembling questions, "key" once the split is
+    # final, "wait" when questions may end at bound, until the last page
+    state = "questions"
+
+    def feed_questions(section, events):
+        for token in tokenize(section):
+            question = questions_asm.feed_token(token)
+            if question is not None:
+                by_number.setdefault(question["number"], []).append(question)
+                events.append(("question", question))
+
+    def finish_questions(events):
+        question = questions_asm.finish()
+        if question is not None:
+            by_number.setdefault(question["number"], []).append(question)
+            events.append(("question", question))
+
+    def feed_key(section, events):
+        with profile.phase("key"):
+            for token in tokenize(section):
+                answer = answers_asm.feed_token(token)
+                if answer is not None:
+                    for q in by_number.get(answer[0], ()):
+                        q["correct"] = answer[1]
+                    events.append(("answer", answer))
+
+    for index, num_pages, page_text in iter_page_texts(pdf_file, workers=workers, profile=profile,
+                                                       engine=engine):
+        text = text + "\n" + page_text if index else page_text
+        events = []
+        if state == "key":
+            feed_key(page_text, events)
+        elif state == "questions":
+            with profile.phase("split"):
+                bound, final = _key_start_bound(text)
+            with profile.phase("questions"):
+                if final:
+                    feed_questions(text[fed:bound], events)
+                    finish_questions(events)
+                else:
+                    end = text.rfind('\n', fed, bound)
+                    if end >= fed:
+                        feed_questions(text[fed:end], events)
+                        fed = end + 1
+            if final:
+                log.debug("Found answer key using exam_key strategy at position %d", bound)
+                profile.set("strategy", "exam_key")
+                state = "key"
+                feed_key(text[bound:], events)
+            elif bound < len(text) - _STREAM_HOLDBACK_CHARS:
+                state = "wait"
+        for event in events:
+            yield event
+        yield "page", (index + 1, num_pages)
+
+    if state != "key":
+        events = []
+        with profile.phase("split"):
+            split = locate_answer_key(text)
+        profile.set("strategy", split.strategy)
+        with profile.phase("questions"):
+            feed_questions(text[fed:split.position], events)
+            finish_questions(events)
+        if split.strategy is None:
+            log.debug("Could not locate answer key section - parsed entire document as questions")
+        else:
+            log.debug("Found answer key using %s strategy at position %d", split.strategy, split.position)
+            feed_key(text[split.position:], events)
+        yield from events
+    answers_asm.finish()
+
+    questions = questions_asm.questions
+    profile.count("chars", len(text))
+    profile.count("skipped_questions", questions_asm.skipped)
+    _apply_answer_key(questions, answers_asm.answer_key, answers_asm.explanations)
+    if engine == "fast" and not _yield_ok(questions, answers_asm.answer_key, questions_asm.skipped):
+        log.info("Fast extraction of %s found %d of %d questions; retrying with layout extraction",
+                 profile.source or "PDF", len(questions),
+                 max(len(answers_asm.answer_key), len(questions) + questions_asm.skipped))
+        profile.retry("fast extraction yield")
+        yield "restart", "layout"
+        yield from stream_exam(pdf_file, workers=workers, profile=profile, engine="layout")
+        return
+    _finish_profile(profile, questions)
+    yield "done", questions
+
+# Answer key markers of one page
+#
+# locate_key_pages looks at single pages, so it can't use the priority of
+# locate_answer_key over the whole text. _find_key_start takes the
+# earliest marker on the page; a bare "KEY ... 11" header only counts when
+# answer lines follow it on the page, so "key" inside question text does
+# not make a page a key page.
+_ANSWER_LINE = re.compile(r'^\s*\d+\.\s+[A-D]\s*$')
+
+def _find_key_start(page_text, page_offset):
+    """
+    Return (position, strategy) for where the answer key starts in
+    page_text, or None
+    """
+    # Prefix a newline so a "1. A" run at the top of the page is found too
+    first, _, _ = _key_markers("\n" + page_text, _MIN_QUESTIONS_CHARS - page_offset + 1)
+    candidates = []
+    for strategy, position in first.items():
+        if strategy != "sequential":
+            position -= 1  # undo the prefix; a run starts after its newline
+        if strategy == "key_header":
+            # A bare "KEY ... 11" only counts when answer lines follow it
+            rest = page_text[position:].split('\n')[1:]
+            if sum(1 for line in rest if _ANSWER_LINE.match(line)) < 3:
+                continue
+        candidates.append((position, strategy))
+    return min(candidates) if candidates else None
+
+# Answer key pages
+#
+# Answer keys sit in the last pages of DECA exams, so to re-read only the
+# key, locate_key_pages probes pages from the end with the fast extraction
+# engine. A page belongs to the key when it has a key header or a few
+# "12. B" answer lines; the key starts on the earliest page of that run.
+# The run only counts as a key when one of its pages has a key marker the
+# full parse looks for (see _find_key_start) or answer lines as dense as
+# its density strategy needs, so a key the full parse wouldn't find isn't
+# found here either and refreshed answers match those of a full parse.
+_PROBE_MIN_ANSWER_LINES = 3
+_ANSWER_LINES = re.compile(r'^\s*\d+\.\s+[A-D]\s*$', re.MULTILINE)
+# Page offset past the 5000 character guard, so markers count anywhere on
+# a key page, a "1. A" run on its first line included
+_KEY_PAGE_OFFSET = _MIN_QUESTIONS_CHARS + 2
+
+KeyPages = namedtuple("KeyPages", ["first_page", "num_pages", "strategy"])
+
+def _dense_answer_lines(text):
+    """
+    Whether some _DENSITY_CHUNK_CHARS of text hold more than
+    _DENSITY_THRESHOLD answer lines, counted as locate_answer_key counts them
+    """
+    _, starts, ends = _key_markers("\n" + text, len(text) + 1)
+    first = 0
+    for last, end in enumerate(ends):
+        while starts[first] < end - _DENSITY_CHUNK_CHARS:
+            first += 1
+        if last - first + 1 > _DENSITY_THRESHOLD:
+            return True
+    return False
+
+def locate_key_pages(pdf_file):
+    """
+    Find the answer key pages by probing pages from the last one backwards.
+    Returns KeyPages(first_page, num_pages, strategy), or None when the last
+    page is not part of a key or every page after the first looks like one.
+    """
+    with _open_pdf(_open_source(_read_source(pdf_file))) as pdf:
+        num_pages = len(pdf.pages)
+        extractor = FastExtractor()
+        first_page = strategy = None
+        for index in range(num_pages - 1, 0, -1):
+            text = extractor.page_text(pdf.pages[index])
+            found = _find_key_start(text, _KEY_PAGE_OFFSET)
+            if found is None and len(_ANSWER_LINES.findall(text)) < _PROBE_MIN_ANSWER_LINES:
+                break
+            first_page = index
+            if found is not None:
+                strategy = found[1]
+            elif _dense_answer_lines(text):
+                strategy = "density"
+        else:
+            return None
+    if strategy is None:
+        # Answer lines, but nothing the full parse would take for a key
+        return None
+    log.debug("Answer key on pages %d-%d (%s)", first_page + 1, num_pages, strategy)
+    return KeyPages(first_page, num_pages, strategy)
+
+def _split_key_page(text):
+    """Where the key starts on its first page: the key marker, else the first answer line"""
+    found = _find_key_start(text, _KEY_PAGE_OFFSET)
+    if found is not None:
+        return found[0]
+    match = _ANSWER_LINES.search(text)
+    return match.start() if match else 0
+
+def extract_answer_key(pdf_file):
+    """
+    Extract and parse only the answer key pages, e.g. to refresh the
+    answers of an exam whose questions are already parsed.
+    Returns (answer_key, explanations), both empty when no key is found.
+    """
+    source = _read_source(pdf_file)
+    key_pages = locate_key_pages(source)
+    if key_pages is None:
+        return {}, {}
+    pages = [text for text, _ in _extract_page_range(source, key_pages.first_page,
+                                                     key_pages.num_pages)]
+    pages[0] = pages[0][_split_key_page(pages[0]):]
+    return parse_answer_key("\n".join(pages))
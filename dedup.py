@@ -0,0 +1,280 @@
+"""Near-duplicate question detection with MinHash and LSH.
+
+DECA reuses questions between years, often with a word changed or the
+choices reordered, so a bank built from many exams holds near-duplicates.
+Each question is fingerprinted by the MinHash signature of its shingles:
+3-word windows of its normalized text, and of each choice separately, so
+reordering the choices doesn't change the fingerprint. Two signatures
+agree in a share of their NUM_PERM values that estimates the Jaccard
+similarity of the two shingle sets.
+
+Candidates are found with locality-sensitive hashing instead of comparing
+every pair: the signature is cut into bands, and questions whose
+signatures are equal in any band land in the same bucket. A pair of
+similarity s shares a bucket with probability 1 - (1 - s**r)**b for b
+bands of r values, so the split is derived from DECA_DEDUP_THRESHOLD
+(bands_for): the fewest bands that still miss a pair at the threshold
+less than once in a thousand. For the default 0.7 that is 32 bands of 4
+values, which catch pairs from a similarity of about 0.42 up. Candidates
+are checked against the threshold and joined into groups with a
+union-find, so finding every group is roughly linear in the number of
+questions (see benchmarks/bench_dedup.py).
+
+DuplicateIndex keeps the signatures of the whole question bank,
+fingerprinting only the questions added since it was last refreshed, and
+maps bank row ids to their duplicate group.
+"""
+import os
+import re
+import threading
+import unicodedata
+import zlib
+
+import numpy as np
+
+from question_bank import get_bank
+
+THRESHOLD = float(os.environ.get("DECA_DEDUP_THRESHOLD", "0.7"))
+
+NUM_PERM = 128
+SHINGLE_WORDS = 3
+# Highest chance that LSH misses a pair right at the threshold
+_MAX_MISS = 1e-3
+# Hash functions are fixed, so signatures are comparable between processes
+_SEED = 0x5EED
+# Largest LSH bucket whose every pair is a candidate; the members of a
+# larger one (questions sharing boilerplate wording) are only compared
+# with its first question
+_MAX_BUCKET = 32
+# Shingles hashed per block when computing signatures, to bound memory
+_BLOCK_SHINGLES = 1 << 12
+_EMPTY = np.iinfo(np.uint32).max
+_WORD = re.compile(r"[a-z0-9]+")
+
+_rng = np.random.default_rng(_SEED)
+# Multiply-shift hashing: h(x) = ((a * x + b) mod 2**64) >> 32, a odd
+_A = _rng.integers(0, 2**63, NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_B = _rng.integers(0, 2**63, NUM_PERM, dtype=np.uint64)
+# Per-band multipliers that fold a band of signature values into one key
+_BAND_MIX = _rng.integers(0, 2**63, NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+
+
+def bands_for(threshold):
+    """
+    Number of LSH bands to cut signatures into for a similarity threshold:
+    the fewest (of the even splits of NUM_PERM) that put a pair of that
+    similarity in a shared bucket with probability at least 1 - _MAX_MISS
+    """
+    for rows in range(NUM_PERM, 0, -1):
+        bands = NUM_PERM // rows
+        if NUM_PERM % rows == 0 and 1 - (1 - threshold ** rows) ** bands >= 1 - _MAX_MISS:
+            return bands
+    return NUM_PERM
+
+
+BANDS = bands_for(THRESHOLD)
+
+
+def normalize(text):
+    """Lowercase words of text, without accents or punctuation"""
+    text = text or ""
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return _WORD.findall(text.lower())
+
+
+def shingles(question):
+    """
+    CRC32s of a question's word shingles: SHINGLE_WORDS-word windows of the
+    text and of each choice (a shorter text is one shingle). Takes a
+    question_store.Question.
+    """
+    result = set()
+    for part, segment in enumerate((question.text,) + tuple(sorted(question.choices))):
+        words = normalize(segment)
+        if not words:
+            continue
+        tag = "q" if part == 0 else "c"
+        for i in range(max(1, len(words) - SHINGLE_WORDS + 1)):
+            result.add(zlib.crc32(f"{tag} {' '.join(words[i:i + SHINGLE_WORDS])}".encode()))
+    return result
+
+
+def signatures(questions):
+    """
+    MinHash signatures of questions, an (n, NUM_PERM) uint32 array. A
+    question without any words gets a row of _EMPTY, which never matches.
+    """
+    sets = [np.fromiter(shingles(q), dtype=np.uint64) for q in questions]
+    result = np.full((len(sets), NUM_PERM), _EMPTY, dtype=np.uint32)
+    nonempty = [i for i, s in enumerate(sets) if len(s)]
+    start = 0
+    while start < len(nonempty):
+        # As many questions as fit in a block of shingles (at least one)
+        end, total = start, 0
+        while end < len(nonempty) and (end == start or total + len(sets[nonempty[end]]) <= _BLOCK_SHINGLES):
+            total += len(sets[nonempty[end]])
+            end += 1
+        rows = nonempty[start:end]
+        values = np.concatenate([sets[i] for i in rows])
+        # One row per hash function, so each minimum runs over contiguous memory
+        hashed = _A[:, None] * values[None, :]
+        hashed += _B[:, None]
+        hashed >>= np.uint64(32)
+        offsets = np.cumsum([0] + [len(sets[i]) for i in rows[:-1]])
+        result[rows] = np.minimum.reduceat(hashed, offsets, axis=1).T
+        start = end
+    return result
+
+
+def candidate_pairs(signatures, bands=BANDS):
+    """
+    (first, second) index arrays of the questions that share an LSH bucket
+    in some band, first < second: every pair of a bucket of up to
+    _MAX_BUCKET questions, and each member of a larger bucket paired with
+    the bucket's first question
+    """
+    rows = signatures.shape[1] // bands
+    valid = np.flatnonzero(signatures[:, 0] != _EMPTY)
+    firsts, seconds = [], []
+    for band in range(bands):
+        block = signatures[valid, band * rows:(band + 1) * rows].astype(np.uint64)
+        keys = (block * _BAND_MIX[:rows]).sum(axis=1) + np.uint64(band)
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        same = sorted_keys[1:] == sorted_keys[:-1]
+        if not same.any():
+            continue
+        starts = np.flatnonzero(np.concatenate(([True], ~same)))
+        sizes = np.diff(np.append(starts, len(order)))
+        run = np.repeat(np.arange(len(starts)), sizes)
+        large = sizes[run] > _MAX_BUCKET
+        # Sorted positions followed by another member of their (small) bucket
+        following = np.flatnonzero(same & ~large[1:])
+        gap = 1
+        while len(following):
+            firsts.append(valid[order[following]])
+            seconds.append(valid[order[following + gap]])
+            gap += 1
+            following = following[following + gap < len(order)]
+            following = following[sorted_keys[following + gap] == sorted_keys[following]]
+        members = np.flatnonzero(large & (np.arange(len(order)) != starts[run]))
+        firsts.append(valid[order[starts[run[members]]]])
+        seconds.append(valid[order[members]])
+    if not firsts:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+    first, second = np.concatenate(firsts), np.concatenate(seconds)
+    pairs = np.unique(np.stack([np.minimum(first, second), np.maximum(first, second)], axis=1), axis=0)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def similarity(signatures, first, second):
+    """Estimated Jaccard similarity of the questions at index arrays first and second"""
+    return (signatures[first] == signatures[second]).mean(axis=1)
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def duplicate_groups(signatures, threshold=THRESHOLD):
+    """
+    Group label of every question: the index of the first question of its
+    near-duplicate group (its own index when it has no duplicates)
+    """
+    n = len(signatures)
+    first, second = candidate_pairs(signatures, bands_for(threshold))
+    keep = similarity(signatures, first, second) >= threshold
+    parent = list(range(n))
+    for a, b in zip(first[keep].tolist(), second[keep].tolist()):
+        root_a, root_b = _find(parent, a), _find(parent, b)
+        if root_a != root_b:
+            parent[max(root_a, root_b)] = min(root_a, root_b)
+    return np.fromiter((_find(parent, i) for i in range(n)), dtype=np.int64, count=n)
+
+
+class DuplicateIndex:
+    """
+    Near-duplicate groups of every question in the bank, safe to share
+    between threads. Each question is fingerprinted once; refresh() picks
+    up added and removed exams.
+    """
+
+    def __init__(self, bank=None, threshold=THRESHOLD):
+        self._bank = bank
+        self.threshold = threshold
+        self._ids = np.empty(0, dtype=np.int64)
+        self._signatures = np.empty((0, NUM_PERM), dtype=np.uint32)
+        self._groups = np.empty(0, dtype=np.int64)
+        self._lock = threading.Lock()
+
+    @property
+    def bank(self):
+        if self._bank is None:
+            self._bank = get_bank()
+        return self._bank
+
+    def refresh(self):
+        """Bring the index up to date with the bank; cheap when nothing changed"""
+        ids = np.asarray(sorted(self.bank.question_ids()), dtype=np.int64)
+        with self._lock:
+            if np.array_equal(ids, self._ids):
+                return
+            kept = np.isin(self._ids, ids)
+            new_ids = ids[~np.isin(ids, self._ids)]
+            rows = self.bank.question_rows(new_ids.tolist())
+            new_ids = np.asarray([row_id for row_id, _ in rows], dtype=np.int64)
+            all_ids = np.concatenate([self._ids[kept], new_ids])
+            all_signatures = np.concatenate([self._signatures[kept],
+                                             signatures([q for _, q in rows])])
+            order = np.argsort(all_ids, kind="stable")
+            self._ids = all_ids[order]
+            self._signatures = all_signatures[order]
+            # Labels are bank row ids, so they stay meaningful to callers
+            self._groups = self._ids[duplicate_groups(self._signatures, self.threshold)]
+
+    def groups(self, row_ids):
+        """
+        Group of each bank row id (the smallest row id among its near
+        duplicates), or the row id itself when it isn't indexed
+        """
+        self.refresh()
+        row_ids = np.asarray(row_ids, dtype=np.int64)
+        with self._lock:
+            ids, groups = self._ids, self._groups
+        if not len(ids):
+            return row_ids
+        positions = np.minimum(np.searchsorted(ids, row_ids), len(ids) - 1)
+        return np.where(ids[positions] == row_ids, groups[positions], row_ids)
+
+    def distinct(self, row_ids):
+        """row_ids without near duplicates: the first of each group, in order"""
+        row_ids = list(row_ids)
+        _, first = np.unique(self.groups(row_ids), return_index=True)
+        return [row_ids[i] for i in np.sort(first)]
+
+    def clusters(self):
+        """Row ids of every group of two or more near duplicates"""
+        self.refresh()
+        with self._lock:
+            ids, groups = self._ids, self._groups
+        order = np.argsort(groups, kind="stable")
+        boundaries = np.flatnonzero(np.diff(groups[order])) + 1
+        return [cluster for cluster in np.split(ids[order], boundaries) if len(cluster) > 1]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_duplicate_index():
+    """Return the process-wide duplicate index"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = DuplicateIndex()
+        return _index
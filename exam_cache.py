@@ -0,0 +1,141 @@
+"""Content-addressed cache of parsed exams.
+
+Parsed question lists are keyed by a SHA-256 of the uploaded PDF bytes plus
+the parser version, so uploading the same exam again never reopens the PDF.
+The cache is an on-disk LRU of JSON files that survives restarts, bounded
+by DECA_CACHE_DISK_MB. It holds parse results only until the app adds them
+to the question bank; from then on sessions share the exam through
+exam_registry, so the cache keeps no copy in memory.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from deca_parser import PARSER_VERSION
+
+log = logging.getLogger("deca.cache")
+
+CACHE_DIR = os.environ.get(
+    "DECA_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "decaai", "exams")
+)
+DISK_MAX_BYTES = int(os.environ.get("DECA_CACHE_DISK_MB", "512")) * 1024 * 1024
+_HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def exam_key(pdf):
+    """
+    Cache key for an uploaded PDF (bytes, or a binary file read in chunks):
+    content hash plus parser version
+    """
+    if isinstance(pdf, (bytes, bytearray, memoryview)):
+        digest = hashlib.sha256(pdf)
+    else:
+        digest = hashlib.sha256()
+        pdf.seek(0)
+        for chunk in iter(lambda: pdf.read(_HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+        pdf.seek(0)
+    return f"{digest.hexdigest()}-v{PARSER_VERSION}"
+
+
+class ExamCache:
+    """On-disk LRU cache of parsed question lists"""
+
+    def __init__(self, cache_dir=CACHE_DIR, disk_max_bytes=DISK_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.disk_max_bytes = disk_max_bytes
+
+    def get(self, key):
+        """Return the cached question list for key, or None"""
+        payload = self._read_disk(key)
+        if payload is None:
+            return None
+        return json.loads(payload)
+
+    def put(self, key, questions):
+        """Store a question list; raises OSError when it can't be written"""
+        self._write_disk(key, json.dumps(questions, ensure_ascii=False, separators=(",", ":")))
+
+    def clear(self):
+        """Drop every cached exam"""
+        for path, _, _ in self._disk_entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def _read_disk(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                payload = f.read()
+            # Touch the file so eviction sees it as recently used
+            os.utime(path)
+        except OSError:
+            return None
+        return payload
+
+    def _write_disk(self, key, payload):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        self._evict_disk()
+
+    def _disk_entries(self):
+        """List (path, size, mtime) for every cached file"""
+        entries = []
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return entries
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _evict_disk(self):
+        entries = self._disk_entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.disk_max_bytes:
+            return
+        # Oldest first, but never evict the file we just wrote
+        entries.sort(key=lambda e: e[2])
+        for path, size, _ in entries[:-1]:
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.disk_max_bytes:
+                break
+
+
+# Process-wide instance shared by all Streamlit sessions
+_cache = ExamCache()
+
+
+def get_cache():
+    """Return the process-wide exam cache"""
+    return _cache
+
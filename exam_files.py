@@ -0,0 +1,201 @@
+"""Reading and writing pre-parsed exams.
+
+A question bank file holds one exam as JSON lines: one question dict per
+line, exactly as extract_questions_and_answers returns them. Bank files are
+written by batch_parse.py and loaded by the app without touching the PDF.
+
+An exam bundle is a single portable file for handing a parsed exam to
+another deployment:
+
+    magic        8 bytes, BUNDLE_MAGIC
+    format       uint16 BUNDLE_FORMAT, big endian
+    header size  uint32, big endian
+    header       UTF-8 JSON: format, name, cluster, parser_version,
+                 num_questions, created_at, payload_size and sha256 (hex
+                 digest of the payload)
+    payload      zlib-compressed UTF-8 JSON of the questions by column:
+                 {"number": [...], "text": [...], "choices": {"A": [...],
+                 ...}, "correct": [...], "explanation": [...]}, with null
+                 for a missing choice
+
+A bundle is read with one read and decoded without pdfplumber. Bundles
+with a newer format, a bad checksum or malformed questions (fields
+missing or of the wrong type, an answer other than A-D) raise
+BundleError. Bundles dropped into the bank directory are imported like
+bank files (a bank file of the same name wins).
+"""
+import hashlib
+import json
+import os
+import struct
+import time
+import zlib
+
+from deca_parser import PARSER_VERSION
+
+BANK_SUFFIX = ".jsonl"
+BANK_DIR = os.environ.get("DECA_BANK_DIR", "question_banks")
+
+BUNDLE_SUFFIX = ".decaexam"
+BUNDLE_MAGIC = b"DECAEXAM"
+BUNDLE_FORMAT = 1
+_BUNDLE_PREFIX = struct.Struct(">8sHI")
+_CHOICE_LETTERS = "ABCD"
+
+
+class BundleError(ValueError):
+    """The data is not a readable exam bundle"""
+
+
+def write_bank(path, questions):
+    """Write a question list to a bank file (atomically)"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for q in questions:
+            f.write(json.dumps(q, ensure_ascii=False, separators=(",", ":")))
+            f.write("\n")
+    os.replace(tmp_path, path)
+
+
+def read_bank(path):
+    """
+    Read a bank file (or bundle) back into a question list. Raises
+    ValueError (BundleError for a bundle) for a malformed file.
+    """
+    if path.endswith(BUNDLE_SUFFIX):
+        return read_bundle(path)[1]
+    with open(path, "rb") as f:
+        lines = f.read().splitlines()
+    try:
+        questions = [json.loads(line) for line in lines if line.strip()]
+        for q in questions:
+            _check_question(q)
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f"Malformed bank file: {e}") from None
+    return questions
+
+
+def list_banks(bank_dir=BANK_DIR):
+    """Return {exam name: path} for every bank file and bundle in bank_dir"""
+    try:
+        names = sorted(os.listdir(bank_dir))
+    except OSError:
+        return {}
+    banks = {}
+    # Bundles first, so a bank file of the same name replaces its entry
+    for suffix in (BUNDLE_SUFFIX, BANK_SUFFIX):
+        for name in names:
+            if name.endswith(suffix):
+                banks[name[:-len(suffix)]] = os.path.join(bank_dir, name)
+    return banks
+
+
+def pack_bundle(questions, name, cluster=None, parser_version=PARSER_VERSION):
+    """
+    An exam bundle (bytes) of a question list; parser_version is that of
+    the parser that produced the questions
+    """
+    columns = {
+        "number": [q["number"] for q in questions],
+        "text": [q["text"] for q in questions],
+        "choices": {letter: [q["choices"].get(letter) for q in questions]
+                    for letter in _CHOICE_LETTERS},
+        "correct": [q["correct"] for q in questions],
+        "explanation": [q["explanation"] for q in questions],
+    }
+    payload = zlib.compress(
+        json.dumps(columns, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 9)
+    header = json.dumps({
+        "format": BUNDLE_FORMAT,
+        "name": name,
+        "cluster": cluster,
+        "parser_version": parser_version,
+        "num_questions": len(questions),
+        "created_at": time.time(),
+        "payload_size": len(payload),
+        "sha256": hashlib.sha256(payload).hexdigest(),
+    }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return _BUNDLE_PREFIX.pack(BUNDLE_MAGIC, BUNDLE_FORMAT, len(header)) + header + payload
+
+
+def bundle_metadata(data):
+    """
+    The header dict of a bundle, without decompressing or checking the
+    questions (e.g. to look the bundle up by its sha256 first)
+    """
+    return _split_bundle(data)[0]
+
+
+def _split_bundle(data):
+    if len(data) < _BUNDLE_PREFIX.size:
+        raise BundleError("File is too short to be an exam bundle")
+    magic, version, header_size = _BUNDLE_PREFIX.unpack_from(data)
+    if magic != BUNDLE_MAGIC:
+        raise BundleError("Not an exam bundle")
+    if version > BUNDLE_FORMAT:
+        raise BundleError(f"Bundle format {version} is newer than this version of the app "
+                          f"supports ({BUNDLE_FORMAT})")
+    start = _BUNDLE_PREFIX.size
+    try:
+        metadata = json.loads(bytes(data[start:start + header_size]).decode("utf-8"))
+    except ValueError as e:
+        raise BundleError(f"Damaged bundle header: {e}") from None
+    if not isinstance(metadata, dict) or "sha256" not in metadata:
+        raise BundleError("Damaged bundle header")
+    return metadata, data[start + header_size:]
+
+
+def unpack_bundle(data):
+    """(metadata, question list) of a bundle's bytes"""
+    metadata, payload = _split_bundle(data)
+    if (len(payload) != metadata.get("payload_size")
+            or hashlib.sha256(payload).hexdigest() != metadata["sha256"]):
+        raise BundleError("Bundle checksum mismatch: the file is truncated or damaged")
+    try:
+        columns = json.loads(zlib.decompress(payload).decode("utf-8"))
+        choices = columns["choices"]
+        questions = [
+            {
+                "number": number,
+                "text": text,
+                "choices": {letter: choice for letter, choice in zip(_CHOICE_LETTERS, row)
+                            if choice is not None},
+                "correct": correct,
+                "explanation": explanation,
+            }
+            for number, text, correct, explanation, *row in zip(
+                columns["number"], columns["text"], columns["correct"], columns["explanation"],
+                *(choices[letter] for letter in _CHOICE_LETTERS), strict=True)
+        ]
+        for q in questions:
+            _check_question(q)
+    except (ValueError, KeyError, TypeError, zlib.error) as e:
+        raise BundleError(f"Malformed bundle questions: {e}") from None
+    return metadata, questions
+
+
+def _check_question(q):
+    """Raise ValueError unless q has the fields and types the question bank stores"""
+    if type(q["number"]) is not int:
+        raise ValueError(f"number {q['number']!r} is not an integer")
+    for field in ("text", "explanation"):
+        if not isinstance(q[field], str):
+            raise ValueError(f"Q{q['number']} {field} is not text")
+    if not all(isinstance(choice, str) for choice in q["choices"].values()):
+        raise ValueError(f"Q{q['number']} has a choice that is not text")
+    if q["correct"] is not None and q["correct"] not in tuple(_CHOICE_LETTERS):
+        raise ValueError(f"Q{q['number']} answer {q['correct']!r} is not one of {', '.join(_CHOICE_LETTERS)}")
+
+
+def write_bundle(path, questions, name, cluster=None):
+    """Write a question list to a bundle file (atomically)"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(pack_bundle(questions, name, cluster))
+    os.replace(tmp_path, path)
+
+
+def read_bundle(path):
+    """(metadata, question list) of a bundle file"""
+    with open(path, "rb") as f:
+        return unpack_bundle(f.read())
@@ -0,0 +1,212 @@
+"""Process-wide registry of parsed exams, shared by every session.
+
+Exams are loaded from the question bank (question_bank.py) once per process
+and kept as immutable Exam objects (question_store.py). Sessions never hold
+questions themselves; they keep a bank exam id and a Quiz, which is just
+the positions of the quiz questions inside registered exams plus
+references to those shared exams.
+
+Per-session footprint
+---------------------
+For a quiz of n questions a session holds:
+
+    exam_id                     one int
+    Quiz.indices                int32, 4n bytes
+    Quiz.parts                  uint16, 2n bytes (only for quizzes drawn
+                                from several exams)
+    Quiz.key                    int8 answer key, n bytes
+    Quiz exams                  a reference per exam the quiz draws from
+    ScoreTracker.answers        int8, n bytes
+    fixed overhead              about 1.5 KB of Python objects and the
+                                other session_state flags
+
+so about 6-8 bytes per question: a 100-question quiz costs about 2 KB per
+student, and 500 students about 1 MB. The only other per-session data is
+the results page's review cards (see mainapp.review_cards), roughly 1 KB
+of HTML per missed question while the results are being viewed, and
+during a spaced review the ReviewScheduler (review_scheduler.py), a few
+hundred bytes per card in the learner's history. The last checkpoint
+(checkpoints.py) adds a byte copy of the quiz and answers, about 7 bytes
+per question.
+The exams themselves are paid for once per process, bounded by
+DECA_REGISTRY_EXAMS (least recently used exams are dropped and reloaded
+from the bank on demand). A quiz keeps its own exams loaded while a session
+holds it, so a quiz drawn from more exams than that doesn't evict its own
+questions; those exams are shared again once it is reloaded. An exam replaced in the bank (e.g. a bank file
+re-imported after batch_parse.py --key-only) gets a new exam id, and the
+registry drops the old one.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from question_bank import get_bank
+
+MAX_EXAMS = int(os.environ.get("DECA_REGISTRY_EXAMS", "64"))
+
+
+class ExamRegistry:
+    """
+    LRU of bank exam id -> (Exam, question row ids). Entries are immutable
+    and shared between sessions; anything evicted is reloaded from the bank.
+    """
+
+    def __init__(self, bank=None, max_exams=MAX_EXAMS):
+        self._bank = None
+        self.max_exams = max_exams
+        self._entries = OrderedDict()
+        # Ids of exams replaced in the bank since the registry was created
+        self._replaced = set()
+        self._lock = threading.Lock()
+        if bank is not None:
+            self._attach(bank)
+
+    @property
+    def bank(self):
+        if self._bank is None:
+            self._attach(get_bank())
+        return self._bank
+
+    def _attach(self, bank):
+        bank.on_exam_replaced(self._drop_replaced)
+        self._bank = bank
+
+    def _drop_replaced(self, exam_id):
+        with self._lock:
+            self._entries.pop(exam_id, None)
+            self._replaced.add(exam_id)
+
+    def replaced(self, exam_ids):
+        """Whether any of exam_ids was replaced in the bank, so quizzes of it can't be served"""
+        with self._lock:
+            return not self._replaced.isdisjoint(exam_ids)
+
+    def get(self, exam_id):
+        """The Exam stored in the bank under exam_id"""
+        return self._entry(exam_id)[0]
+
+    def row_ids(self, exam_id):
+        """Bank row id of each question of the exam, as a read-only int64 array"""
+        return self._entry(exam_id)[1]
+
+    def put(self, exam_id, exam):
+        """
+        Register an exam that was just parsed and added to the bank, so it
+        doesn't have to be read back. It must be in the bank's order.
+        """
+        row_ids = self._row_ids(exam_id)
+        if len(row_ids) != len(exam):
+            raise ValueError(f"Exam {exam_id} has {len(row_ids)} questions in the bank, not {len(exam)}")
+        self._remember(exam_id, (exam, row_ids))
+        return exam
+
+    def _entry(self, exam_id):
+        with self._lock:
+            entry = self._entries.get(exam_id)
+            if entry is not None:
+                self._entries.move_to_end(exam_id)
+                return entry
+        entry = (self.bank.load_exam(exam_id), self._row_ids(exam_id))
+        self._remember(exam_id, entry)
+        return entry
+
+    def _row_ids(self, exam_id):
+        row_ids = np.asarray(self.bank.question_row_ids(exam_id), dtype=np.int64)
+        row_ids.flags.writeable = False
+        return row_ids
+
+    def _remember(self, exam_id, entry):
+        with self._lock:
+            self._entries[exam_id] = entry
+            self._entries.move_to_end(exam_id)
+            while len(self._entries) > self.max_exams:
+                self._entries.popitem(last=False)
+
+    def quiz_from_range(self, exam_id, start, count):
+        """A Quiz of the questions numbered start .. start + count - 1"""
+        return Quiz((exam_id,), self.get(exam_id).select_range(start, count), registry=self)
+
+    def quiz_from_rows(self, row_ids):
+        """A Quiz of bank question rows (e.g. a sample or search result), in that order"""
+        exam_of = self.bank.question_exams(row_ids)
+        row_ids = [row_id for row_id in row_ids if row_id in exam_of]
+        exam_ids = sorted(set(exam_of.values()))
+        part_of = {exam_id: part for part, exam_id in enumerate(exam_ids)}
+        parts = np.fromiter((part_of[exam_of[row_id]] for row_id in row_ids), dtype=np.uint16,
+                            count=len(row_ids))
+        rows = np.asarray(row_ids, dtype=np.int64)
+        indices = np.empty(len(rows), dtype=np.int32)
+        entries = [self._entry(exam_id) for exam_id in exam_ids]
+        for part, (_, exam_rows) in enumerate(entries):
+            mask = parts == part
+            # Exams are stored in row id order, so a row's position is its rank
+            indices[mask] = np.searchsorted(exam_rows, rows[mask])
+        if len(exam_ids) == 1:
+            parts = None
+        return Quiz(exam_ids, indices, parts, registry=self, entries=entries)
+
+
+class Quiz:
+    """
+    The questions of one quiz as positions in registered exams.
+        exam_ids  the bank exams the questions come from
+        indices   int32 position of each question in its exam
+        parts     uint16 index into exam_ids per question, or None when
+                  every question comes from exam_ids[0]
+        key       int8 answer key, for scoring
+    Supports len(), indexing and iteration like an Exam. The quiz holds on to
+    the registry's (Exam, row ids) entry of each of its exams, so serving
+    it never reloads an exam the registry has evicted meanwhile.
+    """
+    __slots__ = ("exam_ids", "indices", "parts", "key", "_entries")
+
+    def __init__(self, exam_ids, indices, parts=None, registry=None, entries=None):
+        registry = registry or get_registry()
+        self.exam_ids = tuple(exam_ids)
+        if entries is None:
+            entries = [registry._entry(exam_id) for exam_id in self.exam_ids]
+        self._entries = tuple(entries)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.parts = None if parts is None else np.asarray(parts, dtype=np.uint16)
+        key = np.empty(len(self.indices), dtype=np.int8)
+        for part, (exam, _) in enumerate(self._entries):
+            mask = slice(None) if self.parts is None else self.parts == part
+            key[mask] = exam.key[self.indices[mask]]
+        key.flags.writeable = False
+        self.key = key
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, position):
+        part = 0 if self.parts is None else self.parts[position]
+        return self._entries[part][0][self.indices[position]]
+
+    def __iter__(self):
+        for position in range(len(self.indices)):
+            yield self[position]
+
+    def row_ids(self):
+        """Bank row id of each question, as an int64 array"""
+        row_ids = np.empty(len(self.indices), dtype=np.int64)
+        for part, (_, exam_rows) in enumerate(self._entries):
+            mask = slice(None) if self.parts is None else self.parts == part
+            row_ids[mask] = exam_rows[self.indices[mask]]
+        return row_ids
+
+    def question_exam_ids(self):
+        """Bank exam id of each question, as an int64 array"""
+        exam_ids = np.asarray(self.exam_ids, dtype=np.int64)
+        if self.parts is None:
+            return np.full(len(self.indices), exam_ids[0] if len(exam_ids) else 0, dtype=np.int64)
+        return exam_ids[self.parts]
+
+
+_registry = ExamRegistry()
+
+
+def get_registry():
+    """Return the process-wide exam registry"""
+    return _registry
@@ -1,98 +1,49 @@
+import os
+import random
+import time
+import uuid
+
 import streamlit as st
-import pdfplumber
-import re
-import pandas as pd
+
+import app_style
+import attempt_log
+import checkpoints
+import dedup
+import exam_cache
+import parse_jobs
+import parse_metrics
+from deca_parser import DEFAULT_ENGINE, PARSER_VERSION
+from exam_files import (BUNDLE_SUFFIX, BundleError, bundle_metadata, list_banks, pack_bundle,
+                        unpack_bundle)
+from exam_registry import Quiz, get_registry
+from question_bank import get_bank, import_bank_files
+from question_store import LETTERS, NO_ANSWER, Exam, ScoreTracker, wrong_answer_details
+from review_scheduler import get_review_store, start_review
 
 st.set_page_config(page_title="DECA Quiz", layout="centered", initial_sidebar_state="collapsed")
+parse_metrics.configure_logging()
+run_started = time.perf_counter()
+
+# Parse profiles are shown in the sidebar with DECA_ADMIN=1 or ?admin=1
+ADMIN_PROFILES = 10
+# Mistakes shown per page on the results screen
+REVIEW_PAGE_SIZE = 10
+# How often the upload screen checks on a background parse
+PARSE_POLL_SECONDS = 0.5
+
+st.markdown(app_style.CSS, unsafe_allow_html=True)
 
-# Custom CSS for card styling
-st.markdown("""
-    <style>
-        .question-card {
-            background: white;
-            border-radius: 12px;
-            padding: 2rem;
-            box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-            margin: 0 auto;
-        }
-        .choice-button {
-            width: 100%;
-            padding: 1rem;
-            margin: 0.5rem 0;
-            border: 2px solid #e5e7eb;
-            border-radius: 8px;
-            background: white;
-            cursor: pointer;
-            transition: all 0.2s;
-            text-align: left;
-        }
-        .choice-button:hover {
-            border-color: #9ca3af;
-            background: #f9fafb;
-        }
-        .choice-button.selected {
-            border-color: #333;
-            background: #f3f4f6;
-        }
-        .score-card {
-            background: #f3f4f6;
-            color: #333;
-            padding: 1.5rem;
-            border-radius: 12px;
-            text-align: center;
-            margin: 1rem 0;
-        }
-        .correct-card {
-            background: #ecfdf5;
-            color: #065f46;
-            padding: 1.5rem;
-            border-radius: 12px;
-            text-align: center;
-        }
-        .incorrect-card {
-            background: #fef2f2;
-            color: #991b1b;
-            padding: 1.5rem;
-            border-radius: 12px;
-            text-align: center;
-        }
-        .wrong-answer-box {
-            background: #fef2f2;
-            border-left: 4px solid #ef4444;
-            padding: 1.5rem;
-            border-radius: 8px;
-            margin: 1rem 0;
-            color: #1f2937;
-        }
-        .correct-answer-box {
-            background: #ecfdf5;
-            border-left: 4px solid #10b981;
-            padding: 1rem;
-            border-radius: 8px;
-            margin: 0.5rem 0;
-            color: #1f2937;
-        }
-        .explanation-box {
-            background: #f0f9ff;
-            border-left: 4px solid #333;
-            padding: 1rem;
-            border-radius: 8px;
-            margin: 0.5rem 0;
-            font-size: 0.95rem;
-            color: #1f2937;
-        }
-        .perfect-score {
-            text-align: center;
-            padding: 3rem 1rem;
-        }
-    </style>
-""", unsafe_allow_html=True)
-
-# Initialize session state
-if "questions" not in st.session_state:
-    st.session_state.questions = []
-if "user_answers" not in st.session_state:
-    st.session_state.user_answers = {}
+# Initialize session state. Sessions hold no questions of their own: the
+# loaded exam is a question bank id, the quiz is positions into exams shared
+# through exam_registry, and answers are one int8 per question (see the
+# per-session footprint in exam_registry.py)
+if "exam_id" not in st.session_state:
+    st.session_state.exam_id = None
+if "quiz" not in st.session_state:
+    st.session_state.quiz = Quiz((), [])
+if "tracker" not in st.session_state:
+    # Answers (one int8 per quiz question) and running score counts
+    st.session_state.tracker = ScoreTracker(Exam([]))
 if "current_question" not in st.session_state:
     st.session_state.current_question = 0
 if "quiz_submitted" not in st.session_state:
@@ -107,365 +58,613 @@ if "start_question" not in st.session_state:
     st.session_state.start_question = 1
 if "num_questions" not in st.session_state:
     st.session_state.num_questions = None
-if "quiz_questions" not in st.session_state:
-    st.session_state.quiz_questions = []
-
-def is_likely_noise(line):
-    """Check if a line is likely noise (headers, footers, page numbers, etc.)"""
-    line = line.strip()
-    if not line:
-        return True
-    if len(line) < 3:  # Very short lines are likely noise
-        return True
-    if line.startswith('Copyright'):
-        return True
-    if line.startswith('Posted online'):
-        return True
-    if line.startswith('Booklet'):
-        return True
-    if re.match(r'^Page\s+\d+', line, re.IGNORECASE):
-        return True
-    # Header patterns like "Test 1229 FINANCE EXAM 1"
-    if re.match(r'^Test\s+\d+.*EXAM\s+\d+$', line) and 'KEY' not in line:
-        return True
-    return False
-
-def parse_two_column_choices(line):
+if "session_token" not in st.session_state:
+    # Identifies this session to the background parser (parse_jobs.py)
+    st.session_state.session_token = uuid.uuid4().hex
+if "parse_job" not in st.session_state:
+    # Key of the upload this session is waiting on, and of the last one it cancelled
+    st.session_state.parse_job = None
+if "parse_cancelled" not in st.session_state:
+    st.session_state.parse_cancelled = None
+if "review" not in st.session_state:
+    # Spaced review: the ReviewScheduler serving the quiz (None for fixed
+    # quizzes), whose history it is, and the bank row ids served so far
+    st.session_state.review = None
+    st.session_state.review_learner = None
+    st.session_state.review_served = []
+if "resume_token" not in st.session_state:
+    # Progress is checkpointed under a token kept in the URL (?resume=), so a
+    # reconnect, restart or copied link picks up where the student left off
+    st.session_state.resume_token = None
+    st.session_state.checkpoint = None
+    token = st.query_params.get("resume")
+    if token:
+        checkpoint = checkpoints.get_checkpoint_store().load(token)
+        restored = checkpoints.restore(checkpoint) if checkpoint is not None else None
+        if restored is None:
+            del st.query_params["resume"]
+            st.toast("Your saved quiz progress has expired")
+        else:
+            st.session_state.update(restored)
+            st.session_state.resume_token = token
+            st.session_state.checkpoint = checkpoint
+            if checkpoint.quiz_started:
+                st.toast("Welcome back! Your quiz progress was restored")
+
+# An exam replaced in the question bank while this session had it open
+# (e.g. a bank file re-imported with a corrected key) has a new id; the
+# old questions are gone, so the session starts over from the upload screen
+if st.session_state.pdf_loaded and get_registry().replaced(
+        (st.session_state.exam_id, *st.session_state.quiz.exam_ids)):
+    st.session_state.pdf_loaded = False
+    st.session_state.exam_id = None
+    st.session_state.quiz = Quiz((), [])
+    st.session_state.tracker = ScoreTracker(Exam([]))
+    st.session_state.current_question = 0
+    st.session_state.quiz_submitted = False
+    st.session_state.show_results = False
+    st.session_state.quiz_started = False
+    st.session_state.review = None
+    st.toast("This exam was updated in the question bank; please open it again")
+
+# Admin panel
+admin = os.environ.get("DECA_ADMIN") == "1" or st.query_params.get("admin") == "1"
+if admin:
+    with st.sidebar:
+        st.toggle("Attempt analytics", key="show_analytics")
+        st.markdown("### Parse profiles")
+        profiles = parse_metrics.recent_profiles(ADMIN_PROFILES)
+        if profiles:
+            st.dataframe([
+                {
+                    "source": p["source"],
+                    "mode": p.get("mode"),
+                    "engine": p.get("engine"),
+                    "total s": p["total_seconds"],
+                    **{f"{name} s": p["phases"].get(name) for name in parse_metrics.PHASES},
+                    "pages": p["counters"].get("pages"),
+                    "questions": p["counters"].get("questions"),
+                    "skipped": p["counters"].get("skipped_questions"),
+                    "peak MB": p.get("peak_rss_mb"),
+                    "strategy": p.get("strategy"),
+                    "retry": p.get("retry"),
+                }
+                for p in profiles
+            ], hide_index=True)
+        else:
+            st.caption("No PDFs parsed by this server yet")
+        st.markdown("### Render times")
+        renders = parse_metrics.render_stats()
+        if renders:
+            st.dataframe([{"view": view, **stats} for view, stats in renders.items()], hide_index=True)
+        jobs = parse_jobs.active_jobs()
+        if jobs:
+            st.markdown("### Parses in progress")
+            st.dataframe([
+                {"source": job.name, "engine": job.engine, "state": job.state, "page": job.page,
+                 "pages": job.num_pages, "sessions": len(job.watchers)}
+                for job in jobs
+            ], hide_index=True)
+        st.download_button("Metrics (JSON)", parse_metrics.metrics_json(),
+                           file_name="deca_metrics.json", mime="application/json")
+        st.download_button("Metrics (Prometheus)", parse_metrics.metrics_prometheus(),
+                           file_name="deca_metrics.prom", mime="text/plain")
+
+def checkpoint_session():
+    """Queue the session's progress for the checkpoint store, if it changed"""
+    token = st.session_state.resume_token
+    if not st.session_state.pdf_loaded:
+        if token is not None:
+            checkpoints.get_checkpoint_store().delete(token)
+            st.session_state.resume_token = st.session_state.checkpoint = None
+            if "resume" in st.query_params:
+                del st.query_params["resume"]
+        return
+    checkpoint = checkpoints.capture(st.session_state)
+    if checkpoint == st.session_state.checkpoint:
+        return
+    if token is None:
+        token = st.session_state.resume_token = checkpoints.new_token()
+        st.query_params["resume"] = token
+    checkpoints.get_checkpoint_store().save(token, checkpoint)
+    st.session_state.checkpoint = checkpoint
+
+
+def record_choice(position, key):
+    """Radio callback: record the answer before the card is redrawn"""
+    choice = st.session_state[key]
+    if choice:
+        st.session_state.tracker.record(position, LETTERS.index(choice))
+
+
+def go_to_question(offset):
+    st.session_state.current_question += offset
+
+
+def finish_quiz():
+    """Show the results of the quiz (or review) and append it to the attempt log"""
+    st.session_state.quiz_submitted = True
+    st.session_state.show_results = True
+    quiz = st.session_state.quiz
+    if not len(quiz):
+        return
+    reviewing = st.session_state.review is not None
+    learner = st.session_state.review_learner if reviewing else st.query_params.get("learner", "")
+    try:
+        attempt_log.record_attempt(quiz, st.session_state.tracker.answers, learner,
+                                   mode="review" if reviewing else "quiz")
+    except OSError as e:
+        attempt_log.log.warning("Could not log the attempt: %s", e)
+
+
+def review_new_ids():
+    """Row ids of this exam's answerable questions, new cards for a review"""
+    registry = get_registry()
+    exam_id = st.session_state.exam_id
+    return registry.row_ids(exam_id)[registry.get(exam_id).key != NO_ANSWER]
+
+
+def review_scheduler_for(learner):
+    """The learner's review cards, plus a new card for each answerable question of this exam"""
+    return start_review(get_review_store(), learner, review_new_ids(), exists=get_bank().question_exams)
+
+
+def start_review_quiz(scheduler, learner):
+    """Start a spaced review quiz served by scheduler"""
+    st.session_state.review = scheduler
+    st.session_state.review_learner = learner
+    st.session_state.review_served = []
+    st.session_state.quiz = Quiz((), [])
+    st.session_state.tracker = ScoreTracker(Exam([]))
+    st.session_state.quiz_submitted = False
+    st.session_state.show_results = False
+    st.session_state.quiz_started = True
+    serve_review_question()
+
+
+def serve_review_question():
+    """
+    Add the next due card to the review quiz and show it. Ends the review
+    when no card is due or the quiz has num_questions questions.
+    """
+    card = st.session_state.review.next_due(time.time())
+    served = st.session_state.review_served
+    if card is None or len(served) >= st.session_state.num_questions:
+        finish_quiz()
+        return
+    served.append(card.question_id)
+    quiz = get_registry().quiz_from_rows(served)
+    st.session_state.tracker = st.session_state.tracker.extended(quiz)
+    st.session_state.quiz = quiz
+    st.session_state.current_question = len(quiz) - 1
+
+
+def grade_review_answer():
+    """Grade the current review question, if answered, into the scheduler and the store"""
+    position = st.session_state.current_question
+    answer = int(st.session_state.tracker.answers[position])
+    if answer == NO_ANSWER:
+        return
+    now = time.time()
+    correct = answer == st.session_state.quiz.key[position]
+    card = st.session_state.review.answer(st.session_state.review_served[position], correct, now)
+    get_review_store().save(st.session_state.review_learner, [(card, correct)], now)
+
+
+def next_review_question():
+    """Next button of a review: grade the answer and serve the next due card"""
+    grade_review_answer()
+    serve_review_question()
+
+
+def record_quiz_history(quiz, tracker):
+    """Grade a submitted fixed quiz into the review history of the learner in the URL, if any"""
+    learner = st.query_params.get("learner")
+    if not learner:
+        return
+    answered = (tracker.answers != NO_ANSWER) & (quiz.key != NO_ANSWER)
+    get_review_store().record_quiz(learner, quiz.row_ids()[answered],
+                                   (tracker.answers == quiz.key)[answered])
+
+
+def cancel_parse():
+    """Stop waiting for the upload being parsed (the job stops if nobody else waits)"""
+    key = st.session_state.parse_job
+    parse_jobs.release(key, st.session_state.session_token)
+    st.session_state.parse_job = None
+    st.session_state.parse_cancelled = key
+
+
+@st.fragment(run_every=PARSE_POLL_SECONDS)
+def parse_progress(key):
     """
-    Parse choices that may be in two-column format like:
-    'A. decision. C. privacy.'
-    Returns dict of {letter: text} for all choices found on the line
+    Show the progress of a queued or running parse. Reruns the app once the
+    job has finished, failed or been cancelled, which stops the polling.
     """
-    choices = {}
-    # Split by the letter patterns, which gives us alternating letters and text
-    pattern = r'([A-D])[\.\)]\s+'
-    parts = re.split(pattern, line)
-    
-    # After split: ['', 'A', 'text', 'C', 'more text', ...]
-    # or: ['some text', 'A', 'text', 'C', 'more text', ...]
-    for i in range(1, len(parts), 2):
-        if i+1 < len(parts):
-            letter = parts[i]
-            text = parts[i+1].strip().rstrip('.')
-            if text:  # Only add if there's actual text
-                choices[letter] = text
-    
-    return choices
-
-def find_answer_key_split(text):
+    job = parse_jobs.get_job(key)
+    if st.session_state.parse_job != key or job is None or not job.active:
+        st.rerun()
+    if job.state == parse_jobs.QUEUED:
+        ahead = job.queue_position()
+        st.progress(0.0, text=f"Waiting for the parser... {ahead} upload(s) ahead" if ahead
+                    else "Starting the parser...")
+    else:
+        text = "Parsing PDF..."
+        if job.num_pages:
+            text += (f" page {job.page}/{job.num_pages} | "
+                     f"{job.questions_found} questions, {job.answers_found} answers found")
+        st.progress(job.fraction, text=text)
+    st.button("Cancel", on_click=cancel_parse)
+
+
+@st.fragment
+def quiz_card(submitted):
     """
-    Find where the answer key section starts using multiple heuristics.
-    Returns (questions_text, answer_text) tuple
+    Progress bar, question card and navigation for the quiz screens.
+    Answering and moving between questions rerun only this fragment; the
+    rest of the page is left alone until Submit / View Results switches
+    screens with a full rerun.
     """
-    print("\n" + "="*60)
-    print("Attempting to locate answer key section...")
-    print("="*60)
-    
-    # Strategy 1: Look for "KEY" in headers (most common)
-    key_patterns = [
-        r'EXAM[—\-\s]*KEY\s+\d+',  # EXAM—KEY 11, EXAM-KEY 11, EXAM KEY 11
-        r'ANSWER\s+KEY',             # ANSWER KEY
-        r'\bKEY\b.*\d+',            # KEY followed by page number
-    ]
-    
-    for pattern in key_patterns:
-        matches = list(re.finditer(pattern, text, re.IGNORECASE))
-        if matches:
-            # Use the first match that appears after substantial content
-            for match in matches:
-                if match.start() > 5000:  # At least 5000 chars of questions
-                    print(f"✓ Found answer key using pattern '{pattern}' at position {match.start()}")
-                    print(f"  Context: ...{text[match.start()-20:match.start()+50]}...")
-                    return text[:match.start()], text[match.start():]
-    
-    # Strategy 2: Look for sequential answer pattern "1. A\n2. B\n3. C" etc.
-    answer_pattern = r'\n\s*1\.\s+[A-D]\s*\n\s*2\.\s+[A-D]\s*\n\s*3\.\s+[A-D]'
-    matches = list(re.finditer(answer_pattern, text))
-    if matches:
-        for match in matches:
-            if match.start() > 5000:
-                print(f"✓ Found answer key using sequential pattern at position {match.start()}")
-                split_pos = text.rfind('\n', match.start()-100, match.start()) + 1
-                return text[:split_pos], text[split_pos:]
-    
-    # Strategy 3: Look for density increase
-    chunk_size = 2000
-    for i in range(5000, len(text) - chunk_size, 1000):
-        chunk = text[i:i+chunk_size]
-        answer_like = len(re.findall(r'\n\s*\d+\.\s+[A-D]\s*\n', chunk))
-        if answer_like > 15:
-            print(f"✓ Found answer key using density analysis at position {i}")
-            return text[:i], text[i:]
-    
-    print("⚠ Could not locate answer key section - will parse entire document as questions")
-    return text, ""
-
-def extract_questions_and_answers(pdf_file):
-    """Universal PDF parser that works with any DECA exam format"""
-    questions = []
-    answer_key = {}
-    explanations = {}
-    
-    # Extract text from PDF
-    with pdfplumber.open(pdf_file) as pdf:
-        text = "\n".join([page.extract_text() or "" for page in pdf.pages])
-    
-    print(f"\n{'='*60}")
-    print(f"PARSING PDF")
-    print(f"{'='*60}")
-    print(f"Total text length: {len(text):,} characters")
-    
-    # Split into questions and answers sections
-    questions_text, answer_text = find_answer_key_split(text)
-    
-    print(f"\nQuestions section: {len(questions_text):,} characters")
-    print(f"Answer section: {len(answer_text):,} characters")
-    print(f"\n{'='*60}")
-    print("PARSING QUESTIONS")
-    print(f"{'='*60}\n")
-    
-    # Parse questions section
-    lines = questions_text.split('\n')
-    i = 0
-    
-    while i < len(lines):
-        line = lines[i].strip()
-        
-        # Skip noise
-        if is_likely_noise(line):
-            i += 1
-            continue
-        
-        # Look for question start: "1. " or "1) " with text after
-        question_match = re.match(r'^(\d+)[\.\)]\s+(.+)', line)
-        
-        if question_match:
-            q_num = int(question_match.group(1))
-            q_text = question_match.group(2)
-            
-            # Read continuation lines for the question
-            j = i + 1
-            while j < len(lines):
-                next_line = lines[j].strip()
-                
-                # Stop if we hit an answer choice
-                if re.match(r'^[A-D][\.\)]\s+', next_line):
-                    break
-                
-                # Stop if we hit another question number
-                if re.match(r'^\d+[\.\)]\s+', next_line):
-                    break
-                
-                # Add non-noise lines to question text
-                if next_line and not is_likely_noise(next_line):
-                    q_text += " " + next_line
-                
-                j += 1
-            
-            # Now extract the 4 answer choices (handling two-column format)
-            choices = {}
-            
-            while j < len(lines) and len(choices) < 4:
-                choice_line = lines[j].strip()
-                
-                # Check if we've moved to the next question
-                if re.match(r'^\d+[\.\)]\s+', choice_line):
-                    break
-                
-                # Skip noise
-                if is_likely_noise(choice_line):
-                    j += 1
-                    continue
-                
-                # Try to parse choices from this line (handles two-column format)
-                line_choices = parse_two_column_choices(choice_line)
-                
-                if line_choices:
-                    # Add any new choices we found
-                    for letter, text in line_choices.items():
-                        if letter not in choices:
-                            choices[letter] = text
-                    j += 1
-                else:
-                    # This might be a continuation of the previous choice
-                    if choices and choice_line and not re.match(r'^[A-D][\.\)]\s+', choice_line):
-                        # Add to the last choice
-                        last_letter = sorted(choices.keys())[-1]
-                        choices[last_letter] += " " + choice_line
-                    j += 1
-            
-            # Only save question if we found all 4 choices
-            if len(choices) == 4 and all(letter in choices for letter in ['A', 'B', 'C', 'D']):
-                questions.append({
-                    "number": q_num,
-                    "text": q_text.strip(),
-                    "choices": choices,
-                    "correct": None,
-                    "explanation": ""
-                })
-                
-                # Progress logging
-                if len(questions) <= 5 or len(questions) % 25 == 0:
-                    print(f"  Q{q_num}: {q_text[:60]}...")
+    started = time.perf_counter()
+    if st.session_state.show_results:
+        # A review ran out of due cards in a button callback
+        st.rerun()
+    questions = st.session_state.quiz
+    tracker = st.session_state.tracker
+    current_idx = st.session_state.current_question
+    q = questions[current_idx]
+    reviewing = st.session_state.review is not None
+    
+    if submitted:
+        # Show current score banner
+        st.info(f"Progress: {tracker.answered}/{len(questions)} answered | Current Score: {tracker.score:.1f}%")
+    
+    # Progress bar only
+    st.markdown(f"""
+        <div style="width: 100%; background: #e5e7eb; border-radius: 10px; height: 8px; overflow: hidden; margin-bottom: 2rem;">
+            <div style="width: {((current_idx + 1) / len(questions)) * 100}%; background: #333; height: 100%; border-radius: 10px;"></div>
+        </div>
+    """, unsafe_allow_html=True)
+    
+    # Question card
+    st.markdown(f"""
+        <div class="question-card">
+            <h3 style="color: #1f2937; margin-bottom: 1.5rem; font-size: 1.2rem; line-height: 1.5;">
+                {q.text}
+            </h3>
+    """, unsafe_allow_html=True)
+    
+    # Answer options
+    selected = int(tracker.answers[current_idx])
+    
+    # Get index of currently selected answer
+    current_index = selected if selected != NO_ANSWER else None
+    
+    key = f"choice_{current_idx}"
+    st.radio(
+        "Select your answer:",
+        options=list(LETTERS),
+        format_func=lambda x: f"{x} - {q.choice(x)}",
+        index=current_index,
+        key=key,
+        on_change=record_choice,
+        args=(current_idx, key),
+        label_visibility="collapsed"
+    )
+    
+    st.markdown("</div>", unsafe_allow_html=True)
+    
+    st.divider()
+    
+    # Navigation buttons; Previous / Next change the question in their
+    # callbacks, so the click's own fragment rerun shows the new one
+    col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
+    
+    with col1:
+        # Review answers are graded as soon as the next card is served
+        st.button("Previous", use_container_width=True, disabled=(current_idx == 0 or reviewing),
+                  on_click=go_to_question, args=(-1,))
+    
+    with col2:
+        total = f"up to {st.session_state.num_questions}" if reviewing else len(questions)
+        st.markdown(f"<div style='text-align: center; padding: 0.5rem;'><strong>Question {current_idx + 1} out of {total}</strong></div>", unsafe_allow_html=True)
+    
+    with col3:
+        if submitted:
+            if st.button("View Results", use_container_width=True):
+                st.session_state.show_results = True
+                st.rerun()
+        elif st.button("End Review" if reviewing else "Submit", use_container_width=True, type="primary"):
+            if reviewing:
+                grade_review_answer()
             else:
-                print(f"  ⚠ Q{q_num}: Found only {len(choices)}/4 choices - skipping. Choices: {list(choices.keys())}")
-            
-            i = j
-        else:
-            i += 1
+                record_quiz_history(questions, tracker)
+            finish_quiz()
+            st.rerun()
     
-    print(f"\n✓ Extracted {len(questions)} complete questions")
+    with col4:
+        if reviewing:
+            st.button("Next", use_container_width=True, disabled=(selected == NO_ANSWER),
+                      on_click=next_review_question)
+        else:
+            st.button("Next", use_container_width=True, disabled=(current_idx == len(questions) - 1),
+                      on_click=go_to_question, args=(1,))
     
-    # Parse answer key section
-    if answer_text:
-        print(f"\n{'='*60}")
-        print("PARSING ANSWER KEY")
-        print(f"{'='*60}\n")
-        
-        answer_lines = answer_text.split('\n')
-        current_q_num = None
-        current_explanation = ""
-        in_source_section = False
-        
-        for line in answer_lines:
-            line_stripped = line.strip()
-            
-            if not line_stripped or is_likely_noise(line_stripped):
-                continue
-            
-            # Skip SOURCE: sections (common in DECA exams)
-            if line_stripped.startswith('SOURCE:'):
-                in_source_section = True
-                continue
-            
-            # Look for answer pattern: "1. A" or "1. B Some explanation"
-            answer_match = re.match(r'^(\d+)[\.\)]\s+([A-D])(?:\s+(.*))?$', line_stripped)
-            
-            if answer_match:
-                # Save previous explanation
-                if current_q_num and current_explanation:
-                    explanations[current_q_num] = current_explanation.strip()
-                
-                current_q_num = int(answer_match.group(1))
-                answer_key[current_q_num] = answer_match.group(2)
-                
-                # Start new explanation
-                explanation_start = answer_match.group(3)
-                current_explanation = explanation_start if explanation_start else ""
-                in_source_section = False
-                
-                # Progress logging
-                if len(answer_key) <= 5 or len(answer_key) % 25 == 0:
-                    print(f"  Q{current_q_num}: {answer_key[current_q_num]}")
-            
-            elif current_q_num and not in_source_section:
-                # Continue building explanation
-                if not re.match(r'^\d+[\.\)]\s+[A-D]', line_stripped):
-                    if current_explanation:
-                        current_explanation += " " + line_stripped
-                    else:
-                        current_explanation = line_stripped
-        
-        # Save last explanation
-        if current_q_num and current_explanation:
-            explanations[current_q_num] = current_explanation.strip()
-        
-        print(f"\n✓ Extracted {len(answer_key)} answers")
-        print(f"✓ Extracted {len(explanations)} explanations")
-    
-    # Assign answers and explanations to questions
-    for q in questions:
-        q["correct"] = answer_key.get(q["number"])
-        q["explanation"] = explanations.get(q["number"], "No explanation available.")
-    
-    # Final summary
-    if questions:
-        q_numbers = [q["number"] for q in questions]
-        with_answers = sum(1 for q in questions if q["correct"])
-        with_explanations = sum(1 for q in questions if q["explanation"] != "No explanation available.")
-        
-        print(f"\n{'='*60}")
-        print("PARSING COMPLETE")
-        print(f"{'='*60}")
-        print(f"Total questions: {len(questions)}")
-        print(f"Question range: Q{min(q_numbers)} to Q{max(q_numbers)}")
-        print(f"With answer keys: {with_answers}/{len(questions)}")
-        print(f"With explanations: {with_explanations}/{len(questions)}")
-        print(f"{'='*60}\n")
-    
-    return questions
-
-def calculate_score(questions, answers):
-    """Calculate score and get wrong answers - unanswered questions count as wrong"""
-    correct = 0
-    wrong = []
-    unanswered = 0
-    
-    for q in questions:
-        user_ans = answers.get(q["number"])
-        # Check if question was answered AND if it's correct
-        if user_ans is not None and user_ans == q["correct"]:
-            correct += 1
+    checkpoint_session()
+    parse_metrics.record_render("quiz card", time.perf_counter() - started)
+
+
+def review_cards(questions, answers):
+    """
+    Review cards for every wrong or unanswered question, built once per
+    set of answers and kept in the session. Returns {filter name: cards},
+    each card a (title, html) pair.
+    """
+    signature = answers.tobytes()
+    cached = st.session_state.get("review_cache")
+    if cached is not None and cached[0] is questions and cached[1] == signature:
+        return cached[2]
+    
+    review = {"All": [], "Incorrect": [], "Unanswered": []}
+    for wrong in wrong_answer_details(questions, answers):
+        if wrong["correct_answer"]:
+            correct = f'{wrong["correct_answer"]} - {wrong["choice_text"]}'
         else:
-            # Both unanswered and incorrect answers are marked as wrong
-            if user_ans is None:
-                unanswered += 1
-                wrong.append({
-                    "number": q["number"],
-                    "question": q["text"],
-                    "your_answer": "Not answered",
-                    "correct_answer": q["correct"],
-                    "explanation": q["explanation"],
-                    "choice_text": q["choices"].get(q["correct"], "") if q["correct"] else "",
-                    "is_unanswered": True
-                })
-            else:
-                # Incorrect answer
-                wrong.append({
-                    "number": q["number"],
-                    "question": q["text"],
-                    "your_answer": user_ans,
-                    "correct_answer": q["correct"],
-                    "explanation": q["explanation"],
-                    "choice_text": q["choices"].get(q["correct"], "") if q["correct"] else "",
-                    "is_unanswered": False
-                })
-    
-    # Calculate score based on total questions (correct / total * 100)
-    total = len(questions)
-    score = (correct / total * 100) if total > 0 else 0
-    
-    return score, wrong, unanswered
+            correct = "Not available in answer key"
+        card = (
+            f"Question {wrong['number']}: {wrong['question'][:70]}...",
+            f"<p style='color: white;'><strong>Question {wrong['number']}:</strong> {wrong['question']}</p>"
+            f"<hr>"
+            f'<div class="wrong-answer-box"><strong>Your Answer:</strong> {wrong["your_answer"]}</div>'
+            f'<div class="correct-answer-box"><strong>Correct Answer:</strong> {correct}</div>'
+            f'<div class="explanation-box"><strong>Explanation:</strong> {wrong["explanation"]}</div>'
+        )
+        review["All"].append(card)
+        review["Unanswered" if wrong["is_unanswered"] else "Incorrect"].append(card)
+    st.session_state.review_cache = (questions, signature, review)
+    return review
+
+
+@st.fragment
+def mistakes_review(review):
+    """
+    One page of review cards at a time. Changing the filter or the page
+    reruns only this fragment and only sends that page's cards.
+    """
+    filter_name = st.radio(
+        "Show:",
+        list(review),
+        format_func=lambda name: f"{name} ({len(review[name])})",
+        horizontal=True,
+        key="review_filter"
+    )
+    cards = review[filter_name]
+    num_pages = max(1, -(-len(cards) // REVIEW_PAGE_SIZE))
+    page = 1
+    if num_pages > 1:
+        page = st.number_input(
+            f"Page (of {num_pages}):",
+            min_value=1,
+            max_value=num_pages,
+            value=1,
+            step=1,
+            key=f"review_page_{filter_name}"
+        )
+    
+    start = (page - 1) * REVIEW_PAGE_SIZE
+    for title, html in cards[start:start + REVIEW_PAGE_SIZE]:
+        with st.expander(title, expanded=(len(review["All"]) == 1)):
+            st.markdown(html, unsafe_allow_html=True)
+    if not cards:
+        st.caption(f"No {filter_name.lower()} questions")
+
+
+def open_bundle(bundle_file):
+    """
+    Add an uploaded exam bundle to the bank (once) and register it.
+    Returns (exam id, Exam), or None after showing why it can't be opened.
+    """
+    bank = get_bank()
+    registry = get_registry()
+    # One read; a bundle already in the bank isn't even decompressed
+    data = bundle_file.getvalue()
+    try:
+        source_key = f"bundle:{bundle_metadata(data)['sha256']}"
+        exam_id = bank.find_exam(source_key, parser_version=None)
+        if exam_id is not None:
+            return exam_id, registry.get(exam_id)
+        metadata, questions = unpack_bundle(data)
+    except BundleError as e:
+        st.error(f"Could not open {bundle_file.name}: {e}")
+        return None
+    name = metadata.get("name") or bundle_file.name.rsplit(".", 1)[0]
+    exam_id = bank.add_exam(source_key, name, questions, metadata.get("cluster"),
+                            str(metadata.get("parser_version") or PARSER_VERSION))
+    return exam_id, registry.put(exam_id, Exam.from_dicts(questions))
+
+
+def analytics_view():
+    """Item statistics, weak topics and student trends from the attempt log (admins only)"""
+    st.markdown("# Attempt analytics")
+    attempts = attempt_log.load_attempts()
+    if attempts.empty:
+        st.info("No quiz attempts have been logged yet")
+        return
+    # Computed once per version of the log and kept in the session
+    cached = st.session_state.get("analytics_cache")
+    if cached is None or cached[0] is not attempts:
+        cached = (attempts, attempt_log.question_stats(attempts), attempt_log.exam_accuracy(attempts),
+                  attempt_log.student_trends(attempts))
+        st.session_state.analytics_cache = cached
+    _, stats, accuracy, trends = cached
+    exams = {e["id"]: e for e in get_bank().list_exams()}
+    
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Attempts", f"{attempts['attempt_id'].nunique():,}")
+    col2.metric("Answers", f"{len(attempts):,}")
+    col3.metric("Students", f"{trends['learner'].nunique():,}")
+    
+    stats = stats.assign(exam=stats["exam_id"].map(lambda i: exams.get(i, {}).get("name", "(removed)")))
+    columns = ["exam", "number", "answers", "difficulty", "discrimination", "distractor",
+               "distractor_share"]
+    st.markdown("### Answer keys to check")
+    suspects = stats[stats["suspect_key"]]
+    if len(suspects):
+        st.caption("A wrong answer is more popular than the key, or strong students miss the "
+                   "question more often than weak ones. The parsed key may be wrong.")
+        st.dataframe(suspects[columns].sort_values("discrimination"), hide_index=True)
+    else:
+        st.caption(f"No suspicious keys among questions answered at least {attempt_log.MIN_ANSWERS} times")
+    
+    st.markdown("### Hardest questions")
+    st.dataframe(stats[columns].sort_values("difficulty").head(100), hide_index=True)
+    
+    st.markdown("### Weak topics")
+    accuracy = accuracy.assign(
+        cluster=accuracy["exam_id"].map(lambda i: exams.get(i, {}).get("cluster", "(removed)")),
+        correct=accuracy["accuracy"] * accuracy["answers"],
+    )
+    learner = st.selectbox("Student:", ["All students"] + sorted(trends["learner"].unique()))
+    if learner != "All students":
+        accuracy = accuracy[accuracy["learner"] == learner]
+    topics = accuracy.groupby("cluster")[["answers", "correct"]].sum()
+    topics["accuracy"] = topics["correct"] / topics["answers"]
+    st.dataframe(topics[["answers", "accuracy"]].sort_values("accuracy"))
+    
+    st.markdown("### Student trends")
+    st.caption("Mean score of each student's last 5 attempts")
+    shown = trends if learner == "All students" else trends[trends["learner"] == learner]
+    active = shown["learner"].value_counts().head(10).index
+    shown = shown[shown["learner"].isin(active)]
+    chart = shown.assign(
+        when=(shown["answered_at"] * 1000).astype("int64").astype("datetime64[ms]"),
+        learner=shown["learner"].astype(str),
+    )
+    st.line_chart(chart, x="when", y="rolling_score", color="learner")
+
 
 # Main app
-if not st.session_state.pdf_loaded:
+if admin and st.session_state.get("show_analytics"):
+    screen = "analytics"
+    analytics_view()
+
+elif not st.session_state.pdf_loaded:
+    screen = "upload"
     st.markdown('<div style="text-align: center; padding: 2rem;">', unsafe_allow_html=True)
     st.markdown("# DECA Quiz")
     st.markdown("### Upload your DECA exam PDF to get started")
     st.markdown('</div>', unsafe_allow_html=True)
     
-    uploaded_file = st.file_uploader("Upload PDF Exam", type=["pdf"])
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        uploaded_file = st.file_uploader("Upload PDF Exam", type=["pdf"])
+    with col2:
+        bundle_file = st.file_uploader(
+            "Upload bundle", type=[BUNDLE_SUFFIX.lstrip(".")],
+            help="An exam already parsed on another server, exported with Download Exam Bundle"
+        )
+    fast_extraction = st.toggle(
+        "Fast extraction", value=DEFAULT_ENGINE == "fast",
+        help="Read the PDF about 3x faster without layout analysis. Falls back to the "
+             "regular extraction automatically if questions go missing."
+    )
+    loaded_exam = None
+    bank = get_bank()
+    registry = get_registry()
+    
+    # Exams uploaded before or pre-parsed with batch_parse.py open straight
+    # from the question bank without touching a PDF
+    _, skipped_files = import_bank_files(bank, list_banks())
+    for name, reason in skipped_files.items():
+        st.warning(f"⚠ Could not import question bank file {name}: {reason}")
+    stored_exams = bank.list_exams()
+    if bundle_file and not uploaded_file:
+        opened = open_bundle(bundle_file)
+        if opened is not None:
+            st.session_state.exam_id, loaded_exam = opened
+    
+    if stored_exams and not uploaded_file and not bundle_file:
+        st.markdown("#### Or open an exam from the question bank")
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            stored_exam = st.selectbox(
+                "Question bank",
+                stored_exams,
+                format_func=lambda e: f"{e['name']} ({e['num_questions']} questions)",
+                label_visibility="collapsed"
+            )
+        with col2:
+            if st.button("Open Exam", use_container_width=True):
+                st.session_state.exam_id = stored_exam["id"]
+                loaded_exam = registry.get(stored_exam["id"])
     
     if uploaded_file:
-        with st.spinner("Parsing PDF..."):
-            st.session_state.questions = extract_questions_and_answers(uploaded_file)
-            st.session_state.pdf_loaded = True
-            st.session_state.user_answers = {}
-            st.session_state.quiz_submitted = False
-            st.session_state.current_question = 0
-            st.session_state.quiz_started = False
+        # Hashed and spooled for the parser in chunks, without copying the
+        # upload with getvalue()
+        source_key = exam_cache.exam_key(uploaded_file)
+        token = st.session_state.session_token
+        if st.session_state.parse_job not in (None, source_key):
+            # A different file replaced the one being parsed
+            parse_jobs.release(st.session_state.parse_job, token)
+            st.session_state.parse_job = None
+        
+        # Every session uploading the same exam shares one registered copy;
+        # repeat uploads come from the bank or the parse cache, new ones are
+        # parsed in the background while this screen polls for progress
+        exam_id = bank.find_exam(source_key)
+        parsed = exam_cache.get_cache().get(source_key) if exam_id is None else None
+        if exam_id is not None:
+            loaded_exam = registry.get(exam_id)
+        elif parsed is not None:
+            name = uploaded_file.name.rsplit(".", 1)[0]
+            exam_id = bank.add_exam(source_key, name, parsed)
+            loaded_exam = registry.put(exam_id, Exam.from_dicts(parsed))
+        elif st.session_state.parse_cancelled == source_key:
+            st.info("Parsing cancelled")
+            if st.button("Parse Again"):
+                st.session_state.parse_cancelled = None
+                st.rerun()
+        else:
+            job = parse_jobs.get_job(source_key)
+            st.session_state.parse_job = source_key
+            if job is not None and not job.active:
+                # Shown without the polling fragment; nothing will change
+                st.error(f"Could not parse this PDF: {job.error or job.state}")
+            else:
+                parse_jobs.submit(source_key, uploaded_file, uploaded_file.name, token,
+                                  engine="fast" if fast_extraction else "layout")
+                parse_progress(source_key)
+        
+        if loaded_exam is not None:
+            st.session_state.exam_id = exam_id
+            if st.session_state.parse_job is not None:
+                parse_jobs.release(st.session_state.parse_job, token)
+                st.session_state.parse_job = None
+    else:
+        if st.session_state.parse_job is not None:
+            # Upload removed while it was being parsed
+            parse_jobs.release(st.session_state.parse_job, st.session_state.session_token)
+            st.session_state.parse_job = None
+        st.session_state.parse_cancelled = None
+    
+    if loaded_exam is not None:
+        st.session_state.pdf_loaded = True
+        st.session_state.tracker = ScoreTracker(Exam([]))
+        st.session_state.quiz_submitted = False
+        st.session_state.current_question = 0
+        st.session_state.quiz_started = False
         
         # Show summary
-        num_questions = len(st.session_state.questions)
-        num_with_answers = sum(1 for q in st.session_state.questions if q["correct"] is not None)
-        num_with_explanations = sum(1 for q in st.session_state.questions if q["explanation"] != "No explanation available.")
+        num_questions = len(loaded_exam)
+        num_with_answers = loaded_exam.count_with_answers()
+        num_with_explanations = loaded_exam.count_with_explanations()
         
         st.success(f"✓ Loaded {num_questions} questions")
         
         # Show question number distribution
         if num_questions > 0:
-            q_numbers = [q["number"] for q in st.session_state.questions]
-            st.info(f"📊 Questions range from #{min(q_numbers)} to #{max(q_numbers)}")
+            q_numbers = loaded_exam.numbers
+            st.info(f"📊 Questions range from #{q_numbers.min()} to #{q_numbers.max()}")
         
         if num_with_answers < num_questions:
             st.warning(f"⚠ Only {num_with_answers}/{num_questions} questions have answer keys")
@@ -478,33 +677,127 @@ if not st.session_state.pdf_loaded:
         st.rerun()
 
 elif not st.session_state.quiz_started:
+    screen = "configuration"
     # Quiz configuration screen
     st.markdown('<div style="text-align: center; padding: 2rem;">', unsafe_allow_html=True)
     st.markdown("# Quiz Configuration")
     st.markdown("### Customize your quiz")
     st.markdown('</div>', unsafe_allow_html=True)
     
-    total_questions = len(st.session_state.questions)
+    registry = get_registry()
+    total_questions = len(registry.get(st.session_state.exam_id))
+    bank = get_bank()
+    stored_exams = bank.list_exams()
     
-    col1, col2 = st.columns(2)
+    sources = ["This exam", "Question bank", "Spaced review"] if stored_exams else ["This exam", "Spaced review"]
+    source = st.radio("Questions from:", sources, horizontal=True)
+    learner = None
     
-    with col1:
-        start_q = st.number_input(
-            "Start from question:",
-            min_value=1,
-            max_value=total_questions,
-            value=1,
-            step=1
+    if source == "This exam":
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            start_q = st.number_input(
+                "Start from question:",
+                min_value=1,
+                max_value=total_questions,
+                value=1,
+                step=1
+            )
+        
+        with col2:
+            num_q = st.number_input(
+                "Number of questions:",
+                min_value=1,
+                max_value=total_questions - start_q + 1,
+                value=min(100, total_questions - start_q + 1),
+                step=1
+            )
+        
+        def build_quiz():
+            return registry.quiz_from_range(st.session_state.exam_id, start_q, num_q)
+    elif source == "Spaced review":
+        # Cards due for review from every exam this learner has answered,
+        # then this exam's questions they haven't seen yet
+        learner = st.text_input(
+            "Your name:",
+            value=st.query_params.get("learner", ""),
+            help="Your answers are remembered under this name to schedule your reviews"
+        ).strip()
+        start_q = 1
+        num_q = st.number_input("Questions in this review:", min_value=1, value=20, step=1)
+        if learner:
+            st.query_params["learner"] = learner
+            # Counted in SQL; the cards are only loaded when the review starts
+            now = time.time()
+            due, next_due = get_review_store().due_summary(learner, review_new_ids(), now)
+            if due:
+                st.caption(f"{due} questions due for review")
+            elif next_due is not None:
+                st.caption(f"Nothing due; next review in {(next_due - now) / 3600:.1f} hours")
+        else:
+            st.caption("Enter your name to start reviewing")
+        
+        def build_quiz():
+            return Quiz((), [])
+    else:
+        # Random or topic quiz across exams, optionally limited to one cluster
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            cluster = st.selectbox("Cluster:", ["All clusters"] + bank.clusters())
+            if cluster == "All clusters":
+                cluster = None
+        
+        cluster_exams = [e for e in stored_exams if cluster is None or e["cluster"] == cluster]
+        with col2:
+            selected_exams = st.multiselect(
+                "Exams:",
+                cluster_exams,
+                format_func=lambda e: e["name"],
+                placeholder="All exams"
+            )
+        
+        exam_ids = [e["id"] for e in selected_exams]
+        topics = st.text_input(
+            "Topics (optional):",
+            placeholder="e.g. pricing / channel management"
         )
-    
-    with col2:
+        distinct = st.checkbox(
+            "No near-duplicates",
+            help="Leave out questions reused from another exam with small edits"
+        )
+        if topics.strip():
+            # Best matches first; the quiz takes the top num_q
+            matches = bank.search(topics, exam_ids=exam_ids, cluster=cluster)
+        elif distinct:
+            matches = bank.question_ids(exam_ids, cluster)
+            random.shuffle(matches)
+        else:
+            matches = None
+        if matches is not None and distinct:
+            found = len(matches)
+            matches = dedup.get_duplicate_index().distinct(matches)
+            st.caption(f"{len(matches)} distinct questions ({found - len(matches)} near-duplicates left out)")
+        elif topics.strip():
+            st.caption(f"{len(matches)} matching questions")
+        if matches is not None:
+            available = len(matches)
+        else:
+            available = sum(e["num_questions"] for e in (selected_exams or cluster_exams))
+        start_q = 1
         num_q = st.number_input(
             "Number of questions:",
             min_value=1,
-            max_value=total_questions - start_q + 1,
-            value=min(100, total_questions - start_q + 1),
+            max_value=max(1, available),
+            value=min(100, max(1, available)),
             step=1
         )
+        
+        def build_quiz():
+            if matches is not None:
+                return registry.quiz_from_rows(matches[:num_q])
+            return registry.quiz_from_rows(bank.sample_ids(num_q, exam_ids=exam_ids, cluster=cluster))
     
     st.divider()
     
@@ -512,34 +805,68 @@ elif not st.session_state.quiz_started:
     
     with col1:
         if st.button("Start Quiz", use_container_width=True, type="primary"):
-            st.session_state.start_question = start_q
-            st.session_state.num_questions = num_q
-            # Filter questions for this quiz
-            all_questions = st.session_state.questions
-            st.session_state.quiz_questions = [q for q in all_questions if start_q <= q["number"] <= start_q + num_q - 1]
-            st.session_state.quiz_submitted = False
-            st.session_state.show_results = False
-            st.session_state.current_question = 0
-            st.session_state.quiz_started = True
-            st.session_state.user_answers = {}
-            st.rerun()
+            if learner:
+                scheduler = review_scheduler_for(learner)
+                if scheduler.next_due(time.time()) is None:
+                    st.warning("⚠ No questions are due for review")
+                else:
+                    st.session_state.num_questions = num_q
+                    start_review_quiz(scheduler, learner)
+                    st.rerun()
+            else:
+                quiz = build_quiz()
+                if len(quiz) == 0:
+                    st.warning("⚠ No questions match this selection")
+                else:
+                    st.session_state.start_question = start_q
+                    st.session_state.num_questions = num_q
+                    st.session_state.quiz = quiz
+                    st.session_state.quiz_submitted = False
+                    st.session_state.show_results = False
+                    st.session_state.current_question = 0
+                    st.session_state.quiz_started = True
+                    st.session_state.tracker = ScoreTracker(quiz)
+                    st.session_state.review = None
+                    st.rerun()
     
     with col2:
         if st.button("Upload Different PDF", use_container_width=True):
             st.session_state.pdf_loaded = False
-            st.session_state.questions = []
-            st.session_state.user_answers = {}
+            st.session_state.exam_id = None
+            st.session_state.quiz = Quiz((), [])
+            st.session_state.tracker = ScoreTracker(Exam([]))
             st.session_state.current_question = 0
             st.session_state.quiz_submitted = False
             st.session_state.show_results = False
             st.session_state.quiz_started = False
+            st.session_state.review = None
             st.rerun()
+    
+    # Parsed exams can be shared with other servers without the PDF
+    exam_info = next((e for e in stored_exams if e["id"] == st.session_state.exam_id), None)
+    if exam_info is not None:
+        st.download_button(
+            "Download Exam Bundle",
+            data=lambda: pack_bundle(registry.get(exam_info["id"]).to_dicts(), exam_info["name"],
+                                     exam_info["cluster"], exam_info["parser_version"]),
+            file_name=exam_info["name"] + BUNDLE_SUFFIX,
+            mime="application/octet-stream",
+            on_click="ignore",
+            use_container_width=True
+        )
 
 elif st.session_state.quiz_submitted:
-    questions = st.session_state.quiz_questions
-    score, wrong_answers, unanswered_count = calculate_score(questions, st.session_state.user_answers)
+    screen = "results" if st.session_state.show_results else "quiz"
+    questions = st.session_state.quiz
+    
+    tracker = st.session_state.tracker
     
     if st.session_state.show_results:
+        score = tracker.score
+        correct_count = tracker.correct
+        incorrect_count = tracker.incorrect
+        unanswered_count = tracker.unanswered
+        
         # Score display
         st.markdown(f"""
             <div style="text-align: center;">
@@ -559,13 +886,12 @@ elif st.session_state.quiz_submitted:
         with col2:
             st.markdown(f"""
                 <div class="correct-card">
-                    <div style="font-size: 2.5rem; font-weight: bold;">{len(questions) - len(wrong_answers)}</div>
+                    <div style="font-size: 2.5rem; font-weight: bold;">{correct_count}</div>
                     <div style="font-size: 0.9rem; margin-top: 0.5rem;">Correct</div>
                 </div>
             """, unsafe_allow_html=True)
         
         with col3:
-            incorrect_count = len([w for w in wrong_answers if not w.get("is_unanswered", False)])
             st.markdown(f"""
                 <div class="incorrect-card">
                     <div style="font-size: 2.5rem; font-weight: bold;">{incorrect_count}</div>
@@ -584,22 +910,10 @@ elif st.session_state.quiz_submitted:
         st.divider()
         
         # Wrong answers with explanations
-        if wrong_answers:
+        review = review_cards(questions, tracker.answers)
+        if review["All"]:
             st.markdown('<h2>Review Your Mistakes</h2>', unsafe_allow_html=True)
-            
-            for idx, wrong in enumerate(wrong_answers, 1):
-                with st.expander(f"Question {wrong['number']}: {wrong['question'][:70]}...", expanded=(idx==1 if len(wrong_answers)==1 else False)):
-                    st.markdown(f"<p style='color: white;'><strong>Question {wrong['number']}:</strong> {wrong['question']}</p>", unsafe_allow_html=True)
-                    st.divider()
-                    
-                    st.markdown(f'<div class="wrong-answer-box"><strong>Your Answer:</strong> {wrong["your_answer"]}</div>', unsafe_allow_html=True)
-                    
-                    if wrong["correct_answer"]:
-                        st.markdown(f'<div class="correct-answer-box"><strong>Correct Answer:</strong> {wrong["correct_answer"]} - {wrong["choice_text"]}</div>', unsafe_allow_html=True)
-                    else:
-                        st.markdown(f'<div class="correct-answer-box"><strong>Correct Answer:</strong> Not available in answer key</div>', unsafe_allow_html=True)
-                    
-                    st.markdown(f'<div class="explanation-box"><strong>Explanation:</strong> {wrong["explanation"]}</div>', unsafe_allow_html=True)
+            mistakes_review(review)
         else:
             st.markdown("""
                 <div class="perfect-score">
@@ -612,15 +926,26 @@ elif st.session_state.quiz_submitted:
         st.divider()
         
         col1, col2, col3 = st.columns(3)
+        reviewing = st.session_state.review is not None
         with col1:
-            if st.button("Continue Quiz", use_container_width=True):
+            # A finished review has no questions left to continue with
+            if not reviewing and st.button("Continue Quiz", use_container_width=True):
                 st.session_state.show_results = False
                 st.rerun()
         
         with col2:
-            if st.button("Retake Quiz", use_container_width=True):
+            if reviewing:
+                if st.button("Review Again", use_container_width=True):
+                    learner = st.session_state.review_learner
+                    scheduler = review_scheduler_for(learner)
+                    if scheduler.next_due(time.time()) is None:
+                        st.info("No questions are due for review")
+                    else:
+                        start_review_quiz(scheduler, learner)
+                        st.rerun()
+            elif st.button("Retake Quiz", use_container_width=True):
                 st.session_state.quiz_submitted = False
-                st.session_state.user_answers = {}
+                st.session_state.tracker = ScoreTracker(questions)
                 st.session_state.current_question = 0
                 st.session_state.show_results = False
                 st.rerun()
@@ -629,151 +954,20 @@ elif st.session_state.quiz_submitted:
             if st.button("New Quiz", use_container_width=True):
                 st.session_state.quiz_started = False
                 st.session_state.quiz_submitted = False
-                st.session_state.user_answers = {}
+                st.session_state.review = None
+                st.session_state.tracker = ScoreTracker(questions)
                 st.session_state.current_question = 0
                 st.session_state.show_results = False
                 st.rerun()
     
     else:
         # Show quiz with results banner
-        questions = st.session_state.quiz_questions
-        current_idx = st.session_state.current_question
-        q = questions[current_idx]
-        
-        # Show current score banner
-        answered = len(st.session_state.user_answers)
-        current_score, _, _ = calculate_score(questions, st.session_state.user_answers)
-        st.info(f"Progress: {answered}/{len(questions)} answered | Current Score: {current_score:.1f}%")
-        
-        # Progress bar only
-        st.markdown(f"""
-            <div style="width: 100%; background: #e5e7eb; border-radius: 10px; height: 8px; overflow: hidden; margin-bottom: 2rem;">
-                <div style="width: {((current_idx + 1) / len(questions)) * 100}%; background: #333; height: 100%; border-radius: 10px;"></div>
-            </div>
-        """, unsafe_allow_html=True)
-        
-        # Question card
-        st.markdown(f"""
-            <div class="question-card">
-                <h3 style="color: #1f2937; margin-bottom: 1.5rem; font-size: 1.2rem; line-height: 1.5;">
-                    {q['text']}
-                </h3>
-        """, unsafe_allow_html=True)
-        
-        # Answer options
-        selected = st.session_state.user_answers.get(q["number"])
-        
-        # Get index of currently selected answer
-        current_index = None
-        if selected:
-            try:
-                current_index = ['A', 'B', 'C', 'D'].index(selected)
-            except:
-                current_index = None
-        
-        choice_option = st.radio(
-            "Select your answer:",
-            options=['A', 'B', 'C', 'D'],
-            format_func=lambda x: f"{x} - {q['choices'].get(x, '')}",
-            index=current_index,
-            key=f"choice_{q['number']}",
-            label_visibility="collapsed"
-        )
-        
-        if choice_option:
-            st.session_state.user_answers[q["number"]] = choice_option
-        
-        st.markdown("</div>", unsafe_allow_html=True)
-        
-        st.divider()
-        
-        # Navigation buttons
-        col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
-        
-        with col1:
-            if st.button("Previous", use_container_width=True, disabled=(current_idx == 0)):
-                st.session_state.current_question -= 1
-                st.rerun()
-        
-        with col2:
-            st.markdown(f"<div style='text-align: center; padding: 0.5rem;'><strong>Question {current_idx + 1} out of {len(questions)}</strong></div>", unsafe_allow_html=True)
-        
-        with col3:
-            if st.button("View Results", use_container_width=True):
-                st.session_state.show_results = True
-                st.rerun()
-        
-        with col4:
-            if st.button("Next", use_container_width=True, disabled=(current_idx == len(questions) - 1)):
-                st.session_state.current_question += 1
-                st.rerun()
+        quiz_card(submitted=True)
 
 else:
+    screen = "quiz"
     # Quiz interface
-    questions = st.session_state.quiz_questions
-    current_idx = st.session_state.current_question
-    q = questions[current_idx]
-    
-    # Progress bar only
-    st.markdown(f"""
-        <div style="width: 100%; background: #e5e7eb; border-radius: 10px; height: 8px; overflow: hidden; margin-bottom: 2rem;">
-            <div style="width: {((current_idx + 1) / len(questions)) * 100}%; background: #333; height: 100%; border-radius: 10px;"></div>
-        </div>
-    """, unsafe_allow_html=True)
-    
-    # Question card
-    st.markdown(f"""
-        <div class="question-card">
-            <h3 style="color: #1f2937; margin-bottom: 1.5rem; font-size: 1.2rem; line-height: 1.5;">
-                {q['text']}
-            </h3>
-    """, unsafe_allow_html=True)
-    
-    # Answer options
-    selected = st.session_state.user_answers.get(q["number"])
-    
-    # Get index of currently selected answer
-    current_index = None
-    if selected:
-        try:
-            current_index = ['A', 'B', 'C', 'D'].index(selected)
-        except:
-            current_index = None
-    
-    choice_option = st.radio(
-        "Select your answer:",
-        options=['A', 'B', 'C', 'D'],
-        format_func=lambda x: f"{x} - {q['choices'].get(x, '')}",
-        index=current_index,
-        key=f"choice_{q['number']}",
-        label_visibility="collapsed"
-    )
-    
-    if choice_option:
-        st.session_state.user_answers[q["number"]] = choice_option
-    
-    st.markdown("</div>", unsafe_allow_html=True)
-    
-    st.divider()
-    
-    # Navigation buttons
-    col1, col2, col3, col4 = st.columns([1, 1, 1, 1])
-    
-    with col1:
-        if st.button("Previous", use_container_width=True, disabled=(current_idx == 0)):
-            st.session_state.current_question -= 1
-            st.rerun()
-    
-    with col2:
-        st.markdown(f"<div style='text-align: center; padding: 0.5rem;'><strong>Question {current_idx + 1} out of {len(questions)}</strong></div>", unsafe_allow_html=True)
-    
-    with col3:
-        if st.button("Submit", use_container_width=True, type="primary"):
-            st.session_state.quiz_submitted = True
-            st.session_state.show_results = True
-            st.rerun()
-    
-    with col4:
-        if st.button("Next", use_container_width=True, disabled=(current_idx == len(questions) - 1)):
-            st.session_state.current_question += 1
-            st.rerun()
\ No newline at end of file
+    quiz_card(submitted=False)
+
+checkpoint_session()
+parse_metrics.record_render(screen, time.perf_counter() - run_started)
@@ -0,0 +1,311 @@
+"""Background parsing of uploaded PDFs.
+
+Each upload is parsed by a separate process, supervised by a thread from a
+server-wide pool, so that:
+
+- the session's script thread never blocks; the upload screen polls the job
+  and shows page-by-page progress,
+- a pathological PDF can be stopped: jobs are killed after
+  DECA_PARSE_TIMEOUT seconds, and PDFs with more than DECA_PARSE_MAX_PAGES
+  pages are refused before any page is extracted,
+- a job is cancelled when every session waiting for it has moved on (e.g.
+  uploaded a different file),
+- at most DECA_MAX_PARSES PDFs are parsed at once; further uploads wait in
+  line instead of competing for the CPU,
+- uploads of DECA_SPOOL_MIN_MB or more are copied in chunks to a temporary
+  file (in DECA_SPOOL_DIR, default the system temp directory) that the
+  parsing process opens by path, instead of being pickled to it as bytes;
+  the file is removed when the job ends.
+
+Jobs are keyed by exam_cache.exam_key, so sessions uploading the same PDF
+share one job. Finished results go straight into the exam cache.
+"""
+import io
+import logging
+import multiprocessing
+import os
+import queue
+import shutil
+import signal
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import exam_cache
+import parse_metrics
+from deca_parser import EXTRACT_WORKERS, count_pages, spawn_without_main, stream_exam
+from parse_metrics import ParseProfile
+
+log = logging.getLogger("deca.jobs")
+
+MAX_PARSES = int(os.environ.get("DECA_MAX_PARSES", "2"))
+PARSE_TIMEOUT = float(os.environ.get("DECA_PARSE_TIMEOUT", "180"))
+MAX_PAGES = int(os.environ.get("DECA_PARSE_MAX_PAGES", "300"))
+SPOOL_MIN_BYTES = int(float(os.environ.get("DECA_SPOOL_MIN_MB", "1")) * 1024 * 1024)
+SPOOL_DIR = os.environ.get("DECA_SPOOL_DIR")
+_SPOOL_CHUNK_BYTES = 1024 * 1024
+# Share the extraction processes between the parses that may run at once
+JOB_EXTRACT_WORKERS = max(1, EXTRACT_WORKERS // MAX_PARSES)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+_executor = ThreadPoolExecutor(max_workers=MAX_PARSES, thread_name_prefix="deca-parse")
+_jobs = {}
+_jobs_lock = threading.Lock()
+_sequence = 0
+
+
+def _spool(upload):
+    """
+    The PDF to hand to the parsing process, given its bytes or a binary
+    file: the bytes of small uploads, else the path of a temporary copy.
+    """
+    if isinstance(upload, bytes):
+        if len(upload) < SPOOL_MIN_BYTES:
+            return upload
+        upload = io.BytesIO(upload)
+    else:
+        size = upload.seek(0, io.SEEK_END)
+        upload.seek(0)
+        if size < SPOOL_MIN_BYTES:
+            return upload.read()
+    with tempfile.NamedTemporaryFile(prefix="deca-upload-", suffix=".pdf", dir=SPOOL_DIR,
+                                     delete=False) as f:
+        shutil.copyfileobj(upload, f, _SPOOL_CHUNK_BYTES)
+    upload.seek(0)
+    return f.name
+
+
+def _remove_spool(source):
+    if isinstance(source, str):
+        try:
+            os.unlink(source)
+        except OSError as e:
+            log.warning("Could not remove %s: %s", source, e)
+
+
+def _parse_in_process(source, name, events, max_pages, workers, engine=None):
+    """Child process: parse the PDF (bytes or a path), reporting progress on the events queue"""
+    if hasattr(os, "setpgrp"):
+        # A process group of its own, so stopping the job also stops the
+        # extraction workers it starts
+        os.setpgrp()
+    try:
+        num_pages = count_pages(io.BytesIO(source) if isinstance(source, bytes) else source)
+        if num_pages > max_pages:
+            events.put(("error", f"The PDF has {num_pages} pages; the limit is {max_pages}"))
+            return
+        profile = ParseProfile(name)
+        found = {"question": 0, "answer": 0}
+        for kind, payload in stream_exam(source, workers=workers, profile=profile, engine=engine):
+            if kind in found:
+                found[kind] += 1
+            elif kind == "restart":
+                found = {"question": 0, "answer": 0}
+                events.put(("progress", (0, num_pages, 0, 0)))
+            elif kind == "page":
+                events.put(("progress", (*payload, found["question"], found["answer"])))
+            elif kind == "done":
+                events.put(("done", (payload, profile)))
+    except Exception as e:
+        events.put(("error", f"{type(e).__name__}: {e}"))
+
+
+class ParseJob:
+    """
+    State of one background parse, updated by its supervisor thread and
+    read by the sessions polling it.
+    """
+
+    def __init__(self, key, name, sequence, source, engine=None):
+        self.key = key
+        self.name = name
+        self.sequence = sequence
+        self.engine = engine
+        self.state = QUEUED
+        self.page = 0
+        self.num_pages = None
+        self.questions_found = 0
+        self.answers_found = 0
+        self.error = None
+        self.watchers = set()
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self._cancel = threading.Event()
+        self._future = None
+        self._source = source
+
+    @property
+    def active(self):
+        return self.state in (QUEUED, RUNNING)
+
+    @property
+    def fraction(self):
+        """Share of pages processed, 0.0 - 1.0"""
+        return self.page / self.num_pages if self.num_pages else 0.0
+
+    def queue_position(self):
+        """Number of queued jobs ahead of this one"""
+        with _jobs_lock:
+            return sum(1 for job in _jobs.values()
+                       if job.state == QUEUED and job.sequence < self.sequence)
+
+    def joinable(self):
+        """Whether a new watcher can still wait for this job"""
+        return self.active and not self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+        if self._future is not None and self._future.cancel():
+            self.state = CANCELLED
+            _remove_spool(self._source)
+
+
+def _stop(process):
+    """Stop a parse process and whatever is left of its process group"""
+    if hasattr(os, "killpg"):
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+        except OSError:
+            pass  # the group is empty, or the child hasn't created it yet
+    if process.is_alive():
+        process.terminate()
+    process.join(5)
+    if process.is_alive():
+        process.kill()
+        process.join()
+
+
+def _supervise(job):
+    """Executor thread: run one job's process until it finishes, fails or is stopped"""
+    if job._cancel.is_set():
+        job.state = CANCELLED
+        _remove_spool(job._source)
+        return
+    job.state = RUNNING
+    job.started_at = time.monotonic()
+    context = multiprocessing.get_context("spawn")
+    events = context.Queue()
+    process = context.Process(
+        target=_parse_in_process,
+        args=(job._source, job.name, events, MAX_PAGES, JOB_EXTRACT_WORKERS, job.engine),
+    )
+    with spawn_without_main():
+        process.start()
+    log.debug("Parsing %s in process %d", job.name, process.pid)
+    deadline = job.started_at + PARSE_TIMEOUT
+    try:
+        while job.state == RUNNING:
+            if job._cancel.is_set():
+                job.state = CANCELLED
+                break
+            if time.monotonic() > deadline:
+                job.error = f"Parsing took longer than {PARSE_TIMEOUT:.0f} seconds"
+                job.state = FAILED
+                break
+            try:
+                kind, payload = events.get(timeout=0.2)
+            except queue.Empty:
+                if not process.is_alive() and events.empty():
+                    job.error = f"The parser stopped unexpectedly (exit code {process.exitcode})"
+                    job.state = FAILED
+                continue
+            if kind == "progress":
+                job.page, job.num_pages, job.questions_found, job.answers_found = payload
+            elif kind == "error":
+                job.error = payload
+                job.state = FAILED
+            elif kind == "done":
+                questions, profile = payload
+                parse_metrics.record(profile)
+                exam_cache.get_cache().put(job.key, questions)
+                job.state = DONE
+    except Exception as e:
+        job.error = f"{type(e).__name__}: {e}"
+        job.state = FAILED
+    finally:
+        if job.state == DONE:
+            # Let it exit by itself, shutting down its extraction pool
+            process.join(5)
+        _stop(process)
+        _remove_spool(job._source)
+        if job.state != DONE:
+            log.warning("Parse of %s %s: %s", job.name, job.state, job.error or "")
+        with _jobs_lock:
+            # Results are in the exam cache; the job itself is only kept
+            # around while a failure still has to be shown
+            if _jobs.get(job.key) is job and (job.state == DONE or not job.watchers):
+                del _jobs[job.key]
+
+
+def submit(key, upload, name, watcher, engine=None):
+    """
+    Start parsing upload (PDF bytes or a binary file) in the background, or
+    join the job already parsing the same PDF, on behalf of watcher, e.g. a
+    session token. engine is the deca_parser extraction engine for a new
+    job (default DEFAULT_ENGINE). Returns the job, or None when the PDF has
+    been parsed (e.g. by a job that finished since the caller last looked).
+    """
+    global _sequence
+    with _jobs_lock:
+        job = _jobs.get(key)
+        if job is not None and job.joinable():
+            job.watchers.add(watcher)
+            return job
+    if exam_cache.get_cache().get(key) is not None:
+        return None
+    # Spool outside the lock; another session may start the same job meanwhile
+    source = _spool(upload)
+    with _jobs_lock:
+        job = _jobs.get(key)
+        if job is None or not job.joinable():
+            _sequence += 1
+            job = ParseJob(key, name, _sequence, source, engine)
+            _jobs[key] = job
+            job._future = _executor.submit(_supervise, job)
+            source = None
+            log.debug("Queued parse of %s for %s", name, watcher)
+        job.watchers.add(watcher)
+    _remove_spool(source)
+    return job
+
+
+def get_job(key):
+    """The job for key, or None when there is none (or it finished)"""
+    with _jobs_lock:
+        return _jobs.get(key)
+
+
+def release(key, watcher):
+    """
+    watcher no longer needs the job for key. Jobs nobody waits for are
+    cancelled, and failed ones are forgotten.
+    """
+    with _jobs_lock:
+        job = _jobs.get(key)
+        if job is None:
+            return
+        job.watchers.discard(watcher)
+        if job.watchers:
+            return
+        if not job.active:
+            del _jobs[key]
+            return
+    job.cancel()
+    if job.state == CANCELLED:
+        # Cancelled before it started; nothing will clean it up later
+        with _jobs_lock:
+            if _jobs.get(key) is job:
+                del _jobs[key]
+
+
+def active_jobs():
+    """Queued and running jobs, oldest first"""
+    with _jobs_lock:
+        jobs = [job for job in _jobs.values() if job.active]
+    return sorted(jobs, key=lambda job: job.sequence)
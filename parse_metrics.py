@@ -0,0 +1,296 @@
+"""Timing and counters for exam parses and app screens.
+
+Every parse fills in a ParseProfile: wall time per phase (PDF open, page
+extraction, answer key split, question parsing, key parsing) plus counters
+such as skipped questions and the split strategy used, and the peak
+resident memory of the parsing process (sampled after every page, so the
+extraction workers of a parallel parse are not included). Finished profiles
+are logged on the "deca.parser" logger, kept in a short in-process history
+for the admin panel, and added to running totals that can be dumped as JSON
+or Prometheus text.
+
+The app also reports how long each script run takes per screen (and per
+quiz-card fragment rerun) through record_render, so the cost of an
+interaction can be compared between full reruns and fragment reruns.
+
+Set DECA_METRICS_PATH to have the totals rewritten after every parse
+(Prometheus text when the path ends in .prom, JSON otherwise).
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+log = logging.getLogger("deca.parser")
+
+PROFILE_HISTORY = int(os.environ.get("DECA_PROFILE_HISTORY", 50))
+METRICS_PATH = os.environ.get("DECA_METRICS_PATH")
+
+# Phases in pipeline order, for reports
+PHASES = ("open", "extract", "split", "questions", "key")
+
+_history = deque(maxlen=PROFILE_HISTORY)
+_totals = {"parses": 0, "phase_seconds": {}, "counters": {}, "strategies": {}}
+_lock = threading.Lock()
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = None
+
+# Recent render times per view, for medians
+RENDER_HISTORY = 500
+_renders = {}
+# view -> [runs, seconds] since start
+_render_totals = {}
+
+
+def configure_logging(level=None):
+    """
+    Send "deca.*" log records to stderr at level (default DECA_LOG_LEVEL,
+    else INFO). Safe to call repeatedly; only the first call adds a handler.
+    """
+    logger = logging.getLogger("deca")
+    level = level or os.environ.get("DECA_LOG_LEVEL", "INFO")
+    logger.setLevel(level)
+    if not any(getattr(h, "_deca", False) for h in logger.handlers):
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        handler._deca = True
+        logger.addHandler(handler)
+        logger.propagate = False
+    return logger
+
+
+def current_rss():
+    """
+    Resident memory of this process in bytes, or None when unknown. Falls
+    back to the process's high-water mark where /proc is not available.
+    """
+    if _PAGE_SIZE:
+        try:
+            with open("/proc/self/statm", "rb") as f:
+                return int(f.read().split()[1]) * _PAGE_SIZE
+        except (OSError, ValueError, IndexError):
+            pass
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == "darwin" else peak * 1024
+    return None
+
+
+class ParseProfile:
+    """
+    Measurements for one parse.
+        phases    {phase: seconds}, accumulated over repeated timings
+        counters  {name: int}
+        info      {name: value} for non-numeric facts (strategy, mode)
+        peak_rss  highest resident memory seen by sample_memory, in bytes
+    """
+    __slots__ = ("source", "started_at", "phases", "counters", "info",
+                 "page_seconds", "total_seconds", "peak_rss", "_started")
+
+    def __init__(self, source=""):
+        self.source = source
+        self.started_at = time.time()
+        self.phases = {}
+        self.counters = {}
+        self.info = {}
+        self.page_seconds = []
+        self.total_seconds = None
+        self.peak_rss = None
+        self._started = time.perf_counter()
+        self.sample_memory()
+
+    @contextmanager
+    def phase(self, name):
+        """Time the body of a with block as (part of) phase name"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started)
+
+    def add_time(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def set(self, name, value):
+        self.info[name] = value
+
+    def add_page(self, seconds):
+        """Record the extraction time of one page"""
+        self.page_seconds.append(seconds)
+        self.sample_memory()
+
+    def retry(self, reason):
+        """
+        Start the parse over (e.g. with another extraction engine): counters
+        and page times are cleared, phase times and the clock keep running
+        so the total includes the abandoned attempt.
+        """
+        self.counters = {}
+        self.page_seconds = []
+        self.info = {"retry": reason}
+
+    def sample_memory(self):
+        rss = current_rss()
+        if rss is not None and (self.peak_rss is None or rss > self.peak_rss):
+            self.peak_rss = rss
+
+    def finish(self):
+        """Stop the clock; record() logs the profile and adds it to the totals"""
+        self.total_seconds = time.perf_counter() - self._started
+        self.sample_memory()
+        if self.page_seconds:
+            self.counters["pages"] = len(self.page_seconds)
+        return self
+
+    def to_dict(self):
+        pages = self.page_seconds
+        return {
+            "source": self.source,
+            "started_at": round(self.started_at, 3),
+            "total_seconds": round(self.total_seconds or 0.0, 4),
+            "phases": {name: round(seconds, 4) for name, seconds in self.phases.items()},
+            "slowest_page_seconds": round(max(pages), 4) if pages else None,
+            "peak_rss_mb": round(self.peak_rss / 2**20, 1) if self.peak_rss else None,
+            "counters": dict(self.counters),
+            **self.info,
+        }
+
+    def summary(self):
+        """One-line human readable summary"""
+        phases = ", ".join(f"{name} {self.phases[name]:.2f}s"
+                           for name in PHASES if name in self.phases)
+        counters = ", ".join(f"{name}={value}" for name, value in sorted(self.counters.items()))
+        strategy = self.info.get("strategy") or "no key found"
+        memory = f"; peak RSS {self.peak_rss / 2**20:.0f} MB" if self.peak_rss else ""
+        return (f"Parsed {self.source or 'PDF'} in {self.total_seconds or 0:.2f}s "
+                f"({phases}); {counters}; split: {strategy}{memory}")
+
+
+def record(profile):
+    """
+    Log a finished profile and add it to the history and the running totals.
+    Call it once per parse, in the process that serves the metrics.
+    """
+    with _lock:
+        _history.append(profile)
+        _totals["parses"] += 1
+        for name, seconds in profile.phases.items():
+            _totals["phase_seconds"][name] = _totals["phase_seconds"].get(name, 0.0) + seconds
+        for name, value in profile.counters.items():
+            _totals["counters"][name] = _totals["counters"].get(name, 0) + value
+        strategy = profile.info.get("strategy") or "none"
+        _totals["strategies"][strategy] = _totals["strategies"].get(strategy, 0) + 1
+
+    log.info(profile.summary())
+    if METRICS_PATH:
+        try:
+            write_metrics(METRICS_PATH)
+        except OSError as e:
+            log.warning("Could not write metrics to %s: %s", METRICS_PATH, e)
+
+
+def recent_profiles(n=None):
+    """The last n finished profiles as dicts, newest first"""
+    with _lock:
+        profiles = list(_history)
+    profiles.reverse()
+    return [p.to_dict() for p in profiles[:n]]
+
+
+def record_render(view, seconds):
+    """Record the server time of one script or fragment run of view"""
+    with _lock:
+        history = _renders.get(view)
+        if history is None:
+            history = _renders[view] = deque(maxlen=RENDER_HISTORY)
+            _render_totals[view] = [0, 0.0]
+        history.append(seconds)
+        _render_totals[view][0] += 1
+        _render_totals[view][1] += seconds
+
+
+def render_stats():
+    """{view: {"runs", "median_ms", "p95_ms"}} over the recent runs of each view"""
+    with _lock:
+        histories = {view: sorted(history) for view, history in _renders.items()}
+        runs = {view: totals[0] for view, totals in _render_totals.items()}
+    return {
+        view: {
+            "runs": runs[view],
+            "median_ms": round(times[len(times) // 2] * 1000, 2),
+            "p95_ms": round(times[min(len(times) - 1, int(len(times) * 0.95))] * 1000, 2),
+        }
+        for view, times in sorted(histories.items())
+    }
+
+
+def metrics_json():
+    """Running totals and the recent profiles as a JSON string"""
+    with _lock:
+        totals = json.loads(json.dumps(_totals))
+    return json.dumps({"totals": totals, "recent": recent_profiles(), "renders": render_stats()},
+                      indent=2)
+
+
+def metrics_prometheus():
+    """Running totals in the Prometheus text exposition format"""
+    with _lock:
+        totals = json.loads(json.dumps(_totals))
+    lines = [
+        "# HELP deca_parses_total Exam parses completed.",
+        "# TYPE deca_parses_total counter",
+        f"deca_parses_total {totals['parses']}",
+        "# HELP deca_parse_phase_seconds_total Time spent in each parse phase.",
+        "# TYPE deca_parse_phase_seconds_total counter",
+    ]
+    for name, seconds in sorted(totals["phase_seconds"].items()):
+        lines.append(f'deca_parse_phase_seconds_total{{phase="{name}"}} {seconds:.6f}')
+    lines += [
+        "# HELP deca_parse_strategy_total Parses by answer key split strategy.",
+        "# TYPE deca_parse_strategy_total counter",
+    ]
+    for name, count in sorted(totals["strategies"].items()):
+        lines.append(f'deca_parse_strategy_total{{strategy="{name}"}} {count}')
+    for name, value in sorted(totals["counters"].items()):
+        lines.append(f"# TYPE deca_parse_{name}_total counter")
+        lines.append(f"deca_parse_{name}_total {value}")
+    with _lock:
+        renders = {view: list(values) for view, values in _render_totals.items()}
+    lines += [
+        "# HELP deca_render_seconds_total Server time spent running app screens.",
+        "# TYPE deca_render_seconds_total counter",
+    ]
+    for view, (runs, seconds) in sorted(renders.items()):
+        lines.append(f'deca_render_seconds_total{{view="{view}"}} {seconds:.6f}')
+    lines += [
+        "# HELP deca_renders_total App screen runs.",
+        "# TYPE deca_renders_total counter",
+    ]
+    for view, (runs, seconds) in sorted(renders.items()):
+        lines.append(f'deca_renders_total{{view="{view}"}} {runs}')
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(path):
+    """Write the totals to path (Prometheus text for .prom, JSON otherwise)"""
+    data = metrics_prometheus() if path.endswith(".prom") else metrics_json()
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
@@ -0,0 +1,393 @@
+"""Persistent multi-exam question bank.
+
+Every exam the app parses (or batch_parse.py imports) is stored once in a
+SQLite database, so quizzes can be assembled from any number of exams
+without reopening PDFs:
+
+    exams      one row per exam: name, DECA cluster, source key
+    questions  one row per question, indexed by (exam_id, number)
+
+    questions_fts  full-text index over question text, choices and
+                   explanations, kept in sync by triggers
+
+Exam, sample and topic queries go through the indexes; exam_registry.py
+turns the row ids they return into quizzes.
+"""
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from deca_parser import PARSER_VERSION
+from exam_files import BUNDLE_SUFFIX, read_bank, read_bundle
+from question_store import LETTERS, Exam, Question
+
+log = logging.getLogger("deca.bank")
+
+DB_PATH = os.environ.get(
+    "DECA_BANK_DB", os.path.join(os.path.expanduser("~"), ".cache", "decaai", "question_bank.sqlite3")
+)
+
+# DECA career clusters and the words that identify them in exam file names
+CLUSTERS = {
+    "Business Administration Core": ("business administration core", "bac", "core"),
+    "Business Management and Administration": ("business management", "bma"),
+    "Entrepreneurship": ("entrepreneurship", "entre", "ent"),
+    "Finance": ("finance", "fin"),
+    "Hospitality and Tourism": ("hospitality", "tourism", "hosp", "ht"),
+    "Marketing": ("marketing", "mkt"),
+    "Personal Financial Literacy": ("personal financial literacy", "pfl"),
+}
+DEFAULT_CLUSTER = "Other"
+
+# SQLite's default limit on host parameters per statement is 999
+_MAX_PARAMS = 900
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS exams (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source_key TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    cluster TEXT NOT NULL,
+    parser_version TEXT NOT NULL,
+    num_questions INTEGER NOT NULL,
+    added_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS exams_cluster ON exams (cluster);
+
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    exam_id INTEGER NOT NULL REFERENCES exams (id) ON DELETE CASCADE,
+    number INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    choice_a TEXT NOT NULL,
+    choice_b TEXT NOT NULL,
+    choice_c TEXT NOT NULL,
+    choice_d TEXT NOT NULL,
+    correct TEXT,
+    explanation TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS questions_exam_number ON questions (exam_id, number);
+
+-- Inverted index for topic quizzes. The porter stemmer lets "pricing" match
+-- "price" and "prices". Triggers keep it in step with the questions table,
+-- so adding or replacing an exam only indexes that exam's questions.
+CREATE VIRTUAL TABLE IF NOT EXISTS questions_fts USING fts5 (
+    text, choice_a, choice_b, choice_c, choice_d, explanation,
+    content = 'questions', content_rowid = 'id', tokenize = 'porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS questions_fts_insert AFTER INSERT ON questions BEGIN
+    INSERT INTO questions_fts (rowid, text, choice_a, choice_b, choice_c, choice_d, explanation)
+    VALUES (new.id, new.text, new.choice_a, new.choice_b, new.choice_c, new.choice_d, new.explanation);
+END;
+CREATE TRIGGER IF NOT EXISTS questions_fts_delete AFTER DELETE ON questions BEGIN
+    INSERT INTO questions_fts (questions_fts, rowid, text, choice_a, choice_b, choice_c, choice_d, explanation)
+    VALUES ('delete', old.id, old.text, old.choice_a, old.choice_b, old.choice_c, old.choice_d, old.explanation);
+END;
+"""
+# Stored in PRAGMA user_version. Databases from before the full-text index
+# (version 0) have it built from the existing questions on open; version 1
+# databases reused the ids of replaced exams and questions, and have their
+# tables copied into AUTOINCREMENT ones (keeping the current ids)
+SCHEMA_VERSION = 2
+
+# BM25 column weights: question text, choices A-D, explanation
+_BM25_WEIGHTS = (2.0, 1.0, 1.0, 1.0, 1.0, 0.75)
+
+_QUESTION_COLUMNS = "number, text, choice_a, choice_b, choice_c, choice_d, correct, explanation"
+
+
+def guess_cluster(name):
+    """The DECA cluster named in an exam's file name or title, if any"""
+    # "BMA_Exam-2024.pdf" -> " bma exam 2024 pdf "
+    words = f" {' '.join(re.split(r'[^a-z]+', name.lower()))} "
+    for cluster, keywords in CLUSTERS.items():
+        if any(f" {keyword} " in words for keyword in keywords):
+            return cluster
+    return DEFAULT_CLUSTER
+
+
+def topic_query(topics):
+    """
+    Turn a topic string like "pricing / channel management" into an FTS5
+    query: every word of a topic must match, any topic may. Returns None
+    when there are no words to search for.
+    """
+    alternatives = []
+    for topic in re.split(r'[/,;|]|\bor\b', topics.lower()):
+        words = re.findall(r'[a-z0-9]+', topic)
+        if words:
+            alternatives.append("(" + " AND ".join(f'"{word}"' for word in words) + ")")
+    return " OR ".join(alternatives) or None
+
+
+def _question_from_row(row):
+    number, text, a, b, c, d, correct, explanation = row
+    return Question(number, text, (a, b, c, d), correct, explanation)
+
+
+class QuestionBank:
+    """
+    SQLite store of parsed exams, safe to share between threads.
+    Queries take milliseconds, so one connection behind a lock serves the
+    whole process (Streamlit runs every script run in a fresh thread, which
+    would leave per-thread connections behind).
+    """
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        if path != ":memory:":
+            # batch_parse.py can import while the app is reading
+            self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.executescript(_SCHEMA)
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            self._migrate()
+        # Called with the id of every exam that add_exam replaces
+        self._replaced_listeners = []
+
+    def _migrate(self):
+        # Dropping the old exams table must not cascade to the questions
+        self._conn.execute("PRAGMA foreign_keys = OFF")
+        try:
+            with self._conn as conn:
+                for table in ("exams", "questions"):
+                    sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                       (table,)).fetchone()[0]
+                    if "AUTOINCREMENT" in sql:
+                        continue
+                    conn.execute(sql.replace(f"CREATE TABLE {table}", f"CREATE TABLE {table}_ids", 1)
+                                 .replace("id INTEGER PRIMARY KEY,", "id INTEGER PRIMARY KEY AUTOINCREMENT,", 1))
+                    conn.execute(f"INSERT INTO {table}_ids SELECT * FROM {table}")
+                    conn.execute(f"DROP TABLE {table}")
+                    conn.execute(f"ALTER TABLE {table}_ids RENAME TO {table}")
+            # Dropping the tables dropped their indexes and triggers
+            self._conn.executescript(_SCHEMA)
+            with self._conn as conn:
+                conn.execute("INSERT INTO questions_fts (questions_fts) VALUES ('rebuild')")
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        finally:
+            self._conn.execute("PRAGMA foreign_keys = ON")
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def add_exam(self, source_key, name, questions, cluster=None, parser_version=PARSER_VERSION):
+        """
+        Store a parsed exam (a list of question dicts) and return its id.
+        source_key identifies the source (e.g. exam_cache.exam_key of the
+        PDF); adding the same key again replaces the stored exam, and the
+        new copy gets a new exam id and new question row ids (ids are never
+        reused). parser_version is that of the parser that produced the
+        questions (e.g. another server's, for an exam bundle).
+        """
+        rows = [
+            (q["number"], q["text"], *(q["choices"].get(letter, "") for letter in LETTERS),
+             q["correct"], q["explanation"])
+            for q in questions
+        ]
+        with self._lock, self._conn as conn:
+            replaced = [row[0] for row in conn.execute(
+                "SELECT id FROM exams WHERE source_key = ?", (source_key,))]
+            conn.execute("DELETE FROM exams WHERE source_key = ?", (source_key,))
+            exam_id = conn.execute(
+                "INSERT INTO exams (source_key, name, cluster, parser_version, num_questions, added_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (source_key, name, cluster or guess_cluster(name), parser_version, len(rows), time.time()),
+            ).lastrowid
+            conn.executemany(
+                f"INSERT INTO questions (exam_id, {_QUESTION_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(exam_id, *row) for row in rows],
+            )
+        for old_id in replaced:
+            for listener in self._replaced_listeners:
+                listener(old_id)
+        return exam_id
+
+    def on_exam_replaced(self, listener):
+        """Call listener(exam_id) whenever add_exam replaces that exam"""
+        self._replaced_listeners.append(listener)
+
+    def find_exam(self, source_key, parser_version=PARSER_VERSION):
+        """
+        Id of the exam stored under source_key, or None when there is none
+        or it was parsed by another parser version. With parser_version
+        None any version will do, e.g. for an exam bundle, whose questions
+        don't depend on this server's parser.
+        """
+        if parser_version is None:
+            rows = self._execute("SELECT id FROM exams WHERE source_key = ?", (source_key,))
+        else:
+            rows = self._execute(
+                "SELECT id FROM exams WHERE source_key = ? AND parser_version = ?",
+                (source_key, parser_version),
+            )
+        return rows[0][0] if rows else None
+
+    def exam_added_at(self, exam_id):
+        rows = self._execute("SELECT added_at FROM exams WHERE id = ?", (exam_id,))
+        return rows[0][0] if rows else None
+
+    def list_exams(self, cluster=None):
+        """Stored exams as dicts (id, name, cluster, num_questions, parser_version), newest first"""
+        sql = "SELECT id, name, cluster, num_questions, parser_version FROM exams"
+        params = ()
+        if cluster:
+            sql += " WHERE cluster = ?"
+            params = (cluster,)
+        rows = self._execute(sql + " ORDER BY added_at DESC, id DESC", params)
+        return [dict(zip(("id", "name", "cluster", "num_questions", "parser_version"), row))
+                for row in rows]
+
+    def clusters(self):
+        """Clusters that have at least one exam"""
+        rows = self._execute("SELECT DISTINCT cluster FROM exams ORDER BY cluster")
+        return [row[0] for row in rows]
+
+    def load_exam(self, exam_id):
+        """All questions of one exam, in the order they were parsed"""
+        return self._fetch(
+            f"SELECT {_QUESTION_COLUMNS} FROM questions WHERE exam_id = ? ORDER BY id",
+            (exam_id,),
+        )
+
+    def question_row_ids(self, exam_id):
+        """Row ids of one exam's questions, in the order load_exam returns them"""
+        return [row[0] for row in self._execute(
+            "SELECT id FROM questions WHERE exam_id = ? ORDER BY id", (exam_id,))]
+
+    def question_exams(self, ids):
+        """{row id: exam id} for the given question row ids"""
+        exam_of = {}
+        for i in range(0, len(ids), _MAX_PARAMS):
+            chunk = ids[i:i + _MAX_PARAMS]
+            exam_of.update(self._execute(
+                f"SELECT id, exam_id FROM questions WHERE id IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            ))
+        return exam_of
+
+    def question_ids(self, exam_ids=None, cluster=None):
+        """Row ids of the questions in the given exams and/or cluster"""
+        sql = "SELECT q.id FROM questions q"
+        where, params = self._filters(exam_ids, cluster)
+        if cluster:
+            sql += " JOIN exams e ON e.id = q.exam_id"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        return [row[0] for row in self._execute(sql, params)]
+
+    def search(self, topics, exam_ids=None, cluster=None, limit=None):
+        """
+        Row ids of the questions matching topics (see topic_query), best
+        BM25 match first, limited to the given exams and/or cluster
+        """
+        query = topic_query(topics)
+        if query is None:
+            return []
+        weights = ", ".join(str(w) for w in _BM25_WEIGHTS)
+        sql = "SELECT q.id FROM questions_fts JOIN questions q ON q.id = questions_fts.rowid"
+        where, params = self._filters(exam_ids, cluster)
+        if cluster:
+            sql += " JOIN exams e ON e.id = q.exam_id"
+        sql += " WHERE questions_fts MATCH ?" + "".join(" AND " + w for w in where)
+        sql += f" ORDER BY bm25(questions_fts, {weights})"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return [row[0] for row in self._execute(sql, [query] + params)]
+
+    def _filters(self, exam_ids, cluster):
+        """WHERE clauses and parameters for an exam / cluster filter"""
+        where, params = [], []
+        if cluster:
+            where.append("e.cluster = ?")
+            params.append(cluster)
+        if exam_ids:
+            where.append(f"q.exam_id IN ({', '.join('?' * len(exam_ids))})")
+            params.extend(exam_ids)
+        return where, params
+
+    def sample_ids(self, count, exam_ids=None, cluster=None):
+        """
+        Row ids of up to count random questions drawn from the given exams
+        and/or cluster (all exams when neither is given). SQLite draws the
+        sample, so the other ids never reach Python.
+        """
+        sql = "SELECT q.id FROM questions q"
+        where, params = self._filters(exam_ids, cluster)
+        if cluster:
+            sql += " JOIN exams e ON e.id = q.exam_id"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY random() LIMIT ?"
+        return [row[0] for row in self._execute(sql, params + [int(count)])]
+
+    def question_rows(self, ids):
+        """(row id, Question) of the given row ids that exist, in row id order"""
+        rows = []
+        for i in range(0, len(ids), _MAX_PARAMS):
+            chunk = ids[i:i + _MAX_PARAMS]
+            rows.extend(self._execute(
+                f"SELECT id, {_QUESTION_COLUMNS} FROM questions "
+                f"WHERE id IN ({', '.join('?' * len(chunk))})",
+                chunk,
+            ))
+        return sorted((row[0], _question_from_row(row[1:])) for row in rows)
+
+    def _fetch(self, sql, params):
+        return Exam(_question_from_row(row) for row in self._execute(sql, params))
+
+
+def import_bank_files(bank, banks):
+    """
+    Import question bank files ({name: path}, see exam_files.list_banks)
+    that are new or changed since they were last imported. Unreadable or
+    malformed files are logged and skipped. Returns the number of files
+    imported and {name: reason} for the files skipped.
+    """
+    imported = 0
+    skipped = {}
+    for name, path in banks.items():
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            continue
+        source_key = f"file:{name}"
+        is_bundle = path.endswith(BUNDLE_SUFFIX)
+        # Bundles keep the parser version they were made with
+        exam_id = bank.find_exam(source_key, None if is_bundle else PARSER_VERSION)
+        if exam_id is not None and bank.exam_added_at(exam_id) >= mtime:
+            continue
+        try:
+            if is_bundle:
+                metadata, questions = read_bundle(path)
+            else:
+                metadata, questions = {}, read_bank(path)
+        except (OSError, ValueError) as e:
+            log.warning("Skipping question bank file %s: %s", path, e)
+            skipped[name] = str(e)
+            continue
+        bank.add_exam(source_key, metadata.get("name") or name, questions, metadata.get("cluster"),
+                      str(metadata.get("parser_version") or PARSER_VERSION))
+        imported += 1
+    return imported, skipped
+
+
+_bank = None
+_bank_lock = threading.Lock()
+
+
+def get_bank():
+    """Return the process-wide question bank"""
+    global _bank
+    with _bank_lock:
+        if _bank is None:
+            _bank = QuestionBank()
+        return _bank
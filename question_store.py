@@ -0,0 +1,192 @@
+"""Compact, immutable representation of a parsed exam.
+
+The parser produces a list of question dicts. For quizzing, an exam is
+converted once into an Exam: a tuple of frozen Question records plus
+columnar NumPy arrays of question numbers and answer-key letters, so that
+range selection and scoring are vectorized array operations instead of
+Python loops over dicts.
+
+Letters are stored as small ints: A=0, B=1, C=2, D=3 and -1 for a missing
+answer key (or, in an answers array, an unanswered question).
+"""
+from collections import namedtuple
+
+import numpy as np
+
+LETTERS = "ABCD"
+NO_ANSWER = -1
+NO_EXPLANATION = "No explanation available."
+
+
+def letter_index(letter):
+    """Map 'A'-'D' to 0-3 and anything else (None, '') to NO_ANSWER"""
+    if letter and letter in LETTERS:
+        return LETTERS.index(letter)
+    return NO_ANSWER
+
+
+class Question(namedtuple("Question", ["number", "text", "choices", "correct", "explanation"])):
+    """
+    A single parsed question. choices is a tuple of the A-D choice texts,
+    correct is the answer-key letter or None.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_dict(cls, q):
+        return cls(
+            q["number"],
+            q["text"],
+            tuple(q["choices"].get(letter, "") for letter in LETTERS),
+            q["correct"],
+            q["explanation"],
+        )
+
+    def to_dict(self):
+        return {
+            "number": self.number,
+            "text": self.text,
+            "choices": dict(zip(LETTERS, self.choices)),
+            "correct": self.correct,
+            "explanation": self.explanation,
+        }
+
+    def choice(self, letter):
+        """Text of the choice for letter, or '' when there is none"""
+        index = letter_index(letter)
+        return self.choices[index] if index != NO_ANSWER else ""
+
+
+class Exam:
+    """
+    Immutable, ordered collection of questions with columnar arrays:
+        numbers  int32 question numbers
+        key      int8 answer-key letters (NO_ANSWER when missing)
+    Exams are safe to share between sessions.
+    """
+    __slots__ = ("questions", "numbers", "key")
+
+    def __init__(self, questions, numbers=None, key=None):
+        self.questions = tuple(questions)
+        if numbers is None:
+            numbers = np.fromiter((q.number for q in self.questions), dtype=np.int32,
+                                  count=len(self.questions))
+        if key is None:
+            key = np.fromiter((letter_index(q.correct) for q in self.questions), dtype=np.int8,
+                              count=len(self.questions))
+        numbers.flags.writeable = False
+        key.flags.writeable = False
+        self.numbers = numbers
+        self.key = key
+
+    @classmethod
+    def from_dicts(cls, questions):
+        """Build an Exam from the parser's list of question dicts"""
+        return cls(Question.from_dict(q) for q in questions)
+
+    def to_dicts(self):
+        return [q.to_dict() for q in self.questions]
+
+    def __len__(self):
+        return len(self.questions)
+
+    def __getitem__(self, index):
+        return self.questions[index]
+
+    def __iter__(self):
+        return iter(self.questions)
+
+    def select_range(self, start, count):
+        """Positions of the questions numbered start .. start + count - 1"""
+        return np.flatnonzero((self.numbers >= start) & (self.numbers <= start + count - 1))
+
+    def count_with_answers(self):
+        return int(np.count_nonzero(self.key != NO_ANSWER))
+
+    def count_with_explanations(self):
+        return sum(1 for q in self.questions if q.explanation != NO_EXPLANATION)
+
+
+def new_answers(num_questions):
+    """An answers array for a quiz, every question unanswered"""
+    return np.full(num_questions, NO_ANSWER, dtype=np.int8)
+
+
+def wrong_answer_details(exam, answers):
+    """
+    Build review records for every wrong or unanswered question.
+    Only needed by the review page, so it is not part of scoring.
+    """
+    wrong_positions = np.flatnonzero((answers == NO_ANSWER) | (answers != exam.key))
+    details = []
+    for position in wrong_positions:
+        q = exam[position]
+        user_ans = int(answers[position])
+        details.append({
+            "number": q.number,
+            "question": q.text,
+            "your_answer": LETTERS[user_ans] if user_ans != NO_ANSWER else "Not answered",
+            "correct_answer": q.correct,
+            "explanation": q.explanation,
+            "choice_text": q.choice(q.correct) if q.correct else "",
+            "is_unanswered": user_ans == NO_ANSWER
+        })
+    return details
+
+
+class ScoreTracker:
+    """
+    Running score for one quiz attempt. Keeps the answers array and the
+    correct / incorrect / unanswered counts up to date in O(1) per answer
+    change, so the score banner and results page never rescan the quiz.
+    """
+    __slots__ = ("key", "answers", "correct", "incorrect", "unanswered")
+
+    def __init__(self, exam):
+        self.key = exam.key
+        self.answers = new_answers(len(exam))
+        self.correct = 0
+        self.incorrect = 0
+        self.unanswered = len(exam)
+
+    def __len__(self):
+        return len(self.answers)
+
+    @property
+    def answered(self):
+        return len(self.answers) - self.unanswered
+
+    @property
+    def score(self):
+        """Percentage of all questions answered correctly"""
+        total = len(self.answers)
+        return (self.correct / total * 100) if total > 0 else 0
+
+    def extended(self, exam):
+        """
+        A tracker for exam, a quiz that starts with this tracker's
+        questions, keeping the answers given so far
+        """
+        tracker = ScoreTracker(exam)
+        tracker.answers[:len(self.answers)] = self.answers
+        tracker.correct = self.correct
+        tracker.incorrect = self.incorrect
+        tracker.unanswered = self.unanswered + len(exam) - len(self.answers)
+        return tracker
+
+    def record(self, position, answer):
+        """Set the answer (0-3, or NO_ANSWER) for the question at position"""
+        old = int(self.answers[position])
+        if old == answer:
+            return
+        self._count(position, old, -1)
+        self.answers[position] = answer
+        self._count(position, answer, 1)
+
+    def _count(self, position, answer, delta):
+        if answer == NO_ANSWER:
+            self.unanswered += delta
+        elif answer == self.key[position]:
+            self.correct += delta
+        else:
+            self.incorrect += delta
@@ -0,0 +1,272 @@
+"""Spaced-repetition review of bank questions (SM-2).
+
+Every answered question becomes a card for the learner who answered it:
+when it is next due, its ease factor, interval and repetition count.
+Cards and the log of every answer are kept in SQLite (by default next to
+the question bank, in the same database file), keyed by learner name and
+question bank row id.
+
+A review session loads a learner's cards into a ReviewScheduler, a binary
+heap ordered by (due time, ease), so the most overdue and, among equally
+due cards, the hardest card comes first. Picking the next card and
+rescheduling an answered one are O(log n) however many exams the history
+covers. Rescheduling pushes a new heap entry rather than searching the
+heap for the old one; stale entries are skipped when they reach the top
+and the heap is rebuilt when they outnumber the live cards.
+
+SM-2 grading: a correct answer counts as quality 4 and a wrong one as 1.
+Passed cards come back after 1 day, then 6 days, then the previous
+interval times the ease. Missed cards start over and come back after
+DECA_RELEARN_SECONDS, so they reappear later in the same session.
+"""
+import heapq
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+from question_bank import DB_PATH as BANK_DB_PATH
+
+DB_PATH = os.environ.get("DECA_REVIEW_DB", BANK_DB_PATH)
+RELEARN_SECONDS = float(os.environ.get("DECA_RELEARN_SECONDS", "600"))
+
+DAY_SECONDS = 24 * 60 * 60
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+CORRECT_QUALITY = 4
+WRONG_QUALITY = 1
+# Rebuild the heap when it holds this many times more entries than cards
+_COMPACT_RATIO = 2
+# SQLite's default limit on host parameters per statement is 999
+_MAX_PARAMS = 900
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS review_cards (
+    learner TEXT NOT NULL,
+    question_id INTEGER NOT NULL,
+    due REAL NOT NULL,
+    ease REAL NOT NULL,
+    interval_days REAL NOT NULL,
+    repetitions INTEGER NOT NULL,
+    lapses INTEGER NOT NULL,
+    reviewed_at REAL NOT NULL,
+    PRIMARY KEY (learner, question_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS review_log (
+    id INTEGER PRIMARY KEY,
+    learner TEXT NOT NULL,
+    question_id INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    answered_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS review_log_learner ON review_log (learner, answered_at);
+"""
+
+
+class Card(namedtuple("Card", ["question_id", "due", "ease", "interval_days", "repetitions", "lapses"])):
+    """
+    Review state of one question for one learner. question_id is the
+    question's bank row id; due is a Unix time.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def new(cls, question_id, now):
+        """A question the learner has not answered yet, due now"""
+        return cls(question_id, now, INITIAL_EASE, 0.0, 0, 0)
+
+
+def review(card, correct, now):
+    """The card after answering it (correctly or not) at time now"""
+    quality = CORRECT_QUALITY if correct else WRONG_QUALITY
+    ease = max(MIN_EASE, card.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    if quality < 3:
+        return card._replace(due=now + RELEARN_SECONDS, ease=ease, interval_days=1.0,
+                             repetitions=0, lapses=card.lapses + 1)
+    repetitions = card.repetitions + 1
+    if repetitions == 1:
+        interval = 1.0
+    elif repetitions == 2:
+        interval = 6.0
+    else:
+        interval = float(round(card.interval_days * card.ease))
+    return card._replace(due=now + interval * DAY_SECONDS, ease=ease, interval_days=interval,
+                         repetitions=repetitions)
+
+
+class ReviewScheduler:
+    """
+    The cards of one review session, most overdue first. Supports len()
+    and `question_id in scheduler`.
+    """
+
+    def __init__(self, cards=()):
+        self._cards = {card.question_id: card for card in cards}
+        self._order = itertools.count()
+        self._heap = [self._entry(card) for card in self._cards.values()]
+        heapq.heapify(self._heap)
+
+    def __len__(self):
+        return len(self._cards)
+
+    def __contains__(self, question_id):
+        return question_id in self._cards
+
+    def _entry(self, card):
+        # The counter keeps equal (due, ease) cards in insertion order and
+        # keeps Card objects from being compared
+        return (card.due, card.ease, next(self._order), card)
+
+    def get(self, question_id):
+        return self._cards.get(question_id)
+
+    def push(self, card):
+        """Add a card, or reschedule the card with the same question_id"""
+        self._cards[card.question_id] = card
+        heapq.heappush(self._heap, self._entry(card))
+        if len(self._heap) > _COMPACT_RATIO * len(self._cards) + 16:
+            self._heap = [self._entry(live) for live in self._cards.values()]
+            heapq.heapify(self._heap)
+
+    def remove(self, question_id):
+        """Drop a card; its heap entry is discarded when it reaches the top"""
+        self._cards.pop(question_id, None)
+
+    def peek(self):
+        """The next card, due or not, or None when there are none"""
+        heap = self._heap
+        while heap and self._cards.get(heap[0][3].question_id) is not heap[0][3]:
+            heapq.heappop(heap)
+        return heap[0][3] if heap else None
+
+    def next_due(self, now):
+        """The next card if it is due at time now, else None"""
+        card = self.peek()
+        return card if card is not None and card.due <= now else None
+
+    def answer(self, question_id, correct, now):
+        """Grade an answer to the card for question_id, reschedule it and return it"""
+        card = review(self._cards.get(question_id) or Card.new(question_id, now), correct, now)
+        self.push(card)
+        return card
+
+
+class ReviewStore:
+    """
+    SQLite store of review cards and answers, safe to share between
+    threads, with one connection behind a lock like question_bank.QuestionBank.
+    """
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def cards(self, learner):
+        """All of the learner's cards"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT question_id, due, ease, interval_days, repetitions, lapses "
+                "FROM review_cards WHERE learner = ?",
+                (learner,),
+            ).fetchall()
+        return [Card(*row) for row in rows]
+
+    def due_summary(self, learner, new_question_ids=(), now=None):
+        """
+        (number of cards due at time now, due time of the next card or
+        None) for the session start_review would start, counted in SQL
+        without loading the cards
+        """
+        now = time.time() if now is None else now
+        new_question_ids = [int(question_id) for question_id in new_question_ids]
+        with self._lock:
+            due, next_due = self._conn.execute(
+                "SELECT coalesce(sum(due <= ?), 0), min(due) FROM review_cards WHERE learner = ?",
+                (now, learner),
+            ).fetchone()
+            seen = 0
+            for i in range(0, len(new_question_ids), _MAX_PARAMS):
+                chunk = new_question_ids[i:i + _MAX_PARAMS]
+                seen += self._conn.execute(
+                    f"SELECT count(*) FROM review_cards WHERE learner = ? "
+                    f"AND question_id IN ({', '.join('?' * len(chunk))})",
+                    (learner, *chunk),
+                ).fetchone()[0]
+        unseen = len(new_question_ids) - seen
+        if unseen:
+            due += unseen
+            next_due = now if next_due is None else min(next_due, now)
+        return due, next_due
+
+    def save(self, learner, answers, now=None):
+        """
+        Store answered cards: answers is a list of (card after the answer,
+        correct). The cards replace the stored ones and every answer is
+        appended to the log, in one transaction.
+        """
+        now = time.time() if now is None else now
+        with self._lock, self._conn as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO review_cards (learner, question_id, due, ease, interval_days, "
+                "repetitions, lapses, reviewed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(learner, *card, now) for card, _ in answers],
+            )
+            conn.executemany(
+                "INSERT INTO review_log (learner, question_id, correct, answered_at) VALUES (?, ?, ?, ?)",
+                [(learner, card.question_id, int(correct), now) for card, correct in answers],
+            )
+
+    def record_quiz(self, learner, question_ids, correct, now=None):
+        """
+        Grade a finished quiz into the learner's cards: question_ids and
+        correct are parallel sequences of the answered questions
+        """
+        now = time.time() if now is None else now
+        scheduler = ReviewScheduler(self.cards(learner))
+        answers = [(scheduler.answer(int(question_id), bool(ok), now), bool(ok))
+                   for question_id, ok in zip(question_ids, correct)]
+        if answers:
+            self.save(learner, answers, now)
+        return len(answers)
+
+
+def start_review(store, learner, new_question_ids, exists=None, now=None):
+    """
+    A ReviewScheduler for a learner's session: every stored card, plus a
+    new card (due now) for each of new_question_ids the learner has never
+    answered. exists, if given, filters the stored cards by question id
+    (e.g. to drop questions of exams removed from the bank).
+    """
+    now = time.time() if now is None else now
+    cards = store.cards(learner)
+    if exists is not None:
+        kept = exists([card.question_id for card in cards])
+        cards = [card for card in cards if card.question_id in kept]
+    scheduler = ReviewScheduler(cards)
+    for question_id in new_question_ids:
+        question_id = int(question_id)
+        if question_id not in scheduler:
+            scheduler.push(Card.new(question_id, now))
+    return scheduler
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_review_store():
+    """Return the process-wide review store"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ReviewStore()
+        return _store
@@ -0,0 +1,16 @@
+import os
+import sys
+import tempfile
+
+# The app's stores read their locations from the environment at import
+# time, so point them at a scratch directory before any test imports them
+_scratch = tempfile.mkdtemp(prefix="deca-tests-")
+for name, path in (("DECA_BANK_DB", "bank.sqlite3"), ("DECA_BANK_DIR", "banks"),
+                   ("DECA_CHECKPOINT_DB", "checkpoints.sqlite3"), ("DECA_ATTEMPT_LOG_DIR", "attempts"),
+                   ("DECA_CACHE_DIR", "exams")):
+    os.environ[name] = os.path.join(_scratch, path)
+
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _root)
+# For the synthetic exams of the benchmarks
+sys.path.insert(0, os.path.join(_root, "benchmarks"))
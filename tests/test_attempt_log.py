@@ -0,0 +1,55 @@
+"""Attempt log analytics against hand-computed values"""
+import pytest
+
+from attempt_log import exam_accuracy, load_attempts, question_stats, record_attempt, student_trends
+from exam_registry import ExamRegistry
+from question_bank import QuestionBank
+
+
+def questions(prefix, keys):
+    return [{"number": i, "text": f"{prefix} question {i}", "choices": {"A": "a", "B": "b", "C": "c", "D": "d"},
+             "correct": key, "explanation": "No explanation available."} for i, key in enumerate(keys, 1)]
+
+
+def test_stats_over_two_sessions(tmp_path):
+    bank = QuestionBank(str(tmp_path / "bank.sqlite3"))
+    registry = ExamRegistry(bank)
+    x = bank.add_exam("x", "X", questions("X", "BCD"))
+    y = bank.add_exam("y", "Y", questions("Y", "BC"))
+    rows = [int(row) for exam_id in (x, y) for row in registry.row_ids(exam_id)]
+    quiz = registry.quiz_from_rows(rows)
+    log_dir = str(tmp_path / "attempts")
+    # Keys B C D | B C; -1 is unanswered
+    record_attempt(quiz, [1, 2, 0, 1, -1], learner="ann", log_dir=log_dir, now=100.0)
+    record_attempt(quiz, [1, 0, 3, 0, 2], learner="bob", log_dir=log_dir, now=150.0)
+    # A second session of the app appends to the same log
+    record_attempt(registry.quiz_from_rows(rows), [1, 2, 0, 1, 2], learner="ann", log_dir=log_dir,
+                   now=200.0)
+    attempts = load_attempts(log_dir=log_dir)
+    assert len(attempts) == 15
+
+    stats = question_stats(attempts, min_answers=3).loc[rows]
+    assert stats["answers"].tolist() == [3, 3, 3, 3, 2]
+    # Miss rate is 1 - difficulty
+    assert (1 - stats["difficulty"]).tolist() == pytest.approx([0, 1 / 3, 2 / 3, 1 / 3, 0])
+    assert stats["distractor"].tolist() == ["", "A", "A", "A", ""]
+    assert stats["distractor_share"].tolist() == pytest.approx([0, 1 / 3, 2 / 3, 1 / 3, 0])
+    # Only bob got X3, and his rest score (2 of 4) is below ann's (3 of 3, 4 of 4)
+    assert stats.loc[rows[2], "discrimination"] == pytest.approx(-1)
+    # X2 and Y1 were only missed by bob, whose rest score (3 of 4) is no
+    # lower than ann's (2 of 3, 3 of 4), so they discriminate negatively too
+    assert (stats["discrimination"].iloc[[1, 3]] < 0).all()
+    assert stats["suspect_key"].tolist() == [False, True, True, True, False]
+
+    accuracy = exam_accuracy(attempts).set_index(["learner", "exam_id"])
+    assert accuracy.loc[("ann", x)].tolist() == pytest.approx([6, 4 / 6])
+    assert accuracy.loc[("ann", y)].tolist() == pytest.approx([3, 1])
+    assert accuracy.loc[("bob", x)].tolist() == pytest.approx([3, 2 / 3])
+    assert accuracy.loc[("bob", y)].tolist() == pytest.approx([2, 1 / 2])
+
+    trends = student_trends(attempts, window=2)
+    assert trends["learner"].tolist() == ["ann", "ann", "bob"]
+    assert trends["answered_at"].tolist() == [100.0, 200.0, 150.0]
+    assert trends["questions"].tolist() == [5, 5, 5]
+    assert trends["score"].tolist() == pytest.approx([60, 80, 60])
+    assert trends["rolling_score"].tolist() == pytest.approx([60, 70, 60])
@@ -0,0 +1,28 @@
+"""Importing bank files and bundles from the bank directory"""
+from exam_files import list_banks, write_bank, write_bundle
+from question_bank import QuestionBank, import_bank_files
+
+QUESTIONS = [
+    {"number": 1, "text": "Which price is best?", "choices": {"A": "Low", "B": "High"}, "correct": "A",
+     "explanation": "No explanation available."},
+    {"number": 2, "text": "Which channel?", "choices": {"A": "Retail", "B": "Direct"}, "correct": None,
+     "explanation": "No explanation available."},
+]
+
+
+def test_malformed_files_are_skipped(tmp_path):
+    write_bank(str(tmp_path / "good.jsonl"), QUESTIONS)
+    write_bundle(str(tmp_path / "shared.decaexam"), QUESTIONS, "Shared")
+    (tmp_path / "truncated.jsonl").write_text('{"number": 1, "text": "Wh\n', encoding="utf-8")
+    (tmp_path / "wrong.jsonl").write_text('[1, 2, 3]\n', encoding="utf-8")
+    (tmp_path / "binary.jsonl").write_bytes(b"\xff\xfe\x00")
+    (tmp_path / "broken.decaexam").write_bytes(b"not a bundle")
+    bank = QuestionBank(str(tmp_path / "bank.sqlite3"))
+
+    imported, skipped = import_bank_files(bank, list_banks(str(tmp_path)))
+    assert imported == 2
+    assert sorted(skipped) == ["binary", "broken", "truncated", "wrong"]
+    assert sorted(e["name"] for e in bank.list_exams()) == ["Shared", "good"]
+    # Imported files aren't read again; skipped ones are retried
+    imported, skipped = import_bank_files(bank, list_banks(str(tmp_path)))
+    assert imported == 0 and len(skipped) == 4
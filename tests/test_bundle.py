@@ -0,0 +1,93 @@
+"""Exam bundles: round trip, rejected bundles and their parser version"""
+import hashlib
+import json
+import struct
+import zlib
+
+import pytest
+
+from exam_files import BUNDLE_FORMAT, BUNDLE_MAGIC, BundleError, pack_bundle, unpack_bundle
+from question_bank import QuestionBank
+from question_store import Exam
+
+QUESTIONS = [
+    {"number": 1, "text": "Which price is best?", "choices": {"A": "Low", "B": "High", "C": "Fair", "D": "None"},
+     "correct": "C", "explanation": "Fair prices keep customers."},
+    {"number": 2, "text": "Pick one — ünïcode", "choices": {"A": "a", "B": "b", "C": "c"},
+     "correct": None, "explanation": "No explanation available."},
+]
+
+
+def bundle_of(columns, header=None):
+    """A bundle with an arbitrary payload and a valid checksum"""
+    payload = zlib.compress(json.dumps(columns).encode("utf-8"))
+    header = json.dumps({"format": BUNDLE_FORMAT, "name": "Bad", "payload_size": len(payload),
+                         "sha256": hashlib.sha256(payload).hexdigest(), **(header or {})}).encode("utf-8")
+    return struct.pack(">8sHI", BUNDLE_MAGIC, BUNDLE_FORMAT, len(header)) + header + payload
+
+
+def columns_of(questions):
+    return {
+        "number": [q["number"] for q in questions],
+        "text": [q["text"] for q in questions],
+        "choices": {letter: [q["choices"].get(letter) for q in questions] for letter in "ABCD"},
+        "correct": [q["correct"] for q in questions],
+        "explanation": [q["explanation"] for q in questions],
+    }
+
+
+def test_round_trip():
+    metadata, questions = unpack_bundle(pack_bundle(QUESTIONS, "Finance 2024", "Finance"))
+    assert questions == QUESTIONS
+    assert metadata["name"] == "Finance 2024" and metadata["cluster"] == "Finance"
+    assert metadata["num_questions"] == 2
+    assert Exam.from_dicts(questions).to_dicts()[0] == QUESTIONS[0]
+
+
+@pytest.mark.parametrize("field, value", [
+    ("number", None), ("number", "abc"), ("number", 1.5), ("number", True),
+    ("text", None), ("text", 12), ("explanation", None),
+    ("correct", "E"), ("correct", "a"), ("correct", 1),
+])
+def test_rejects_wrong_field_types(field, value):
+    columns = columns_of(QUESTIONS)
+    columns[field][0] = value
+    with pytest.raises(BundleError):
+        unpack_bundle(bundle_of(columns))
+
+
+def test_rejects_choice_that_is_not_text():
+    columns = columns_of(QUESTIONS)
+    columns["choices"]["B"][0] = {"text": "High"}
+    with pytest.raises(BundleError):
+        unpack_bundle(bundle_of(columns))
+
+
+@pytest.mark.parametrize("damage", [
+    lambda data: data[:-10],
+    lambda data: data[:-1] + bytes([data[-1] ^ 1]),
+    lambda data: b"NOTEXAM!" + data[8:],
+    lambda data: data[:8] + struct.pack(">H", BUNDLE_FORMAT + 1) + data[10:],
+    lambda data: data[:5],
+])
+def test_rejects_damaged_bundles(damage):
+    with pytest.raises(BundleError):
+        unpack_bundle(damage(pack_bundle(QUESTIONS, "Finance 2024")))
+
+
+def test_rejects_ragged_columns():
+    columns = columns_of(QUESTIONS)
+    columns["text"].pop()
+    with pytest.raises(BundleError):
+        unpack_bundle(bundle_of(columns))
+
+
+def test_bank_keeps_the_bundle_parser_version(tmp_path):
+    bank = QuestionBank(str(tmp_path / "bank.sqlite3"))
+    metadata, questions = unpack_bundle(pack_bundle(QUESTIONS, "Old exam", parser_version="1"))
+    assert metadata["parser_version"] == "1"
+    exam_id = bank.add_exam("bundle:x", "Old exam", questions, parser_version=metadata["parser_version"])
+    assert bank.list_exams()[0]["parser_version"] == "1"
+    assert bank.find_exam("bundle:x") is None
+    assert bank.find_exam("bundle:x", parser_version=None) == exam_id
+    assert Exam.from_dicts(questions).to_dicts() == bank.load_exam(exam_id).to_dicts()
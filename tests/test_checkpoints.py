@@ -0,0 +1,89 @@
+"""Checkpoints: capture, store and restore a session's progress"""
+import time
+
+import numpy as np
+
+from checkpoints import CheckpointStore, capture, new_token, restore
+from exam_registry import ExamRegistry, Quiz
+from question_bank import QuestionBank
+from question_store import NO_ANSWER, Exam, ScoreTracker
+
+
+def questions(prefix, count):
+    return [{"number": i, "text": f"{prefix} question {i}", "choices": {"A": "a", "B": "b", "C": "c", "D": "d"},
+             "correct": "ABCD"[i % 4], "explanation": "No explanation available."}
+            for i in range(1, count + 1)]
+
+
+def session_of(exam_id, quiz, tracker, **state):
+    session = {"exam_id": exam_id, "quiz": quiz, "tracker": tracker, "review": None, "current_question": 0,
+               "start_question": 1, "num_questions": len(quiz), "quiz_started": True,
+               "quiz_submitted": False, "show_results": False}
+    session.update(state)
+    return session
+
+
+def test_round_trip(tmp_path):
+    bank = QuestionBank(str(tmp_path / "bank.sqlite3"))
+    registry = ExamRegistry(bank)
+    first = bank.add_exam("first", "First", questions("First", 30))
+    second = bank.add_exam("second", "Second", questions("Second", 20))
+    rows = [int(row) for row in (*registry.row_ids(second)[[3, 1]], *registry.row_ids(first)[[0, 29, 7]])]
+    quiz = registry.quiz_from_rows(rows)
+    tracker = ScoreTracker(quiz)
+    tracker.record(0, 2)
+    tracker.record(3, int(quiz.key[3]))
+    session = session_of(first, quiz, tracker, current_question=3, quiz_submitted=True, show_results=True)
+
+    store = CheckpointStore(str(tmp_path / "checkpoints.sqlite3"), flush_seconds=0)
+    token = new_token()
+    checkpoint = capture(session)
+    store.save(token, checkpoint)
+    # Later answers don't change a captured checkpoint
+    tracker.record(4, 1)
+    store.flush()
+    loaded = CheckpointStore(store.path).load(token)
+    assert loaded == checkpoint
+
+    state = restore(loaded, registry=ExamRegistry(bank))
+    assert state["exam_id"] == first
+    assert (state["quiz_started"], state["quiz_submitted"], state["show_results"]) == (True, True, True)
+    assert state["current_question"] == 3
+    restored_quiz, restored = state["quiz"], state["tracker"]
+    np.testing.assert_array_equal(restored_quiz.row_ids(), rows)
+    assert [q.text for q in restored_quiz] == [q.text for q in quiz]
+    assert list(restored.answers) == [2, NO_ANSWER, NO_ANSWER, int(quiz.key[3]), NO_ANSWER]
+    assert (restored.correct, restored.incorrect, restored.unanswered) == (
+        1 + (quiz.key[0] == 2), int(quiz.key[0] != 2), 3)
+
+    store.delete(token)
+    store.flush()
+    assert store.load(token) is None
+
+
+def test_review_and_missing_exam(tmp_path):
+    bank = QuestionBank(str(tmp_path / "bank.sqlite3"))
+    registry = ExamRegistry(bank)
+    exam_id = bank.add_exam("only", "Only", questions("Only", 5))
+    # A spaced review resumes from the configuration screen of its exam
+    session = session_of(exam_id, registry.quiz_from_range(exam_id, 1, 2), ScoreTracker(Exam([])),
+                         review=object())
+    state = restore(capture(session), registry=registry)
+    assert state["exam_id"] == exam_id and not state["quiz_started"]
+    assert len(state["quiz"]) == 0
+    # Checkpoints of exams that are no longer in the bank aren't restored
+    missing = capture(session_of(exam_id + 1, Quiz((), [], registry=registry), ScoreTracker(Exam([])),
+                                 quiz_started=False))
+    assert restore(missing, registry=registry) is None
+
+
+def test_background_writes_are_counted(tmp_path):
+    store = CheckpointStore(str(tmp_path / "checkpoints.sqlite3"), flush_seconds=0.2)
+    session = session_of(1, Quiz((), [], registry=ExamRegistry()), ScoreTracker(Exam([])))
+    for token in ("a", "b", "a"):
+        store.save(token, capture(session))
+    deadline = time.time() + 5
+    while store.rows_written < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    assert (store.flushes, store.rows_written) == (1, 2)
+    assert store.flush() == 0 and store.rows_written == 2
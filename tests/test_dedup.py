@@ -0,0 +1,66 @@
+"""Near-duplicate detection: LSH recall around the threshold"""
+import random
+
+import numpy as np
+
+import dedup
+import synthetic
+from question_store import Question
+
+
+def planted_pairs(count, seed=0):
+    """count originals, each followed by a copy with a few words changed"""
+    rng = random.Random(seed)
+    questions = []
+    for i in range(count):
+        words = [rng.choice(synthetic.NOUNS + synthetic.VERBS + synthetic.ADJECTIVES + synthetic.TOPICS)
+                 for _ in range(40)]
+        choices = tuple(synthetic._phrase(rng, 4) for _ in range(4))
+        questions.append(Question(i, " ".join(words), choices, "A", ""))
+        for _ in range(rng.randint(1, 3)):
+            words[rng.randrange(len(words))] = f"changed{rng.randrange(1000)}"
+        questions.append(Question(i, " ".join(words), choices[::-1], "A", ""))
+    return questions
+
+
+def test_bands_catch_pairs_well_below_the_threshold():
+    bands = dedup.bands_for(0.7)
+    rows = dedup.NUM_PERM // bands
+    assert (1 / bands) ** (1 / rows) < 0.5
+    assert dedup.bands_for(0.9) <= bands <= dedup.bands_for(0.5)
+
+
+def test_recall_on_planted_near_duplicates():
+    signatures = dedup.signatures(planted_pairs(400))
+    originals, copies = np.arange(0, 800, 2), np.arange(1, 800, 2)
+    similar = dedup.similarity(signatures, originals, copies)
+    # Copies just over the threshold are the ones a too-narrow LSH misses
+    near = (similar >= dedup.THRESHOLD) & (similar < dedup.THRESHOLD + 0.1)
+    assert near.sum() >= 50
+    groups = dedup.duplicate_groups(signatures)
+    found = groups[originals] == groups[copies]
+    assert found[similar >= dedup.THRESHOLD].all()
+    # Nothing below the threshold is joined, and no pair joins another
+    assert not found[similar < dedup.THRESHOLD - 0.1].any()
+    assert len(np.unique(groups)) >= 400
+
+
+def test_reordered_choices_are_duplicates():
+    question = Question(1, "What is the most effective way to price a product?",
+                        ("Cost plus", "Value based", "Competitive", "Skimming"), "A", "")
+    reordered = question._replace(choices=question.choices[::-1])
+    signatures = dedup.signatures([question, reordered])
+    assert dedup.similarity(signatures, [0], [1])[0] == 1.0
+
+
+def test_every_pair_in_a_bucket_is_a_candidate():
+    # All three share the first band; only the second and third are similar
+    signatures = np.zeros((3, dedup.NUM_PERM), dtype=np.uint32)
+    half = dedup.NUM_PERM // 2
+    signatures[0, half:] = 1
+    signatures[1, half:] = 2
+    signatures[2, half:] = 2
+    signatures[2, half + half // 2:] = 3
+    first, second = dedup.candidate_pairs(signatures, bands=2)
+    assert list(zip(first.tolist(), second.tolist())) == [(0, 1), (0, 2), (1, 2)]
+    assert dedup.similarity(signatures, first, second).tolist() == [0.5, 0.5, 0.75]
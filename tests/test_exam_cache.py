@@ -0,0 +1,37 @@
+"""Exam cache: disk round trip and failed writes"""
+import os
+
+import pytest
+
+from exam_cache import ExamCache
+
+QUESTIONS = [{"number": 1, "text": "Q", "choices": {"A": "a", "B": "b"}, "correct": "A",
+              "explanation": "No explanation available."}]
+
+
+def test_round_trip_reads_from_disk(tmp_path):
+    cache = ExamCache(cache_dir=str(tmp_path))
+    cache.put("key", QUESTIONS)
+    assert cache.get("key") == QUESTIONS
+    # Nothing is kept in memory: a second cache on the same directory sees it
+    assert ExamCache(cache_dir=str(tmp_path)).get("key") == QUESTIONS
+    cache.clear()
+    assert cache.get("key") is None
+
+
+def test_failed_write_raises(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    cache = ExamCache(cache_dir=str(blocker / "exams"))
+    with pytest.raises(OSError):
+        cache.put("key", QUESTIONS)
+    assert cache.get("key") is None
+
+
+def test_disk_budget_evicts_oldest(tmp_path):
+    cache = ExamCache(cache_dir=str(tmp_path), disk_max_bytes=150)
+    cache.put("old", QUESTIONS)
+    os.utime(tmp_path / "old.json", (1, 1))
+    cache.put("new", QUESTIONS)
+    assert cache.get("old") is None
+    assert cache.get("new") == QUESTIONS
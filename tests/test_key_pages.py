@@ -0,0 +1,31 @@
+"""Answer keys read from the key pages alone against the full parse"""
+import io
+
+import pytest
+
+import synthetic
+from deca_parser import extract_answer_key, extract_questions_and_answers, locate_key_pages
+from question_store import NO_EXPLANATION
+
+
+@pytest.mark.parametrize("labeled_key, explanations, two_column", [
+    (True, True, 0.4), (True, False, 0.4), (False, False, 0.4), (False, True, 0.4), (True, True, 1.0),
+])
+def test_key_pages_match_full_parse(labeled_key, explanations, two_column):
+    pdf = synthetic.write_pdf(synthetic.generate_exam(
+        num_questions=80, labeled_key=labeled_key, explanations=explanations, two_column=two_column))
+    questions = extract_questions_and_answers(io.BytesIO(pdf), workers=1)
+    answer_key, explanations_by_number = extract_answer_key(pdf)
+
+    assert {q["number"]: q["correct"] for q in questions} == {
+        q["number"]: answer_key.get(q["number"]) for q in questions}
+    assert {q["number"]: q["explanation"] for q in questions} == {
+        q["number"]: explanations_by_number.get(q["number"], NO_EXPLANATION) for q in questions}
+
+
+def test_unlabeled_key_with_explanations_is_not_a_key():
+    # The full parse finds no key in these, so neither may the key pages
+    pdf = synthetic.write_pdf(synthetic.generate_exam(num_questions=80, labeled_key=False))
+    assert locate_key_pages(pdf) is None
+    assert extract_answer_key(pdf) == ({}, {})
+    assert not any(q["correct"] for q in extract_questions_and_answers(io.BytesIO(pdf), workers=1))
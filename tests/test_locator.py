@@ -0,0 +1,69 @@
+"""locate_answer_key against the regex search it replaced"""
+import random
+import re
+
+from deca_parser import find_answer_key_split
+
+
+def regex_answer_key_split(text):
+    """The original answer key search: one regex pass per strategy"""
+    key_patterns = [r'EXAM[—\-\s]*KEY\s+\d+', r'ANSWER\s+KEY', r'\bKEY\b.*\d+']
+    for pattern in key_patterns:
+        for match in re.finditer(pattern, text, re.IGNORECASE):
+            if match.start() > 5000:
+                return text[:match.start()], text[match.start():]
+
+    answer_pattern = r'\n\s*1\.\s+[A-D]\s*\n\s*2\.\s+[A-D]\s*\n\s*3\.\s+[A-D]'
+    for match in re.finditer(answer_pattern, text):
+        if match.start() > 5000:
+            split_pos = text.rfind('\n', match.start()-100, match.start()) + 1
+            return text[:split_pos], text[split_pos:]
+
+    chunk_size = 2000
+    for i in range(5000, len(text) - chunk_size, 1000):
+        if len(re.findall(r'\n\s*\d+\.\s+[A-D]\s*\n', text[i:i+chunk_size])) > 15:
+            return text[:i], text[i:]
+    return text, ""
+
+
+QUESTION_LINES = [
+    "What is the best way to reach a target market?",
+    "A. Advertising  B. Pricing",
+    "C. Promotion    D. Distribution",
+    "Test 1229 FINANCE EXAM",
+    "The locks need a new key before 2 PM",
+    "Copyright 2024 MBA Research",
+]
+KEY_LINES = [
+    "", "", "  ", "\t", "1. A", "2. B", "3. C", "1.  D ", "  2. A", "3.\tB", "12. C", "4. E",
+    "SOURCE: FI:1 Textbook", "An explanation of the answer.", "ANSWER KEY", "EXAM—KEY 2",
+    "Exam-Key 3", "key", "Answer\n\nKey",
+]
+
+
+def fuzzed_text(rng):
+    lines = []
+    while sum(len(line) + 1 for line in lines) < rng.randint(4800, 5200):
+        lines.append(f"{len(lines) % 99 + 1}. {rng.choice(QUESTION_LINES)}")
+        lines.extend(rng.sample(QUESTION_LINES[1:3], 2))
+    for _ in range(rng.randint(0, 120)):
+        if rng.random() < 0.5:
+            # Mostly numbered answer lines, so runs and dense windows appear
+            lines.append(f"{rng.randint(1, 4)}. {rng.choice('ABCD')}")
+        else:
+            lines.append(rng.choice(KEY_LINES))
+    return "\n".join(lines)
+
+
+def test_blank_line_before_the_answer_run():
+    questions = "\n".join(f"{i}. {QUESTION_LINES[0]}" for i in range(120))
+    text = questions + "\n9. C\n\n1. A\n2. B\n3. C"
+    assert find_answer_key_split(text) == regex_answer_key_split(text)
+    assert find_answer_key_split(text)[1].startswith("9. C\n\n1. A")
+
+
+def test_matches_regex_search_on_fuzzed_text():
+    rng = random.Random(5)
+    for _ in range(3000):
+        text = fuzzed_text(rng)
+        assert find_answer_key_split(text) == regex_answer_key_split(text), text[4800:]
@@ -0,0 +1,91 @@
+"""Question bank queries and replacing exams"""
+import sqlite3
+
+import numpy as np
+
+from dedup import DuplicateIndex
+from exam_registry import ExamRegistry
+from question_bank import _SCHEMA, QuestionBank
+
+
+def questions(count, prefix="Question"):
+    return [{"number": i, "text": f"{prefix} {i}", "choices": {"A": "a", "B": "b"}, "correct": "A",
+             "explanation": "No explanation available."} for i in range(1, count + 1)]
+
+
+def test_sample_ids_respects_filters(tmp_path):
+    bank = QuestionBank(str(tmp_path / "bank.sqlite3"))
+    marketing = bank.add_exam("m", "Marketing", questions(40), cluster="Marketing")
+    finance = bank.add_exam("f", "Finance", questions(30), cluster="Finance")
+    hospitality = bank.add_exam("h", "Hospitality", questions(20), cluster="Hospitality")
+
+    sample = bank.sample_ids(25)
+    assert len(sample) == len(set(sample)) == 25
+    assert set(sample) <= set(bank.question_ids())
+    assert set(bank.sample_ids(10, cluster="Finance")) <= set(bank.question_ids([finance]))
+    chosen = bank.sample_ids(100, exam_ids=[marketing, hospitality])
+    assert sorted(chosen) == sorted(bank.question_ids([marketing, hospitality]))
+    assert bank.sample_ids(5, exam_ids=[marketing], cluster="Finance") == []
+    # Not always the same questions
+    assert len({tuple(bank.sample_ids(5)) for _ in range(5)}) > 1
+
+
+def test_replacing_an_exam_gives_new_ids(tmp_path):
+    bank = QuestionBank(str(tmp_path / "bank.sqlite3"))
+    registry = ExamRegistry(bank)
+    index = DuplicateIndex(bank)
+    old = bank.add_exam("file:x", "X", questions(3, "old"))
+    old_rows = registry.row_ids(old).tolist()
+    assert registry.get(old)[0].text == "old 1"
+    index.refresh()
+
+    new = bank.add_exam("file:x", "X", questions(3, "new"))
+    assert new != old
+    assert set(registry.row_ids(new).tolist()).isdisjoint(old_rows)
+    assert registry.get(new)[0].text == "new 1"
+    assert registry.replaced([old]) and not registry.replaced([new])
+    # The old exam is gone from the registry and the duplicate index
+    assert len(registry.get(old)) == 0
+    assert index.groups(registry.row_ids(new)).tolist() == registry.row_ids(new).tolist()
+    assert not np.isin(index._ids, old_rows).any()
+    # Ids of replaced exams aren't reused, even for the newest exam
+    assert bank.add_exam("file:x", "X", questions(3, "newer")) > new
+
+
+def test_version_1_databases_keep_their_ids(tmp_path):
+    path = str(tmp_path / "bank.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.executescript(_SCHEMA.replace(" AUTOINCREMENT", ""))
+    conn.execute("PRAGMA user_version = 1")
+    conn.execute("INSERT INTO exams VALUES (7, 'file:x', 'X', 'Other', '2', 2, 0)")
+    conn.executemany("INSERT INTO questions VALUES (?, 7, ?, ?, 'a', 'b', '', '', 'A', '')",
+                     [(40, 1, "pricing question"), (41, 2, "channel question")])
+    conn.commit()
+    conn.close()
+
+    bank = QuestionBank(path)
+    assert bank.question_row_ids(7) == [40, 41]
+    assert bank.search("pricing") == [40]
+    new = bank.add_exam("file:x", "X", questions(2))
+    assert new > 7 and min(bank.question_row_ids(new)) > 41
+    assert bank.search("pricing") == []
+    # Reopening doesn't migrate again
+    assert QuestionBank(path).question_row_ids(new) == bank.question_row_ids(new)
+
+
+def test_quiz_over_more_exams_than_the_registry_holds(tmp_path, monkeypatch):
+    bank = QuestionBank(str(tmp_path / "bank.sqlite3"))
+    exam_ids = [bank.add_exam(f"file:{i}", str(i), questions(3, f"exam {i}")) for i in range(5)]
+    registry = ExamRegistry(bank, max_exams=2)
+    loads = []
+    load_exam = bank.load_exam
+    monkeypatch.setattr(bank, "load_exam", lambda exam_id: loads.append(exam_id) or load_exam(exam_id))
+
+    rows = sorted(bank.question_ids(), reverse=True)
+    quiz = registry.quiz_from_rows(rows)
+    for _ in range(3):
+        assert [q.text for q in quiz] == [f"exam {i} {n}" for i in range(4, -1, -1) for n in (3, 2, 1)]
+        assert quiz.row_ids().tolist() == rows
+    # Each exam was read once, although the registry only keeps two
+    assert sorted(loads) == exam_ids
+    assert len(registry._entries) == 2
@@ -0,0 +1,69 @@
+"""Spaced review: SM-2 schedule, scheduler order and the due summary"""
+import pytest
+
+from review_scheduler import (
+    DAY_SECONDS, INITIAL_EASE, MIN_EASE, RELEARN_SECONDS, Card, ReviewScheduler, ReviewStore, review,
+    start_review,
+)
+
+NOW = 1_000_000.0
+
+
+def test_sm2_intervals():
+    card = Card.new(1, NOW)
+    intervals = []
+    now = NOW
+    for _ in range(4):
+        card = review(card, True, now)
+        intervals.append(card.interval_days)
+        now = card.due
+    # 1 day, 6 days, then the previous interval times the ease
+    assert intervals[:2] == [1.0, 6.0]
+    assert intervals[2] == round(6.0 * INITIAL_EASE)
+    assert intervals[3] == round(intervals[2] * INITIAL_EASE)
+    # Quality 4 leaves the ease unchanged
+    assert card.ease == pytest.approx(INITIAL_EASE)
+    assert card.repetitions == 4
+
+
+def test_sm2_lapse():
+    card = review(review(Card.new(1, NOW), True, NOW), True, NOW)
+    missed = review(card, False, NOW)
+    assert missed.due == NOW + RELEARN_SECONDS
+    assert (missed.repetitions, missed.lapses, missed.interval_days) == (0, 1, 1.0)
+    assert missed.ease == pytest.approx(INITIAL_EASE - 0.54)
+    for _ in range(10):
+        missed = review(missed, False, NOW)
+    assert missed.ease == MIN_EASE
+    # Passing again starts the intervals over
+    assert review(missed, True, NOW).due == NOW + DAY_SECONDS
+
+
+def test_scheduler_serves_most_overdue_then_hardest():
+    scheduler = ReviewScheduler([
+        Card(1, NOW - 10, 2.5, 1.0, 1, 0),
+        Card(2, NOW - 20, 2.5, 1.0, 1, 0),
+        Card(3, NOW - 10, 1.5, 1.0, 1, 0),
+        Card(4, NOW + 10, 1.3, 1.0, 1, 0),
+    ])
+    order = []
+    while (card := scheduler.next_due(NOW)) is not None:
+        order.append(card.question_id)
+        scheduler.answer(card.question_id, True, NOW)
+    assert order == [2, 3, 1]
+    assert scheduler.peek().question_id == 4
+    assert len(scheduler) == 4
+
+
+def test_due_summary_matches_scheduler():
+    store = ReviewStore(":memory:")
+    assert store.due_summary("ann", [], NOW) == (0, None)
+    store.record_quiz("ann", [1, 2, 3], [True, False, True], now=NOW - DAY_SECONDS)
+    new_ids = list(range(2, 2000))
+    for now in (NOW - 1, NOW + 1, NOW + 10 * DAY_SECONDS):
+        scheduler = start_review(store, "ann", new_ids, now=now)
+        due = sum(1 for question_id in range(1, 2000) if scheduler.get(question_id).due <= now)
+        assert store.due_summary("ann", new_ids, now) == (due, scheduler.peek().due)
+    # Without new cards, the next stored card is reported even when not yet due
+    assert store.due_summary("ann", [], NOW - DAY_SECONDS) == (0, NOW - DAY_SECONDS + RELEARN_SECONDS)
+    assert store.due_summary("bob", [5, 6], NOW) == (2, NOW)
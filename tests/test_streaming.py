@@ -0,0 +1,100 @@
+"""stream_exam against the batch parser on synthetic PDFs"""
+import io
+import re
+
+import pytest
+
+import parse_metrics
+import synthetic
+from deca_parser import extract_questions_and_answers, stream_exam
+
+
+@pytest.mark.parametrize("engine", ["layout", "fast"])
+@pytest.mark.parametrize("labeled_key, explanations", [(True, True), (False, True), (False, False)])
+def test_stream_matches_batch_parse(engine, labeled_key, explanations):
+    pdf = synthetic.write_pdf(synthetic.generate_exam(
+        num_questions=60, labeled_key=labeled_key, explanations=explanations, seed=3))
+    batch = extract_questions_and_answers(io.BytesIO(pdf), workers=1, engine=engine)
+
+    events = list(stream_exam(io.BytesIO(pdf), workers=1, engine=engine))
+    kinds = [kind for kind, _ in events]
+    assert kinds.count("done") == 1 and kinds[-1] == "done"
+    if "restart" in kinds:
+        # A fast parse that found too few answers starts over with layout
+        assert engine == "fast"
+        events = events[len(kinds) - kinds[::-1].index("restart"):]
+    streamed = events[-1][1]
+    assert streamed == batch
+    assert len(streamed) == 60
+    if labeled_key or not explanations:
+        # An unlabeled key interleaved with explanations isn't found by either
+        assert all(q["correct"] for q in streamed)
+    # Every question is yielded before the end, and pages are reported in order
+    assert [q["number"] for kind, q in events if kind == "question"] == [q["number"] for q in batch]
+    pages = [payload[0] for kind, payload in events if kind == "page"]
+    assert pages == list(range(1, len(pages) + 1))
+
+
+def _replace_line(pages, prefix, replace):
+    """pages with replace(line) for the first line starting with prefix"""
+    for index, page in enumerate(pages):
+        lines = page.split("\n")
+        for i, line in enumerate(lines):
+            if line.startswith(prefix):
+                lines[i] = replace(line)
+                return pages[:index] + ["\n".join(lines)] + pages[index + 1:]
+    raise AssertionError(f"no line starts with {prefix!r}")
+
+
+def _key_word_in_question(pages):
+    return _replace_line(pages, "101. ", lambda line: line.replace(
+        "Which of the following", "The key account number is 12. Which of the following", 1))
+
+
+def _is_key_page(page):
+    return re.match(r"\d+\. [A-D]\n", page) is not None
+
+
+def _key_without_first_answers(pages):
+    # Without the "1. A", "2. B" lines only the density of answer lines finds the key
+    return [page.split("\n", 2)[2] if page.startswith("1. ") and _is_key_page(page) else page
+            for page in pages]
+
+
+FIXTURES = {
+    # In an unlabeled exam, "key ... 12" in question 101 comes before the
+    # sequential key, so both parsers end the questions there
+    "key-word-unlabeled": (dict(num_questions=120, labeled_key=False, explanations=False),
+                           _key_word_in_question),
+    # The exam's key header is preferred to the earlier "key ... 12"
+    "key-word-labeled": (dict(num_questions=120, labeled_key=True), _key_word_in_question),
+    "density": (dict(num_questions=120, labeled_key=False, explanations=False),
+                _key_without_first_answers),
+    "no-key": (dict(num_questions=80, labeled_key=False, explanations=False),
+               lambda pages: [page for page in pages if not _is_key_page(page)]),
+}
+
+
+@pytest.mark.parametrize("fixture", sorted(FIXTURES))
+def test_stream_matches_batch_split(fixture):
+    kwargs, edit = FIXTURES[fixture]
+    pdf = synthetic.write_pdf(edit(synthetic.generate_exam(seed=5, **kwargs)))
+    batch = extract_questions_and_answers(io.BytesIO(pdf), workers=1, engine="layout")
+    events = list(stream_exam(io.BytesIO(pdf), workers=1, engine="layout"))
+    assert events[-1] == ("done", batch)
+    assert [q for kind, q in events if kind == "question"] == batch
+    if fixture.startswith("key-word"):
+        assert len(batch) == (100 if fixture == "key-word-unlabeled" else 120)
+
+
+def test_each_parse_is_recorded_once():
+    pdf = synthetic.write_pdf(synthetic.generate_exam(num_questions=20, seed=3))
+    parses = parse_metrics._totals["parses"]
+    extract_questions_and_answers(io.BytesIO(pdf), workers=1, engine="layout")
+    assert parse_metrics._totals["parses"] == parses + 1
+    # A streamed profile is recorded by the consumer (the parse job's parent process)
+    profile = parse_metrics.ParseProfile("streamed")
+    for _ in stream_exam(io.BytesIO(pdf), workers=1, profile=profile, engine="layout"):
+        pass
+    assert parse_metrics._totals["parses"] == parses + 1
+    assert profile.total_seconds is not None and profile.counters["questions"] == 20
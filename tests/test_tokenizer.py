@@ -0,0 +1,122 @@
+"""The tokenizing parsers against the line-by-line regex parsers they replaced"""
+import random
+import re
+
+from deca_parser import parse_answer_key, parse_questions
+
+
+def regex_is_noise(line):
+    line = line.strip()
+    return (len(line) < 3 or line.startswith(('Copyright', 'Posted online', 'Booklet'))
+            or re.match(r'^Page\s+\d+', line, re.IGNORECASE) is not None
+            or (re.match(r'^Test\s+\d+.*EXAM\s+\d+$', line) is not None and 'KEY' not in line))
+
+
+def regex_choices(line):
+    parts = re.split(r'([A-D])[\.\)]\s+', line)
+    choices = {}
+    for i in range(1, len(parts) - 1, 2):
+        text = parts[i+1].strip().rstrip('.')
+        if text:
+            choices[parts[i]] = text
+    return choices
+
+
+def regex_parse_questions(questions_text):
+    """The original question parser: every pattern re-matched on every line"""
+    questions = []
+    state = {"number": None, "text": "", "choices": None}
+
+    def finish():
+        choices = state["choices"] or {}
+        if len(choices) == 4:
+            questions.append({"number": state["number"], "text": state["text"].strip(),
+                              "choices": choices, "correct": None, "explanation": ""})
+        state.update(number=None, text="", choices=None)
+
+    def start(line):
+        if regex_is_noise(line):
+            return
+        match = re.match(r'^(\d+)[\.\)]\s+(.+)', line)
+        if match:
+            state.update(number=int(match.group(1)), text=match.group(2), choices=None)
+
+    def feed_choice(line):
+        if re.match(r'^\d+[\.\)]\s+', line):
+            finish()
+            start(line)
+            return
+        if regex_is_noise(line):
+            return
+        choices = state["choices"]
+        line_choices = regex_choices(line)
+        if line_choices:
+            for letter, text in line_choices.items():
+                choices.setdefault(letter, text)
+            if len(choices) == 4:
+                finish()
+        elif choices and line and not re.match(r'^[A-D][\.\)]\s+', line):
+            choices[sorted(choices)[-1]] += " " + line
+
+    for line in questions_text.split('\n'):
+        line = line.strip()
+        if state["number"] is None:
+            start(line)
+        elif state["choices"] is None:
+            if re.match(r'^[A-D][\.\)]\s+', line):
+                state["choices"] = {}
+                feed_choice(line)
+            elif re.match(r'^\d+[\.\)]\s+', line):
+                finish()
+                start(line)
+            elif line and not regex_is_noise(line):
+                state["text"] += " " + line
+        else:
+            feed_choice(line)
+    if state["number"] is not None:
+        finish()
+    return questions
+
+
+def regex_parse_answer_key(answer_text):
+    """The original answer key parser"""
+    answer_key, explanations = {}, {}
+    number, explanation, in_source = None, "", False
+    for line in answer_text.split('\n'):
+        line = line.strip()
+        if not line or regex_is_noise(line):
+            continue
+        if line.startswith('SOURCE:'):
+            in_source = True
+            continue
+        match = re.match(r'^(\d+)[\.\)]\s+([A-D])(?:\s+(.*))?$', line)
+        if match:
+            if number and explanation:
+                explanations[number] = explanation.strip()
+            number = int(match.group(1))
+            answer_key[number] = match.group(2)
+            explanation = match.group(3) or ""
+            in_source = False
+        elif number and not in_source and not re.match(r'^\d+[\.\)]\s+[A-D]', line):
+            explanation = explanation + " " + line if explanation else line
+    if number and explanation:
+        explanations[number] = explanation.strip()
+    return answer_key, explanations
+
+
+LINES = [
+    "1. What is A. foo", "12. B", "12) C", "3. Apple pie", "A. x", "A. .", "B) yes",
+    "C.  two  D. three", "D. last.", "plan A. thing C. other", "Copyright A. b", "Page 3",
+    "page 4 x", "Test 1229 FINANCE EXAM 1", "Test 1 X EXAM 2 KEY", "SOURCE: FI:1 text", "", "  ",
+    "xx", "ab", "continuation words here", "E. not a choice", "7.", "8. ", "9. D   trailing words",
+    "10. A\tTab", "Posted online", "Booklet 1", "A.  ", "  B. padded  ", "100. question text?",
+    "A) paren", "key 12 thing", "ANSWER KEY", "5. a lower", "4. B Because the customer asked.",
+]
+
+
+def test_matches_regex_parsers_on_fuzzed_lines():
+    rng = random.Random(4)
+    for _ in range(3000):
+        text = "\n".join(rng.choice(LINES) for _ in range(rng.randint(1, 80)))
+        assert parse_questions(text) == regex_parse_questions(text), text
+        assert parse_answer_key(text) == regex_parse_answer_key(text), text